@@ -1,4 +1,3 @@
-from . import core
-from . import pkgs
-# import core
+from diive.core.utils.lazy import lazy_module
 
+__getattr__, __dir__ = lazy_module(__name__, ['core', 'pkgs'])
@@ -1,6 +1,3 @@
-# from diive.core import dfun, io, plotting, utils
-from . import dfun
-from . import io
-from . import ml
-from . import plotting
-from . import times
+from diive.core.utils.lazy import lazy_module
+
+__getattr__, __dir__ = lazy_module(__name__, ['dfun', 'io', 'ml', 'plotting', 'times'])
@@ -3,15 +3,11 @@
 BASE CLASS FOR QUALITY FLAGS
 
 """
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from pandas import DataFrame, Series, DatetimeIndex
 
-import diive.core.plotting.styles.LightTheme as theme
 from diive.core.funcs.funcs import validate_id_string
-from diive.core.plotting.plotfuncs import default_format, default_legend
 
 
 class FlagBase:
@@ -151,6 +147,12 @@ class FlagBase:
 
     def defaultplot(self, n_iterations: int = 1):
         """Basic plot that shows time series with and without outliers"""
+        # Plotting dependencies are only imported when plotting
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        import diive.core.plotting.styles.LightTheme as theme
+        from diive.core.plotting.plotfuncs import default_format, default_legend
+
         ok = self.overall_flag == 0
         rejected = self.overall_flag == 2
         n_outliers = rejected.sum()
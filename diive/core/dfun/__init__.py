@@ -1,4 +1,3 @@
-from . import fits
-from . import frames
-from . import regression
-from . import stats
+from diive.core.utils.lazy import lazy_module
+
+__getattr__, __dir__ = lazy_module(__name__, ['fits', 'frames', 'regression', 'stats'])
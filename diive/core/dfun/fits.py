@@ -26,10 +26,6 @@ from typing import Literal
 
 import numpy as np
 import pandas as pd
-import uncertainties as unc
-import uncertainties.unumpy as unp
-from scipy import stats
-from scipy.optimize import curve_fit
 
 # from gui import plotfuncs
 from diive.core.dfun.stats import q25, q75
@@ -116,6 +112,8 @@ class BinFitterCP:
 
     def _predband(self, px, x, y, params_opt, func, conf=0.95):
         """Prediction band"""
+        from scipy import stats
+
         # px = requested points, x = x data, y = y data, params_opt = parameters, func = function name
         alpha = 1.0 - conf  # significance
         N = x.size  # data sample size
@@ -180,6 +178,9 @@ class BinFitterCP:
 
         kudos: https://apmonitor.com/che263/index.php/Main/PythonRegressionStatistics
         """
+        import uncertainties as unc
+        import uncertainties.unumpy as unp
+        from scipy.optimize import curve_fit
 
         df, x, y, len_y, numvals_per_bin = self._set_fit_data(df=df)
 
@@ -10,9 +10,10 @@ from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from pandas import DataFrame, MultiIndex
+from pandas import DataFrame, MultiIndex, DatetimeIndex
 from pandas import Series
 from pandas._libs.tslibs import to_offset
+from pandas.tseries.offsets import Tick
 
 # from diive.core.times.times import timedelta_to_string
 from diive.pkgs.gapfilling.interpolate import linear_interpolation
@@ -57,37 +58,8 @@ def aggregated_as_hires(aggregate_series: Series,
         lowres_df[agghires_col] = linear_interpolation(series=lowres_df[agghires_col],
                                                        limit=interpolation_lim)
 
-        # lowres_df.interpolate(limit=1)
-    # todo here linear interpolation with gap length limit
-
-    # Input data
-    hires_df = pd.DataFrame(index=hires_timestamp)
-    hires_df[aggregate_series.name] = aggregate_series
-
-    # Insert column to merge the two datasets on
-    mergecol = None
-    if to_freq == 'D':
-        mergecol = 'date'
-        lowres_df[mergecol] = lowres_df.index.date
-        hires_df[mergecol] = hires_df.index.date
-    elif to_freq == 'A':
-        mergecol = 'year'
-        lowres_df[mergecol] = lowres_df.index.year
-        hires_df[mergecol] = hires_df.index.year
-    elif to_freq == 'M':
-        mergecol = 'year-month'
-        lowres_df[mergecol] = lowres_df.index.year.astype(str).str.cat(lowres_df.index.month.astype(str).str.zfill(2),
-                                                                       sep='-')
-        hires_df[mergecol] = hires_df.index.year.astype(str).str.cat(hires_df.index.month.astype(str).str.zfill(2),
-                                                                     sep='-')
-
-    # Timestamp as column for index after merging (merging loses index)
-    hires_df['_TIMESTAMP'] = hires_df.index
-    hires_df = hires_df.merge(lowres_df, left_on=mergecol, right_on=mergecol, how='left')
-
-    # Re-apply original index (merging lost index)
-    hires_df = hires_df.set_index('_TIMESTAMP')
-    hires_df.index.name = hires_timestamp.name
+    # Apply high-res timestamp
+    hires_df = broadcast_aggregated(lowres=lowres_df, hires_timestamp=hires_timestamp, to_freq=to_freq)
     return hires_df[agghires_col]
 
 
@@ -107,25 +79,111 @@ def insert_aggregated_in_hires(df: DataFrame, col: str,
             the daily average from 07:00 (current day) to 06:59 (next day).
 
     """
-    # Resample and aggregate
-    agg_df = df[[col]].resample(to_freq, offset=agg_offset).agg(to_agg)
-
-    # Start and end of where agg is filled in
-    agg_df['start'] = agg_df.index
-    agg_df['end'] = agg_df.index.shift(1)
-
     if agg_offset:
         new_colname = f".{col}_{to_freq}{agg_offset}_{to_agg}"
     else:
         new_colname = f".{col}_{to_freq}_{to_agg}"
-    agg_df = rename_cols(df=agg_df, renaming_dict={col: new_colname})
+    df[new_colname] = aggregate_broadcast(data=df[col], to_freq=to_freq, to_agg=to_agg, agg_offset=agg_offset)
+    return df, new_colname
 
-    df[new_colname] = np.nan
 
-    for ix, row in agg_df.iterrows():
-        df[new_colname].loc[(df.index >= row['start']) & (df.index < row['end'])] = row[new_colname]
+def aggregate_broadcast(data: Series or DataFrame,
+                        to_freq: str = 'D',
+                        to_agg: str = 'mean',
+                        agg_offset: str = None,
+                        hires_timestamp: DatetimeIndex = None) -> Series or DataFrame:
+    """
+    Aggregate data and broadcast the aggregates back to the high-res timestamp
 
-    return df, new_colname
+    Each high-res record gets the aggregate of the period it belongs to, e.g.
+    the daily maximum of air temperature for each half-hourly record.
+
+    Args:
+        data: High-res data that are aggregated, all columns are aggregated
+        to_freq: Frequency string, 'D' for daily aggregation, 'A' for yearly, 'M' for monthly
+        to_agg: Aggregation type, e.g. 'mean' for mean, 'max' for maximum
+        agg_offset: Timestamp offset for aggregation, e.g. '7H' when 'to_freq="D"' calculates
+            the daily average from 07:00 (current day) to 06:59 (next day). Only used for
+            fixed frequencies (e.g. 'D', '6H'), the same as in `resample`.
+        hires_timestamp: Timestamp the aggregates are broadcast to, the timestamp of
+            *data* if *None*. Records outside the aggregated periods are missing.
+
+    Returns:
+        aggregates with high-res timestamp, same names as in *data*
+    """
+    lowres = data.resample(to_freq, offset=agg_offset).agg(to_agg)
+    if hires_timestamp is None:
+        hires_timestamp = data.index
+    return broadcast_aggregated(lowres=lowres, hires_timestamp=hires_timestamp,
+                                to_freq=to_freq, agg_offset=agg_offset)
+
+
+def broadcast_aggregated(lowres: Series or DataFrame,
+                         hires_timestamp: DatetimeIndex,
+                         to_freq: str = 'D',
+                         agg_offset: str = None) -> Series or DataFrame:
+    """
+    Broadcast aggregated data to a high-res timestamp
+
+    Args:
+        lowres: Aggregated data, e.g. from `resample(to_freq, offset=agg_offset)`
+        hires_timestamp: High-res timestamp
+        to_freq: Frequency of the aggregated data
+        agg_offset: Timestamp offset that was used for aggregation
+
+    Returns:
+        aggregated values with high-res timestamp
+    """
+    codes = period_codes(timestamp=hires_timestamp, lowres_index=lowres.index,
+                         to_freq=to_freq, agg_offset=agg_offset)
+    # One gather for all records, missing periods (-1) become missing values
+    hires = lowres.set_axis(pd.RangeIndex(len(lowres)), copy=False).reindex(codes)
+    return hires.set_axis(hires_timestamp, copy=False)
+
+
+# Offsets that `resample` labels with the end of the period (closed='right')
+_END_LABELLED_FREQS = {'M', 'A', 'Q', 'BM', 'BA', 'BQ', 'W'}
+
+
+def period_codes(timestamp: DatetimeIndex,
+                 lowres_index: DatetimeIndex,
+                 to_freq: str = 'D',
+                 agg_offset: str = None) -> np.ndarray:
+    """
+    Position of the aggregation period of each high-res timestamp in *lowres_index*
+
+    Bins are the same as in `resample`: for fixed frequencies (e.g. 'D', '6H') and
+    calendar frequencies labelled by period start (e.g. 'MS', 'AS') *lowres_index*
+    contains the start of each period and a timestamp belongs to the last period
+    that starts before or at the timestamp. Calendar frequencies labelled by period
+    end (e.g. 'M', 'A', 'W') contain the last day of each period, a period then ends
+    at midnight after this day.
+
+    Args:
+        timestamp: High-res timestamp
+        lowres_index: Timestamp of the aggregated data, continuous
+        to_freq: Frequency of the aggregated data
+        agg_offset: Timestamp offset that was used for aggregation
+
+    Returns:
+        integer code for each timestamp, -1 for timestamps outside the aggregated periods
+    """
+    timestamp = pd.DatetimeIndex(timestamp)
+    num_periods = len(lowres_index)
+    if num_periods == 0:
+        return np.full(len(timestamp), -1, dtype='int64')
+
+    freq = to_offset(to_freq)
+    if not isinstance(freq, Tick) and freq.rule_code.split('-')[0] in _END_LABELLED_FREQS:
+        # Day after the last day of each period, the period before the first one gives the first start
+        edges = lowres_index[:1].shift(-1, freq=freq).append(lowres_index) + pd.Timedelta(days=1)
+    else:
+        # Period starts, the end of the last period is added
+        edges = lowres_index.append(pd.DatetimeIndex([lowres_index[-1] + freq]))
+    codes = np.searchsorted(edges.asi8, timestamp.asi8, side='right') - 1
+
+    codes[(codes < 0) | (codes >= num_periods) | np.asarray(timestamp.isna())] = -1
+    return codes
 
 
 def rename_cols(df: DataFrame, renaming_dict: dict) -> DataFrame:
@@ -725,7 +783,8 @@ def convert_to_arrays(df: pd.DataFrame, target_col: str, complete_rows: bool = T
     return targets, features, features_names, timestamp
 
 
-def rolling_variants(df, records: int, aggtypes: list, exclude_cols: list = None) -> pd.DataFrame:
+def rolling_variants(df, records: int, aggtypes: list, exclude_cols: list = None,
+                     dtype: str = None) -> pd.DataFrame:
     """Create rolling variants of variables
 
     Calculates rolling aggregation over *records* of type *aggtypes*
@@ -733,18 +792,23 @@ def rolling_variants(df, records: int, aggtypes: list, exclude_cols: list = None
     For example, with records=5 and aggtypes=['mean', 'max'] the mean
     and max over 5 records is produced.
 
-    """
-    for col in df.columns:
-        if exclude_cols:
-            if col in exclude_cols:
-                continue
+    All rolling variants are collected in one block that is added to *df* at once,
+    *dtype* (e.g. 'float32') sets the data type of the rolling variants.
 
-        for aggtype in aggtypes:
-            aggname = (f".{col[0]}.r-{aggtype}{records}", col[1])
-            min_periods = int(np.ceil(records / 2))
-            df[aggname] = df[col].rolling(records, min_periods=min_periods).agg(aggtype)
+    """
+    exclude_cols = exclude_cols if exclude_cols else []
+    cols = [col for col in df.columns if col not in exclude_cols]
+    min_periods = int(np.ceil(records / 2))
+    rolling = df[cols].rolling(records, min_periods=min_periods)
 
-    return df
+    # Variables x aggtypes x records, order of new columns: all aggtypes of the
+    # first variable, then all aggtypes of the second variable etc.
+    block = np.empty((len(cols), len(aggtypes), len(df)), dtype=dtype if dtype else 'float64')
+    for ix, aggtype in enumerate(aggtypes):
+        block[:, ix, :] = rolling.agg(aggtype).to_numpy().T
+    block = block.reshape(len(cols) * len(aggtypes), len(df)).T
+    newcols = [(f".{col[0]}.r-{aggtype}{records}", col[1]) for col in cols for aggtype in aggtypes]
+    return attach_block(df=df, block=block, columns=newcols)
 
 
 def add_continuous_record_number(df: DataFrame) -> DataFrame:
@@ -761,6 +825,7 @@ def lagged_variants(df: DataFrame,
                     lag: list[int, int],
                     stepsize: int = 1,
                     exclude_cols: list = None,
+                    dtype: str = None,
                     verbose: bool = True) -> DataFrame:
     """
     Create lagged variants of variables
@@ -774,8 +839,13 @@ def lagged_variants(df: DataFrame,
             For example lag=[-8, 4] and stepsize=2 will generated lagged
             variants -8, -6, -4, -2 and +2
         exclude_cols: list of column names, these variables will not be lagged
+        dtype: data type of the lagged variants, e.g. 'float32' needs half the memory of
+            the default 'float64'
         verbose: if *True*, print more output to console
 
+    All lagged variants are created in one pre-allocated block (see `lagged_block`)
+    that is added to *df* at once.
+
     Returns:
         input dataframe with added lagged variants
     """
@@ -795,7 +865,7 @@ def lagged_variants(df: DataFrame,
     """
     print(f"\nCreating lagged variants ...")
     if len(df.columns) == 1:
-        if df.columns[0] in exclude_cols:
+        if exclude_cols and (df.columns[0] in exclude_cols):
             raise Exception(f"(!) No lagged variants can be created "
                             f"because there is only one single column in the dataframe "
                             f"({df.columns[0]}) and the same column is also defined in "
@@ -818,30 +888,15 @@ def lagged_variants(df: DataFrame,
             raise TypeError(f"(!) Error in lag={lag}: No lagged variables can be created "
                             f"because {_lag} is not an integer.")
 
-    _included = []
-    _excluded = []
-
-    lagsteps = range(lag[0], lag[1] + 1, stepsize)
+    exclude_cols = exclude_cols if exclude_cols else []
+    _included = [col for col in df.columns if col not in exclude_cols]
+    _excluded = [col for col in df.columns if col in exclude_cols]
 
-    for col in df.columns:
-        if exclude_cols:
-
-            if col in exclude_cols:
-                _excluded.append(col)
-                continue
-
-            for lagstep in lagsteps:
-                if lagstep < 0:
-                    stepname = f".{col}{lagstep}"
-                    _shift = abs(lagstep)
-                elif lagstep > 0:
-                    stepname = f".{col}+{lagstep}"
-                    _shift = -lagstep
-                else:
-                    # skip if lagstep = 0
-                    continue
-                df[stepname] = df[col].shift(_shift)
-            _included.append(col)
+    lagsteps = [lagstep for lagstep in range(lag[0], lag[1] + 1, stepsize) if lagstep != 0]  # Skip lagstep = 0
+    block = lagged_block(values=df[_included].to_numpy(dtype=dtype), lagsteps=lagsteps)
+    stepnames = [f".{col}{lagstep}" if lagstep < 0 else f".{col}+{lagstep}"
+                 for col in _included for lagstep in lagsteps]
+    df = attach_block(df=df, block=block, columns=stepnames)
 
     if verbose:
         print(f"Created lagged variants for: {_included} (lags between {lag[0]} and {lag[1]} "
@@ -850,6 +905,55 @@ def lagged_variants(df: DataFrame,
     return df
 
 
+def lagged_block(values: np.ndarray, lagsteps: list) -> np.ndarray:
+    """
+    Lagged variants of all columns in *values* as one 2D array
+
+    The array is allocated once and filled with shifted views of *values*, one
+    assignment per lag step for all columns. A negative lag step pairs each record
+    with a preceding record (e.g. -1 is the previous record), a positive lag step
+    with a following record.
+
+    Args:
+        values: 2D array, records x variables
+        lagsteps: lag steps in number of records, e.g. [-2, -1, 1, 2]
+
+    Returns:
+        2D array with records x (variables * lag steps), all lag steps of the first
+        variable, then all lag steps of the second variable etc. (column-major)
+    """
+    values = values.astype(np.result_type(values.dtype, np.float32), copy=False)  # NaN for missing
+    n_records, n_cols = values.shape
+    values = np.ascontiguousarray(values.T)  # Variables x records
+    # Variables x lag steps x records, each lagged variant is contiguous in memory, the
+    # same layout pandas uses to store columns
+    block = np.empty((n_cols, len(lagsteps), n_records), dtype=values.dtype)
+    for ix, lagstep in enumerate(lagsteps):
+        shifted = block[:, ix, :]
+        shift = min(abs(lagstep), n_records)
+        if lagstep < 0:
+            shifted[:, :shift] = np.nan
+            shifted[:, shift:] = values[:, :n_records - shift]
+        else:
+            shifted[:, n_records - shift:] = np.nan
+            shifted[:, :n_records - shift] = values[:, shift:]
+    return block.reshape(n_cols * len(lagsteps), n_records).T
+
+
+def attach_block(df: DataFrame, block: np.ndarray, columns: list) -> DataFrame:
+    """Add 2D array *block* as new *columns* to *df* in one step, existing columns with the same name are replaced"""
+    existing = [col for col in columns if col in df.columns]
+    if existing:
+        df = df.drop(columns=existing)
+    newcols_df = pd.DataFrame(block, index=df.index, columns=pd.Index(columns, tupleize_cols=False), copy=False)
+    if isinstance(df.columns, MultiIndex):
+        # Names that are not tuples are used for the first level, as in `df[name] = ...`
+        pad = ('',) * (df.columns.nlevels - 1)
+        columns = [col if isinstance(col, tuple) else (col,) + pad for col in columns]
+        newcols_df.columns = pd.MultiIndex.from_tuples(columns, names=df.columns.names)
+    return pd.concat([df, newcols_df], axis=1)
+
+
 def generate_flag(df: pd.DataFrame, target_col: tuple, tag: str,
                   upperlim_col: tuple, lowerlim_col: tuple, criterion_col=None):
     """Calculate flag where 1=True (outlier) and 0=False (no outlier)"""
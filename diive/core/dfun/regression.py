@@ -1,8 +1,3 @@
-from statsmodels.formula import api as smf
-
-
-# import statsmodels.formula.api as smf
-
 def linear(df):
     """
     Perform simple linear regression
@@ -33,6 +28,8 @@ def linear(df):
         Adjusted rsquared for regression equation.
 
     """
+    from statsmodels.formula import api as smf
+
     # Data
     df_no_nan = df.copy()
     df_no_nan.dropna(inplace=True)
@@ -1,3 +1,7 @@
 from . import dirs
+from . import parsecache
+from . import sniff
 from . import filereader
 from . import files
+from . import ingest
+from . import stream
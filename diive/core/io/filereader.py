@@ -4,9 +4,14 @@ FILEREADER
 This package is part of the diive library.
 
 """
+import copy
 import datetime
 import fnmatch
+import io
 import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Literal
 
@@ -18,6 +23,8 @@ from pandas import DataFrame
 from diive import core
 from diive.configs.filetypes import get_filetypes
 from diive.core import dfun
+from diive.core.io.parsecache import ParseCache
+from diive.core.io.sniff import sniff_header
 from diive.core.times.times import continuous_timestamp_freq, TimestampSanitizer
 
 
@@ -38,6 +45,30 @@ def search_files(searchdirs: str or list, pattern: str) -> list:
     return foundfiles
 
 
+def read_zip_member(filepath: str or Path, pattern: str = '*.csv') -> tuple[str, bytes]:
+    """
+    Read first member of zip archive that matches *pattern* into memory
+
+    The member is decompressed straight into memory, no temporary files are
+    written (see `unzip_file` for the extract-to-disk alternative).
+
+    Args:
+        filepath: Path to zip archive
+        pattern: Pattern of the member name, e.g. '*.csv'. If no member matches,
+            the first member is read.
+
+    Returns:
+        name and decompressed content of member
+    """
+    with zipfile.ZipFile(filepath, 'r') as zf:
+        names = zf.namelist()
+        if not names:
+            raise pandas.errors.EmptyDataError(f"Zip archive {filepath} is empty.")
+        matching = fnmatch.filter(names, pattern)
+        member = matching[0] if matching else names[0]
+        return member, zf.read(member)
+
+
 class ConfigFileReader:
     """
     Load and validate configuration from YAML file and store in dict
@@ -70,6 +101,51 @@ class ConfigFileReader:
         return config
 
 
+@lru_cache(maxsize=1)
+def _available_filetypes() -> dict:
+    """Filetypes and paths to their YAML files, listed once per process"""
+    return get_filetypes()
+
+
+@lru_cache(maxsize=None)
+def _compiled_filetypeconfig(configfilepath: str, mtime_ns: int) -> dict:
+    """Read and validate YAML file, cached for each file version"""
+    return ConfigFileReader(configfilepath=configfilepath, validation='filetype').read()
+
+
+def get_filetypeconfig(filetype: str) -> dict:
+    """
+    Validated settings for *filetype* from the process-wide filetype registry
+
+    Each filetype YAML file is read and validated only once per process, later
+    calls return a copy of the cached settings. A YAML file that was changed
+    since it was read (modification time) is read again. Worker processes
+    build their own registry on first use.
+
+    Args:
+        filetype: Name of the filetype, e.g. 'TOA5_DAT_1MIN'
+
+    Returns:
+        dict with filetype settings, the same as `ConfigFileReader(..., validation='filetype').read()`
+    """
+    filetypes = _available_filetypes()
+    if filetype not in filetypes:
+        # Filetype might have been added after the registry was built
+        _available_filetypes.cache_clear()
+        filetypes = _available_filetypes()
+    configfilepath = filetypes[filetype]
+    config = _compiled_filetypeconfig(configfilepath=str(configfilepath),
+                                      mtime_ns=os.stat(configfilepath).st_mtime_ns)
+    # Copy, callers may change the settings
+    return copy.deepcopy(config)
+
+
+def clear_filetype_registry():
+    """Remove all cached filetype settings"""
+    _available_filetypes.cache_clear()
+    _compiled_filetypeconfig.cache_clear()
+
+
 def validate_filetype_config(config: dict):
     """Convert to required types"""
 
@@ -108,9 +184,36 @@ def validate_filetype_config(config: dict):
     config['DATA']['FREQUENCY'] = str(config['DATA']['FREQUENCY'])
     config['DATA']['DELIMITER'] = str(config['DATA']['DELIMITER'])
 
+    # Optional: only read these variables, all variables if not given
+    usecols = config['DATA'].get('USECOLS', None)
+    config['DATA']['USECOLS'] = [str(c) for c in usecols] if usecols else None
+
+    # Optional: dtypes of variables, e.g. { 'FLAG_X': 'Int8', 'FILENAME': 'category' }
+    dtypes = config['DATA'].get('DTYPES', None)
+    config['DATA']['DTYPES'] = _convert_dtypes(dtypes=dtypes) if dtypes else None
+
     return config
 
 
+def _convert_dtypes(dtypes: dict) -> dict:
+    """Convert dtypes given in YAML to pandas dtypes
+
+    In addition to the pandas dtype names, 'categorical' is accepted for 'category'.
+    """
+    converted = {}
+    for var, dtype in dtypes.items():
+        dtype = str(dtype)
+        dtype = 'category' if dtype == 'categorical' else dtype
+        pd.api.types.pandas_dtype(dtype)  # Raises TypeError if dtype is not known
+        converted[str(var)] = dtype
+    return converted
+
+
+def _varname(col) -> str:
+    """Variable name of column, also for column tuples (varname, units)"""
+    return col[0] if isinstance(col, tuple) else col
+
+
 def _convert_timestamp_idx_col(var: int or list):
     """Convert to list of tuples if needed
 
@@ -215,18 +318,54 @@ class ColumnNamesSanitizer:
 class MultiDataFileReader:
     """Read and merge multiple datafiles of the same filetype"""
 
-    def __init__(self, filepaths: list, filetype: str, output_middle_timestamp: bool = True):
+    def __init__(self, filepaths: list, filetype: str, output_middle_timestamp: bool = True,
+                 parse_engine: Literal['auto', 'c', 'python'] = 'auto',
+                 n_workers: int = 1,
+                 keep: Literal['first', 'last'] = 'first',
+                 cache: ParseCache = None):
+        """
+
+        Args:
+            filepaths: List of filepaths to files of the same filetype
+            filetype: Filetype of the files, e.g. 'EDDYPRO_FLUXNET_30MIN'
+            output_middle_timestamp: Convert timestamp index to show middle of averaging period
+            parse_engine: Parser engine, see `DataFileReader`
+            n_workers: Number of worker processes used to parse files in parallel.
+                With *1*, files are read one after the other in the current process.
+            keep: Which value is kept when the same timestamp is found in more than one file
+                - 'first': keep the value from the file that comes first in *filepaths*
+                - 'last': keep the value from the file that comes last in *filepaths*
+                Values are merged column by column: missing values, and variables that are
+                not in the kept file, are filled from the other files. The merged data are built
+                in one single concatenation of all files. Metadata of variables found in more
+                than one file are taken from the first file.
+            cache: Optional on-disk cache for parsed files, see `ReadFileType`
+        """
 
         # Getting configs for filetype
-        configfilepath = get_filetypes()[filetype]
-        self.filetypeconfig = ConfigFileReader(configfilepath=configfilepath, validation='filetype').read()
+        self.filetypeconfig = get_filetypeconfig(filetype=filetype)
         self.filepaths = filepaths
         self.output_middle_timestamp = output_middle_timestamp
+        self.parse_engine = parse_engine
+        self.n_workers = n_workers
+        self.keep = keep
+        self.cache = cache
+
+        # Parser engine used for each file, filepath as key
+        self.parse_engines_used = {}
+
+        # First and last timestamp found in each file, filepath as key
+        self.file_timestamps = {}
+
+        # Number of records found in each file, filepath as key, 0 for empty files
+        self.file_records = {}
 
         # Collect data from all files listed in filepaths
         self._data_df, self._metadata_df = self._get_incoming_data()
 
-        self._data_df = continuous_timestamp_freq(data=self._data_df, freq=self.filetypeconfig['DATA']['FREQUENCY'])
+        if isinstance(self._data_df, DataFrame):
+            self._data_df = continuous_timestamp_freq(data=self._data_df,
+                                                      freq=self.filetypeconfig['DATA']['FREQUENCY'])
 
     @property
     def data_df(self):
@@ -242,37 +381,76 @@ class MultiDataFileReader:
             raise Exception('metadata is empty')
         return self._metadata_df
 
-    def _get_incoming_data(self) -> tuple[DataFrame, DataFrame]:
-        """Merge data across all files"""
-        data_df = None
-        metadata_df = None
-        for filepath in self.filepaths:
-            # print(f"\n{'-' * 40}\nReading file {filepath.stem}\n{'-' * 40}")
-            try:
-                incoming_data_df, incoming_metadata_df = \
-                    ReadFileType(filepath=filepath, filetypeconfig=self.filetypeconfig,
-                                 output_middle_timestamp=self.output_middle_timestamp).get_filedata()
-                data_df, metadata_df = \
-                    self._merge_with_existing(incoming_data_df=incoming_data_df, data_df=data_df,
-                                              incoming_metadata_df=incoming_metadata_df, metadata_df=metadata_df)
-            except pandas.errors.EmptyDataError:
+    def _get_incoming_data(self) -> tuple[DataFrame, DataFrame] or tuple[None, None]:
+        """Merge data across all files, *None* if all files are empty"""
+        kwargs = dict(filetypeconfig=self.filetypeconfig,
+                      output_middle_timestamp=self.output_middle_timestamp,
+                      parse_engine=self.parse_engine,
+                      cache=self.cache)
+        if self.n_workers > 1:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                futures = [executor.submit(_read_single_file, filepath=fp, **kwargs) for fp in self.filepaths]
+                results = [f.result() for f in futures]  # Same order as filepaths
+        else:
+            results = [_read_single_file(filepath=fp, **kwargs) for fp in self.filepaths]
+
+        data_dfs = []
+        metadata_dfs = []
+        for filepath, result in zip(self.filepaths, results):
+            if not result or result[0].empty:
+                # Empty file, or header without data
+                self.file_records[str(filepath)] = 0
                 continue
+            incoming_data_df, incoming_metadata_df, parse_engine_used = result
+            self.file_records[str(filepath)] = len(incoming_data_df)
+            data_dfs.append(incoming_data_df)
+            metadata_dfs.append(incoming_metadata_df)
+            self.parse_engines_used[str(filepath)] = parse_engine_used
+            self.file_timestamps[str(filepath)] = (incoming_data_df.index[0], incoming_data_df.index[-1])
+
+        if not data_dfs:
+            return None, None
+        data_df, metadata_df = self._merge(data_dfs=data_dfs, metadata_dfs=metadata_dfs)
         data_df = dfun.frames.sort_multiindex_columns_names(df=data_df, priority_vars=None)
         return data_df, metadata_df
 
-    def _merge_with_existing(self,
-                             incoming_data_df: DataFrame, data_df: DataFrame,
-                             incoming_metadata_df: DataFrame, metadata_df: DataFrame
-                             ) -> tuple[DataFrame, DataFrame]:
-        if not isinstance(data_df, DataFrame):
-            data_df = incoming_data_df.copy()
-            metadata_df = incoming_metadata_df.copy()
-        else:
-            data_df = data_df.combine_first(incoming_data_df)
-            metadata_df = metadata_df.combine_first(incoming_metadata_df)
+    def _merge(self, data_dfs: list, metadata_dfs: list) -> tuple[DataFrame, DataFrame]:
+        """Merge data from all files in one single pass
+
+        All files are concatenated at once, then records with duplicate
+        timestamps are merged column by column: per column, the first or last
+        available value is kept according to *keep*.
+        """
+        data_df = pd.concat(data_dfs, axis=0, sort=False)
+        duplicated = data_df.index.duplicated(keep=False)
+        if duplicated.any():
+            # Only records with duplicate timestamps are grouped
+            overlaps = data_df[duplicated].groupby(level=0, sort=False)
+            overlaps = overlaps.first() if self.keep == 'first' else overlaps.last()
+            data_df = pd.concat([data_df[~duplicated], overlaps], axis=0)
+        data_df = data_df.sort_index()
+        metadata_df = pd.concat(metadata_dfs, axis=0, sort=False)
+        metadata_df = metadata_df[~metadata_df.index.duplicated(keep='first')]
         return data_df, metadata_df
 
 
+def _read_single_file(filepath: str or Path, filetypeconfig: dict, output_middle_timestamp: bool,
+                      parse_engine: str, cache: ParseCache = None) -> tuple[DataFrame, DataFrame, str] or None:
+    """Read one file with *ReadFileType*, returns *None* for empty files
+
+    Defined at module level so that it can be sent to worker processes.
+    """
+    try:
+        rft = ReadFileType(filepath=filepath, filetypeconfig=filetypeconfig,
+                           output_middle_timestamp=output_middle_timestamp,
+                           parse_engine=parse_engine,
+                           cache=cache)
+    except pandas.errors.EmptyDataError:
+        return None
+    data_df, metadata_df = rft.get_filedata()
+    return data_df, metadata_df, rft.parse_engine_used
+
+
 class ReadFileType:
     """Read single data file using settings from dictionary for specified filetype"""
 
@@ -281,31 +459,63 @@ class ReadFileType:
                  filetypeconfig: dict = None,
                  filetype: str = None,
                  data_nrows: int = None,
-                 output_middle_timestamp: bool = True):
+                 output_middle_timestamp: bool = True,
+                 parse_engine: Literal['auto', 'c', 'python'] = 'auto',
+                 cache: ParseCache = None,
+                 usecols: list = None,
+                 dtypes: dict = None):
         """
 
         Args:
             filepath:
             filetypeconfig:
             filetype:
+            parse_engine: Parser engine, see `DataFileReader`
+            usecols: Only read these variables, overrides DATA.USECOLS in the filetype settings
+            dtypes: Dtypes of variables, overrides DATA.DTYPES in the filetype settings
+            cache: Optional on-disk cache for parsed files (opt-in). If the file was
+                already parsed with the same filetype settings and has not changed
+                since, data are loaded from the cache and *parse_engine_used* is 'cache'.
         """
         self.filepath = Path(filepath)
         self.data_nrows = data_nrows
         self.output_middle_timestamp = output_middle_timestamp
+        self.parse_engine = parse_engine
+        self.cache = cache
+        self.parse_engine_used = None
 
         if filetype:
-            # Read settins for specified filetype
-            _available_filetypes = get_filetypes()
-            self.filetypeconfig = ConfigFileReader(_available_filetypes[filetype], validation='filetype').read()
+            # Settings for specified filetype from registry
+            self.filetypeconfig = get_filetypeconfig(filetype=filetype)
         else:
             # Use provided settings dict
             self.filetypeconfig = filetypeconfig
 
-        self.data_df, self.metadata_df = self._readfile()
+        self.usecols = usecols if usecols else self.filetypeconfig['DATA'].get('USECOLS', None)
+        self.dtypes = dtypes if dtypes else self.filetypeconfig['DATA'].get('DTYPES', None)
+
+        if self.cache:
+            self.data_df, self.metadata_df = self._readfile_cached()
+        else:
+            self.data_df, self.metadata_df = self._readfile()
 
     def get_filedata(self) -> tuple[DataFrame, DataFrame]:
         return self.data_df, self.metadata_df
 
+    def _readfile_cached(self) -> tuple[DataFrame, DataFrame]:
+        """Load data from cache, parse file and add to cache if not yet cached"""
+        key = self.cache.key(filepath=self.filepath, filetypeconfig=self.filetypeconfig,
+                             data_nrows=self.data_nrows, output_middle_timestamp=self.output_middle_timestamp,
+                             usecols=self.usecols, dtypes=self.dtypes)
+        cached = self.cache.load(key=key)
+        if cached:
+            self.parse_engine_used = 'cache'
+            print(f"Loaded file {self.filepath.name} from cache.")
+            return cached
+        data_df, metadata_df = self._readfile()
+        self.cache.save(key=key, data_df=data_df, metadata_df=metadata_df, filepath=self.filepath)
+        return data_df, metadata_df
+
     def _readfile(self) -> tuple[DataFrame, DataFrame]:
         """Load data"""
         print(f"Reading file {self.filepath.name} ...")
@@ -322,9 +532,14 @@ class ReadFileType:
             timestamp_datetime_format=self.filetypeconfig['TIMESTAMP']['DATETIME_FORMAT'],
             timestamp_start_middle_end=self.filetypeconfig['TIMESTAMP']['SHOWS_START_MIDDLE_OR_END_OF_RECORD'],
             output_middle_timestamp=self.output_middle_timestamp,
-            compression=self.filetypeconfig['FILE']['COMPRESSION']
+            compression=self.filetypeconfig['FILE']['COMPRESSION'],
+            parse_engine=self.parse_engine,
+            data_usecols=self.usecols,
+            data_dtypes=self.dtypes
         )
         data_df, metadata_df = datafilereader.get_data()
+        self.parse_engine_used = datafilereader.parse_engine_used
+        print(f"Parsed file {self.filepath.name} using the {self.parse_engine_used} engine.")
         return data_df, metadata_df
 
 
@@ -345,8 +560,30 @@ class DataFileReader:
             timestamp_datetime_format: str = None,
             timestamp_start_middle_end: str = 'END',
             output_middle_timestamp: bool = True,
-            compression: str = None
+            compression: str = None,
+            parse_engine: Literal['auto', 'c', 'python'] = 'auto',
+            data_usecols: list = None,
+            data_dtypes: dict = None
     ):
+        """
+
+        Args:
+            data_usecols: Variable names of the columns that are read, all other columns
+                are skipped during parsing. Timestamp columns are always read. If *None*,
+                all columns are read.
+            data_dtypes: Dict of variable names and their dtype, e.g. {'TA': 'float32',
+                'FLAG': 'Int8', 'FILENAME': 'category'}. Variables with a dtype are parsed
+                with this dtype and are not converted to numeric afterwards. For flags
+                the nullable integer dtypes (e.g. 'Int8') are recommended, they can hold
+                missing values.
+            parse_engine: Parser engine used by `pd.read_csv`
+                - 'auto': try the fast C engine first and fall back to the python
+                    engine if the C engine fails or if the file needs it, e.g. if
+                    there are more data columns than header columns (default)
+                - 'c': C engine only
+                - 'python': python engine only (slow, but most tolerant)
+                The engine that was finally used is stored in *parse_engine_used*.
+        """
 
         self.filepath = filepath
         self.data_skiprows = data_skiprows
@@ -361,16 +598,26 @@ class DataFileReader:
         self.timestamp_idx_col = timestamp_idx_col
         self.output_middle_timestamp = output_middle_timestamp
         self.compression = compression
+        self.parse_engine = parse_engine
+        self.data_usecols = data_usecols
+        self.data_dtypes = data_dtypes
 
         self.data_df = pd.DataFrame()
         self.metadata_df = pd.DataFrame()
         self.generated_missing_header_cols_list = []
+        self.parse_engine_used = None
+        self._content = None  # Decompressed content of zipped file
 
         self._read()
 
     def _read(self):
+        if self.compression == 'zip':
+            # Zip member is decompressed into memory once, header sniffing and
+            # parsing (and a possible parser fallback) then read from memory
+            _, self._content = read_zip_member(filepath=self.filepath)
         headercols_list, self.generated_missing_header_cols_list = self._compare_len_header_vs_data()
         self.data_df = self._parse_file(headercols_list=headercols_list)
+        self._content = None
         if self.timestamp_idx_col:
             self.data_df = TimestampSanitizer(data=self.data_df,
                                               output_middle_timestamp=self.output_middle_timestamp).get()
@@ -437,12 +684,16 @@ class DataFileReader:
         of the first data row and the length of the header row(s) can be used to
         automatically generate names for the missing header columns.
         """
-        num_headercols, headercols_list = dfun.frames.get_len_header(filepath=self.filepath,
-                                                                     skiprows=self.data_skiprows,
-                                                                     headerrows=self.data_headerrows)
-        num_datacols = dfun.frames.get_len_data(filepath=self.filepath,
-                                                skiprows=self.data_skiprows,
-                                                headerrows=self.data_headerrows)
+        # Header rows and first data row are read in one pass, the header layout
+        # is cached for files with the same header in the same folder
+        sniffed = sniff_header(filepath=self.filepath,
+                               skiprows=self.data_skiprows,
+                               headerrows=self.data_headerrows,
+                               delimiter=self.data_delimiter,
+                               compression=self.compression,
+                               content=self._content)
+        num_headercols, headercols_list = sniffed.num_headercols, sniffed.headercols
+        num_datacols = sniffed.num_datacols
 
         # Check if there are more data columns than header columns
         more_data_cols_than_header_cols = False
@@ -471,7 +722,12 @@ class DataFileReader:
         # Not too problematic in case of 'date', b/c the index contains the datetime info.
         # todo For now, columns that contain only NaNs are still in the df.
         # todo at some point, the string columns should also be considered
-        self.data_df = self.data_df.apply(pd.to_numeric, errors='coerce')
+        # Variables with an explicitly given dtype are kept as they are.
+        if self.data_dtypes:
+            convertcols = [c for c in self.data_df.columns if _varname(c) not in self.data_dtypes]
+            self.data_df[convertcols] = self.data_df[convertcols].apply(pd.to_numeric, errors='coerce')
+        else:
+            self.data_df = self.data_df.apply(pd.to_numeric, errors='coerce')
 
     def _configure_timestamp_parsing(self):
         """Configure column settings for parsing dates / times correctly."""
@@ -504,8 +760,18 @@ class DataFileReader:
         if self.timestamp_idx_col:
             parse_dates, parsed_index_col, _temp_parsed_index_col = self._configure_timestamp_parsing()
 
-        data_df = pd.read_csv(
-            self.filepath,
+        usecols = None
+        if self.data_usecols:
+            usecols, parse_dates = self._configure_usecols(headercols_list=headercols_list,
+                                                           parse_dates=parse_dates,
+                                                           _temp_parsed_index_col=_temp_parsed_index_col)
+
+        dtype = None
+        if self.data_dtypes:
+            dtype = {col: self.data_dtypes[_varname(col)] for col in headercols_list
+                     if _varname(col) in self.data_dtypes}
+
+        readcsv_kwargs = dict(
             skiprows=self.data_headersection_rows,
             header=None,
             names=headercols_list,
@@ -518,13 +784,27 @@ class DataFileReader:
             # date_parser=date_parser,  # deprecated since pandas 2.0
             date_format=self.timestamp_datetime_format,
             index_col=None,
-            dtype=None,
+            usecols=usecols,
+            dtype=dtype,
             skip_blank_lines=True,
             nrows=self.data_nrows,
-            engine='python',  # todo 'python', 'c'
-            compression=self.compression
+            compression=None if self._content is not None else self.compression
         )
 
+        data_df = None
+        engines = self._parse_engines()
+        for engine in engines:
+            try:
+                source = io.BytesIO(self._content) if self._content is not None else self.filepath
+                data_df = pd.read_csv(source, engine=engine, **readcsv_kwargs)
+                self.parse_engine_used = engine
+                break
+            except (pandas.errors.ParserError, ValueError) as e:
+                if engine == engines[-1]:
+                    raise
+                print(f"(!)Parsing file {self.filepath.name} with the {engine} engine failed ({e}), "
+                      f"falling back to {engines[-1]} engine ...")
+
         if self.timestamp_idx_col:
             # Rename temporary column name for parsed index to correct name (v0.41.0)
             data_df = dfun.frames.rename_cols(df=data_df, renaming_dict={_temp_parsed_index_col: parsed_index_col})
@@ -535,6 +815,40 @@ class DataFileReader:
 
         return data_df
 
+    def _configure_usecols(self, headercols_list: list, parse_dates: dict,
+                           _temp_parsed_index_col: str) -> tuple[list, dict]:
+        """Positions of columns that are read, timestamp columns are always read
+
+        Positions are used because `pd.read_csv` does not accept column tuples in
+        *usecols*. Timestamp columns given as positions are converted to column names,
+        since positions in *parse_dates* refer to the selected columns only.
+        """
+        missing = set(self.data_usecols) - set(_varname(c) for c in headercols_list)
+        if missing:
+            raise KeyError(f"Columns {sorted(missing)} from usecols not found in file {self.filepath.name}.")
+
+        timestampcols = []
+        if parse_dates:
+            timestampcols = [headercols_list[c] if isinstance(c, int) else c
+                             for c in parse_dates[_temp_parsed_index_col]]
+            parse_dates = {_temp_parsed_index_col: timestampcols}
+
+        usecols = [ix for ix, col in enumerate(headercols_list)
+                   if (col in timestampcols) or (_varname(col) in self.data_usecols)]
+        return usecols, parse_dates
+
+    def _parse_engines(self) -> list:
+        """Parser engines to try, in this order"""
+        if self.parse_engine == 'python':
+            return ['python']
+        if self.parse_engine == 'c':
+            return ['c']
+        # The C engine cannot deal with rows that have more data columns than the
+        # header, these files are parsed with the python engine right away
+        if self.generated_missing_header_cols_list:
+            return ['python']
+        return ['c', 'python']
+
     # def _standardize_timestamp_index(self):
     #     """Standardize timestamp index column"""
     #
@@ -573,6 +887,49 @@ def example_icosfile():
     # origmeta = orig.metadata_df
 
 
+def benchmark_zip_reading(filepaths: list = None, filetype: str = 'ICOS_H2R_CSVZIP_10S',
+                          repeats: int = 5, n_workers: int = 1) -> DataFrame:
+    """Compare reading zipped files from memory with extracting them to temporary files first"""
+    import shutil
+    import time
+    from diive.configs.exampledata import DIR_PATH
+    from diive.core.io.files import unzip_file
+
+    if not filepaths:
+        filepaths = [Path(DIR_PATH) / 'CH-Dav_BM_20230328_L02_F03.zip']
+    filetypeconfig = get_filetypeconfig(filetype=filetype)
+    unzipped_filetypeconfig = get_filetypeconfig(filetype=filetype)
+    unzipped_filetypeconfig['FILE']['COMPRESSION'] = None
+
+    def read_tempfiles():
+        for filepath in filepaths:
+            unzipped_filepath, tempdir = unzip_file(filepath=filepath)
+            try:
+                ReadFileType(filepath=unzipped_filepath, filetypeconfig=unzipped_filetypeconfig)
+            finally:
+                shutil.rmtree(tempdir)
+
+    def read_memory():
+        if n_workers > 1:
+            MultiDataFileReader(filepaths=filepaths, filetype=filetype, n_workers=n_workers)
+        else:
+            for filepath in filepaths:
+                ReadFileType(filepath=filepath, filetypeconfig=filetypeconfig)
+
+    results = {}
+    for name, func in {'extract to temporary files': read_tempfiles, 'read from memory': read_memory}.items():
+        durations = []
+        for _ in range(repeats):
+            tic = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - tic)
+        durations = pd.Series(durations)
+        results[name] = {'MEDIAN_SECONDS': durations.median(), 'MIN_SECONDS': durations.min()}
+    results = pd.DataFrame(results).T
+    print(results)
+    return results
+
+
 def example_ep_fluxnet():
     from diive.core.times.times import insert_timestamp, format_timestamp_to_fluxnet_format
 
@@ -1,10 +1,16 @@
+import json
 import os
 import pickle
 import time
 import zipfile as zf
 from pathlib import Path
 
-from pandas import Series, DataFrame, read_parquet
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pandas import Series, DataFrame
+
+from diive.core.io.dirs import verify_dir
 
 from diive.core.io.filereader import MultiDataFileReader
 from diive.core.times.times import TimestampSanitizer
@@ -19,7 +25,8 @@ def set_outpath(outpath: str or None, filename: str, fileextension: str):
     return filepath
 
 
-def save_parquet(filename: str, data: DataFrame or Series, outpath: str or None = None) -> str:
+def save_parquet(filename: str, data: DataFrame or Series, outpath: str or None = None,
+                 partitioned: bool = False, row_group_size: int = None) -> str:
     """
     Save pandas Series or DataFrame as parquet file
 
@@ -30,39 +37,150 @@ def save_parquet(filename: str, data: DataFrame or Series, outpath: str or None
         outpath: str or None
             If *None*, file is saved to system default folder. When used within
             a notebook, the file is saved in the same location as the notebook.
+        partitioned: bool
+            If *True*, data are saved as dataset partitioned by year and month:
+            folder *filename*.parquet with one file per month in the subfolders
+            'year=YYYY/month=MM'. Loading a time range with `load_parquet` then
+            only reads the required partitions.
+        row_group_size: int or None
+            Maximum number of records per row group. Each row group stores statistics
+            (min/max) of the timestamp, `load_parquet` skips row groups outside the
+            requested time range. Smaller row groups allow finer selection of time
+            ranges. If *None*, the pyarrow default is used.
 
     Returns:
-        str, filepath to parquet file
+        str, filepath to parquet file (or folder if *partitioned*)
     """
     filepath = set_outpath(outpath=outpath, filename=filename, fileextension='parquet')
     tic = time.time()
-    data.to_parquet(filepath)
+    if isinstance(data, Series):
+        data = data.to_frame()
+    if partitioned:
+        _save_parquet_partitioned(data=data, dirpath=Path(filepath), row_group_size=row_group_size)
+    else:
+        data.to_parquet(filepath, row_group_size=row_group_size)
     toc = time.time() - tic
     print(f"Saved file {filepath} ({toc:.3f} seconds).")
     return str(filepath)
 
 
-def load_parquet(filepath: str or Path) -> DataFrame:
+def _save_parquet_partitioned(data: DataFrame, dirpath: Path, row_group_size: int = None):
+    """Save data as parquet dataset with one file per year and month"""
+    # Remove partitions from earlier saves, otherwise months that are not in *data* would remain
+    for oldfile in dirpath.glob('year=*/month=*/data.parquet'):
+        oldfile.unlink()
+    for (year, month), partition_df in data.groupby([data.index.year, data.index.month]):
+        partitiondir = dirpath / f'year={year}' / f'month={month:02d}'
+        verify_dir(partitiondir)
+        partition_df.to_parquet(partitiondir / 'data.parquet', row_group_size=row_group_size)
+
+
+def load_parquet(filepath: str or Path,
+                 start: str = None,
+                 end: str = None,
+                 columns: list = None,
+                 sanitize_timestamp: bool = True) -> DataFrame:
     """
     Load data from Parquet file to pandas DataFrame
 
+    The time range and columns are passed to pyarrow, only row groups (and partitions
+    if the data were saved with *partitioned=True*) that overlap with the time range
+    and only the requested columns are read from disk.
+
     Args:
         filepath: str
-            filepath to parquet file
+            filepath to parquet file, or to folder of partitioned parquet dataset
+        start: str or None
+            Only load data with timestamp >= *start*, e.g. '2022-07-01'. Ignored for
+            files without timestamp index.
+        end: str or None
+            Only load data with timestamp <= *end*, e.g. '2022-07-31 23:59'. Ignored for
+            files without timestamp index.
+        columns: list or None
+            Only load these columns, all columns if *None*
+        sanitize_timestamp: bool
+            If *True*, the timestamp is checked with `TimestampSanitizer`, which
+            also detects the time resolution (this info is lost in parquet files)
 
     Returns:
         pandas DataFrame, data from Parquet file as pandas DataFrame
     """
     tic = time.time()
-    df = read_parquet(filepath)
+    partitioned = Path(filepath).is_dir()
+    dataset = ds.dataset(filepath, format='parquet', partitioning='hive' if partitioned else None)
+    if partitioned:
+        # Partitions can have different columns, e.g. when variables were added later
+        schema = pa.unify_schemas([dataset.schema] + [f.physical_schema for f in dataset.get_fragments()])
+        dataset = ds.dataset(filepath, schema=schema, format='parquet', partitioning='hive')
+    index_col = _timestamp_index_col(schema=dataset.schema)
+
+    # Timestamp index is needed to restore the index
+    if columns is not None and index_col:
+        columns = [index_col] + [c for c in columns if c != index_col]
+
+    # Time range is only passed to pyarrow when the index is stored as timestamp column,
+    # otherwise (e.g. files written without pandas) it is selected after loading
+    filter_expr = None
+    if (start or end) and index_col:
+        filter_expr = _timerange_filter(schema=dataset.schema, index_col=index_col, start=start, end=end,
+                                        partitioned=partitioned)
+
+    table = dataset.to_table(columns=columns, filter=filter_expr)
+    if partitioned:
+        # Partition keys are not part of the data
+        table = table.drop([c for c in ['year', 'month'] if c in table.column_names])
+    df = table.to_pandas()
+    if (start or end) and not index_col and isinstance(df.index, pd.DatetimeIndex):
+        df = df.sort_index().loc[start:end]
     toc = time.time() - tic
-    # Check timestamp, also detects frequency of time series, this info was lost when saving to the parquet file
-    df = TimestampSanitizer(data=df).get()
-    print(f"Loaded .parquet file {filepath} ({toc:.3f} seconds). "
-          f"Detected time resolution of {df.index.freq} / {df.index.freqstr} ")
+    if sanitize_timestamp:
+        # Check timestamp, also detects frequency of time series, this info was lost when saving to the parquet file
+        df = TimestampSanitizer(data=df).get()
+    if isinstance(df.index, pd.DatetimeIndex):
+        print(f"Loaded .parquet file {filepath} ({toc:.3f} seconds). "
+              f"Detected time resolution of {df.index.freq} / {df.index.freqstr} ")
+    else:
+        print(f"Loaded .parquet file {filepath} ({toc:.3f} seconds), without timestamp index.")
     return df
 
 
+def _timestamp_index_col(schema) -> str or None:
+    """Name of the column in *schema* that stores the pandas timestamp index, *None* if there is none
+
+    Files written without pandas have no pandas metadata, and a RangeIndex is
+    stored as metadata only (not as column).
+    """
+    if not schema.metadata or b'pandas' not in schema.metadata:
+        return None
+    index_columns = json.loads(schema.metadata[b'pandas']).get('index_columns', [])
+    if len(index_columns) != 1 or not isinstance(index_columns[0], str):
+        return None
+    index_col = index_columns[0]
+    if schema.get_field_index(index_col) < 0 or not pa.types.is_timestamp(schema.field(index_col).type):
+        return None
+    return index_col
+
+
+def _timerange_filter(schema, index_col: str, start: str = None, end: str = None, partitioned: bool = False):
+    """Filter expression for timestamp range, also used to skip partitions and row groups"""
+    expr = None
+    timestamp_type = schema.field(index_col).type
+    if start:
+        start = pd.Timestamp(start)
+        expr = ds.field(index_col) >= pa.scalar(start, type=timestamp_type)
+        if partitioned:
+            expr = expr & ((ds.field('year') > start.year)
+                           | ((ds.field('year') == start.year) & (ds.field('month') >= start.month)))
+    if end:
+        end = pd.Timestamp(end)
+        end_expr = ds.field(index_col) <= pa.scalar(end, type=timestamp_type)
+        if partitioned:
+            end_expr = end_expr & ((ds.field('year') < end.year)
+                                   | ((ds.field('year') == end.year) & (ds.field('month') <= end.month)))
+        expr = end_expr if expr is None else expr & end_expr
+    return expr
+
+
 def save_as_pickle(outpath: str or None, filename: str, data) -> str:
     """Save data as pickle"""
     filepath = set_outpath(outpath=outpath, filename=filename, fileextension='pickle')
@@ -93,6 +211,9 @@ def unzip_file(filepath):
 
         Returns the filepath to the unzipped file and the directory to which
         the zipped file has been extracted to.
+
+        Zipped files that are read with `ReadFileType` are decompressed into
+        memory instead, see `diive.core.io.filereader.read_zip_member`.
     """
     with zf.ZipFile(filepath, 'r') as zip_ref:
         # dir as string, w/ .amp.temp at the end of dir name
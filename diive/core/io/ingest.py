@@ -0,0 +1,211 @@
+"""
+INGEST
+======
+This package is part of the diive library.
+
+Incremental ingestion of raw data files into a persistent parquet store.
+
+"""
+import datetime
+from pathlib import Path
+from typing import Literal
+
+import pandas as pd
+from pandas import DataFrame
+
+from diive.core.io.dirs import verify_dir
+from diive.core.io.filereader import MultiDataFileReader, get_filetypeconfig
+from diive.core.io.files import load_parquet
+from diive.core.io.parsecache import ParseCache
+from diive.core.times.times import continuous_timestamp_freq
+
+MANIFEST_COLS = ['FILEPATH', 'SIZE', 'MTIME_NS', 'N_RECORDS', 'FIRST_TIMESTAMP', 'LAST_TIMESTAMP', 'INGESTED']
+
+
+class IncrementalIngestion:
+    """
+    Ingest files of one filetype into a persistent parquet store, only new or changed files are parsed
+
+    The store in *storedir* contains:
+        - `_manifest.csv`: one row per ingested file with filepath, size, modification
+            time, number of records and first/last timestamp of the data in the file.
+            Files without data are listed with 0 records, they are not parsed again
+            unless they change.
+        - `_varmetadata.parquet`: metadata of all ingested variables
+        - `year=YYYY/month=MM/data.parquet`: data, partitioned by year and month
+
+    When `update()` is called, files that are not in the manifest, or whose size or
+    modification time has changed, are parsed. Their data are merged into the
+    year/month partitions they cover, all other partitions are not touched. Updating
+    a large archive with a few new files therefore only costs time proportional to
+    the new data.
+
+    If the same timestamp is found in already stored data and in newly ingested
+    data, values from the newly ingested data are used (missing values in the new
+    data do not overwrite stored values).
+
+    Example:
+        ingestion = IncrementalIngestion(storedir=r"F:\\store\\CH-DAV_TOA5", filetype='TOA5_DAT_1MIN')
+        filepaths = search_files(searchdirs=r"F:\\rawdata", pattern='*.dat')
+        ingestion.update(filepaths=filepaths)  # Daily, only parses new files
+        df = ingestion.load()
+
+    """
+
+    def __init__(self,
+                 storedir: str or Path,
+                 filetype: str,
+                 output_middle_timestamp: bool = True,
+                 parse_engine: Literal['auto', 'c', 'python'] = 'auto',
+                 n_workers: int = 1,
+                 cache: ParseCache = None):
+        """
+        Args:
+            storedir: Folder of the parquet store, created if needed
+            filetype: Filetype of the ingested files, e.g. 'TOA5_DAT_1MIN'
+            output_middle_timestamp: Convert timestamp index to show middle of averaging period
+            parse_engine: Parser engine, see `DataFileReader`
+            n_workers: Number of worker processes used to parse new files, see `MultiDataFileReader`
+            cache: Optional on-disk cache for parsed files, see `ReadFileType`
+        """
+        self.storedir = Path(storedir)
+        self.filetype = filetype
+        self.output_middle_timestamp = output_middle_timestamp
+        self.parse_engine = parse_engine
+        self.n_workers = n_workers
+        self.cache = cache
+
+        self.filetypeconfig = get_filetypeconfig(filetype=filetype)
+
+        # Names starting with '_' are ignored when the partitions are loaded as dataset
+        self.manifestfile = self.storedir / '_manifest.csv'
+        self.metadatafile = self.storedir / '_varmetadata.parquet'
+        verify_dir(self.storedir)
+
+        self._manifest = self._read_manifest()
+
+    @property
+    def manifest(self) -> DataFrame:
+        """Manifest of ingested files"""
+        return self._manifest
+
+    @property
+    def metadata_df(self) -> DataFrame:
+        """Metadata of ingested variables"""
+        if not self.metadatafile.is_file():
+            raise Exception('metadata is empty, no files were ingested yet')
+        metadata_df = pd.read_parquet(self.metadatafile).astype(object)
+        metadata_df['TAGS'] = metadata_df['TAGS'].apply(list)
+        return metadata_df
+
+    def pending_files(self, filepaths: list) -> list:
+        """Files in *filepaths* that are new or have changed since they were ingested"""
+        manifest = self._manifest.set_index('FILEPATH')
+        pending = []
+        for filepath in filepaths:
+            key = str(Path(filepath).resolve())
+            stat = Path(filepath).stat()
+            if key in manifest.index:
+                known = manifest.loc[key]
+                if (known['SIZE'] == stat.st_size) and (known['MTIME_NS'] == stat.st_mtime_ns):
+                    continue
+            pending.append(Path(filepath))
+        return pending
+
+    def update(self, filepaths: list) -> list:
+        """
+        Ingest new or changed files
+
+        Args:
+            filepaths: All files of the archive, e.g. found with `search_files`.
+                Only files that are new or changed are parsed.
+
+        Returns:
+            list of ingested filepaths, files without data are only added to the manifest
+        """
+        pending = self.pending_files(filepaths=filepaths)
+        print(f"Found {len(pending)} new or changed files (of {len(filepaths)} files).")
+        if not pending:
+            return []
+
+        mdfr = MultiDataFileReader(filepaths=pending, filetype=self.filetype,
+                                   output_middle_timestamp=self.output_middle_timestamp,
+                                   parse_engine=self.parse_engine, n_workers=self.n_workers,
+                                   keep='last', cache=self.cache)
+        if mdfr.file_timestamps:
+            self._write_partitions(data_df=mdfr.data_df)
+            self._write_metadata(metadata_df=mdfr.metadata_df)
+        self._update_manifest(file_records=mdfr.file_records, file_timestamps=mdfr.file_timestamps)
+        return [Path(fp) for fp in mdfr.file_timestamps.keys()]
+
+    def load(self, start: str = None, end: str = None, columns: list = None) -> DataFrame:
+        """
+        Load data from the store
+
+        Only partitions and row groups that overlap with the time range, and
+        only the requested columns are read, see `load_parquet`.
+
+        Args:
+            start: Only load data with timestamp >= *start*, e.g. '2022-07-01'
+            end: Only load data with timestamp <= *end*, e.g. '2022-07-31 23:59'
+            columns: Only load these columns, all columns if *None*
+
+        Returns:
+            data with continuous timestamp
+        """
+        if not any(self.storedir.glob('year=*/month=*/data.parquet')):
+            raise Exception('data is empty, no files were ingested yet')
+        data_df = load_parquet(filepath=self.storedir, start=start, end=end, columns=columns,
+                               sanitize_timestamp=False)
+        data_df = data_df.sort_index()
+        return continuous_timestamp_freq(data=data_df, freq=self.filetypeconfig['DATA']['FREQUENCY'])
+
+    def _partitionfile(self, year: int, month: int) -> Path:
+        return self.storedir / f'year={year}' / f'month={month:02d}' / 'data.parquet'
+
+    def _write_partitions(self, data_df: DataFrame):
+        """Merge new data into the year/month partitions they cover"""
+        data_df = data_df.dropna(how='all')
+        groups = data_df.groupby([data_df.index.year, data_df.index.month])
+        for (year, month), new_df in groups:
+            partitionfile = self._partitionfile(year=year, month=month)
+            if partitionfile.is_file():
+                # New values are used where available, stored values otherwise
+                new_df = new_df.combine_first(pd.read_parquet(partitionfile))
+            verify_dir(partitionfile.parent)
+            new_df.to_parquet(partitionfile)
+        print(f"Updated {groups.ngroups} partitions in store {self.storedir}.")
+
+    def _write_metadata(self, metadata_df: DataFrame):
+        """Add metadata of variables that are not yet in the store"""
+        if self.metadatafile.is_file():
+            stored = self.metadata_df
+            metadata_df = pd.concat([stored, metadata_df], axis=0, sort=False)
+            metadata_df = metadata_df[~metadata_df.index.duplicated(keep='first')]
+        metadata_df.to_parquet(self.metadatafile)
+
+    def _read_manifest(self) -> DataFrame:
+        if not self.manifestfile.is_file():
+            return pd.DataFrame(columns=MANIFEST_COLS)
+        manifest = pd.read_csv(self.manifestfile, parse_dates=['FIRST_TIMESTAMP', 'LAST_TIMESTAMP', 'INGESTED'])
+        return manifest.reindex(columns=MANIFEST_COLS)
+
+    def _update_manifest(self, file_records: dict, file_timestamps: dict):
+        """Add parsed files to manifest, also files without data, replace entries of changed files"""
+        now = datetime.datetime.now()
+        rows = []
+        for filepath, n_records in file_records.items():
+            stat = Path(filepath).stat()
+            first, last = file_timestamps.get(filepath, (pd.NaT, pd.NaT))
+            rows.append({'FILEPATH': str(Path(filepath).resolve()),
+                         'SIZE': stat.st_size,
+                         'MTIME_NS': stat.st_mtime_ns,
+                         'N_RECORDS': n_records,
+                         'FIRST_TIMESTAMP': first,
+                         'LAST_TIMESTAMP': last,
+                         'INGESTED': now})
+        new = pd.DataFrame(rows, columns=MANIFEST_COLS)
+        manifest = new if self._manifest.empty else pd.concat([self._manifest, new], axis=0, ignore_index=True)
+        manifest = manifest.drop_duplicates(subset='FILEPATH', keep='last').reset_index(drop=True)
+        manifest.to_csv(self.manifestfile, index=False)
+        self._manifest = manifest
@@ -0,0 +1,170 @@
+"""
+PARSE CACHE
+===========
+This package is part of the diive library.
+
+On-disk cache for parsed data files. Data and metadata of a file that was
+parsed with `ReadFileType` are stored as parquet files, a repeated read of
+the same (unchanged) file skips parsing and timestamp sanitizing.
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+from pandas import DataFrame
+
+from diive.core.io.dirs import verify_dir
+
+# Increase when the layout of cached entries changes, old entries are then ignored
+CACHE_VERSION = 1
+
+
+def hash_filetypeconfig(filetypeconfig: dict) -> str:
+    """Hash of filetype settings, changes whenever the settings change"""
+    configstr = json.dumps(filetypeconfig, sort_keys=True, default=str)
+    return hashlib.sha256(configstr.encode('utf-8')).hexdigest()
+
+
+def hash_filecontent(filepath: str or Path, chunksize: int = 1024 * 1024) -> str:
+    """Hash of the file content"""
+    h = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunksize), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ParseCache:
+    """
+    Content-addressed on-disk cache for parsed data files
+
+    Each cached file is stored in its own subfolder of *cachedir*, the name of the
+    subfolder is the cache key. The key combines:
+        - the resolved filepath
+        - file size and modification time (or, optionally, a hash of the file content)
+        - a hash of the filetype settings
+        - read options that change the parsed data, e.g. *output_middle_timestamp*
+    A changed file or changed filetype settings therefore result in a new key and
+    the file is parsed again.
+
+    Entries are evicted (least recently used first) when the total size of
+    the cache exceeds *max_size_mb*.
+
+    Example:
+        cache = ParseCache(cachedir=r"F:\\cache", max_size_mb=2000)
+        df, meta = ReadFileType(filepath=FILE, filetype='TOA5_DAT_1MIN', cache=cache).get_filedata()
+
+    """
+
+    def __init__(self,
+                 cachedir: str or Path,
+                 max_size_mb: float = 1024,
+                 use_content_hash: bool = False):
+        """
+        Args:
+            cachedir: Folder where cached entries are stored, created if needed
+            max_size_mb: Maximum total size of the cache in MB
+            use_content_hash: If *True*, the file content is hashed instead of using
+                file size and modification time. Slower, but robust against files
+                that were copied or touched without changing their content.
+        """
+        self.cachedir = Path(cachedir)
+        self.max_size_mb = max_size_mb
+        self.use_content_hash = use_content_hash
+        verify_dir(self.cachedir)
+
+    def key(self, filepath: str or Path, filetypeconfig: dict, **options) -> str:
+        """Cache key for *filepath* parsed with *filetypeconfig* and read *options*"""
+        filepath = Path(filepath).resolve()
+        if self.use_content_hash:
+            filestate = hash_filecontent(filepath=filepath)
+        else:
+            stat = os.stat(filepath)
+            filestate = f"{stat.st_size}-{stat.st_mtime_ns}"
+        keyparts = {
+            'version': CACHE_VERSION,
+            'filepath': str(filepath),
+            'filestate': filestate,
+            'filetypeconfig': hash_filetypeconfig(filetypeconfig=filetypeconfig),
+            'options': options
+        }
+        keystr = json.dumps(keyparts, sort_keys=True, default=str)
+        return hashlib.sha256(keystr.encode('utf-8')).hexdigest()
+
+    def load(self, key: str) -> tuple[DataFrame, DataFrame] or None:
+        """Load cached data and metadata, returns *None* if *key* is not cached"""
+        entrydir = self.cachedir / key
+        infofile = entrydir / 'info.json'
+        if not infofile.is_file():
+            return None
+        with open(infofile, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        data_df = pd.read_parquet(entrydir / 'data.parquet')
+        metadata_df = pd.read_parquet(entrydir / 'metadata.parquet').astype(object)
+        metadata_df['TAGS'] = metadata_df['TAGS'].apply(list)
+
+        # Frequency is lost when saving to parquet
+        if info['freq']:
+            data_df.index.freq = info['freq']
+
+        # Mark entry as recently used
+        os.utime(infofile)
+        return data_df, metadata_df
+
+    def save(self, key: str, data_df: DataFrame, metadata_df: DataFrame, filepath: str or Path):
+        """Store data and metadata of *filepath* under *key*"""
+        entrydir = self.cachedir / key
+        verify_dir(entrydir)
+        data_df.to_parquet(entrydir / 'data.parquet')
+        metadata_df.to_parquet(entrydir / 'metadata.parquet')
+        info = {
+            'filepath': str(Path(filepath).resolve()),
+            'freq': data_df.index.freqstr if data_df.index.freq else None,
+            'created': time.time()
+        }
+        # Info file is written last, entries without info file are incomplete
+        with open(entrydir / 'info.json', 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        self.evict()
+
+    def entries(self) -> DataFrame:
+        """Overview of cached entries with source filepath, size and last access"""
+        rows = []
+        for entrydir in self.cachedir.iterdir():
+            infofile = entrydir / 'info.json'
+            if not infofile.is_file():
+                continue
+            with open(infofile, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            size = sum(f.stat().st_size for f in entrydir.iterdir() if f.is_file())
+            rows.append({'KEY': entrydir.name,
+                         'FILEPATH': info['filepath'],
+                         'SIZE_MB': size / 1024 / 1024,
+                         'LAST_ACCESS': infofile.stat().st_mtime})
+        return pd.DataFrame(rows, columns=['KEY', 'FILEPATH', 'SIZE_MB', 'LAST_ACCESS'])
+
+    def evict(self):
+        """Remove least recently used entries until cache is within *max_size_mb*"""
+        entries = self.entries()
+        if entries.empty:
+            return
+        entries = entries.sort_values(by='LAST_ACCESS', ascending=False)
+        cumsize = entries['SIZE_MB'].cumsum()
+        for key in entries.loc[cumsize > self.max_size_mb, 'KEY']:
+            self._remove(key=key)
+
+    def invalidate(self, filepath: str or Path = None):
+        """Remove all entries of *filepath*, or all entries if *filepath* is *None*"""
+        entries = self.entries()
+        if filepath:
+            entries = entries.loc[entries['FILEPATH'] == str(Path(filepath).resolve())]
+        for key in entries['KEY']:
+            self._remove(key=key)
+
+    def _remove(self, key: str):
+        shutil.rmtree(self.cachedir / key, ignore_errors=True)
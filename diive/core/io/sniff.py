@@ -0,0 +1,147 @@
+"""
+SNIFF
+=====
+This package is part of the diive library.
+
+Single-pass sniffing of the header section of data files. Only the first
+lines of a file are read, the header layout (column names) is cached and
+re-used for files with the same header, e.g. a batch of files from the same
+logger in the same folder.
+
+"""
+import bz2
+import csv
+import gzip
+import io
+import lzma
+import zipfile
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+
+# Compression inferred from file extension, as in `pd.read_csv`
+_COMPRESSION_BY_SUFFIX = {'.zip': 'zip', '.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+
+
+class HeaderSniff(NamedTuple):
+    """Result of sniffing a data file"""
+    headercols: list  # Column names from the header rows, tuples for multi-row headers
+    num_headercols: int  # Number of header columns
+    num_datacols: int  # Number of columns in the first data row
+
+
+def sniff_header(filepath: str or Path,
+                 skiprows: list = None,
+                 headerrows: list = None,
+                 delimiter: str = ',',
+                 compression: str = None,
+                 layoutkey: str = None,
+                 content: bytes = None) -> HeaderSniff:
+    """
+    Read header rows and first data row of a file in one pass
+
+    Only the first lines of the file are read with buffered I/O. Column names
+    are created from the header lines in the same way as `pd.read_csv` does,
+    the layout is cached for each distinct header, folder and *layoutkey*. For
+    a batch of files with the same header, column names are therefore only
+    created once.
+
+    Args:
+        filepath: Path to data file
+        skiprows: Rows that are skipped before and within the header rows, e.g. [0, 3]
+        headerrows: Rows with header info (after *skiprows* were skipped), e.g. [0, 1]
+        delimiter: Delimiter of columns
+        compression: Compression of the file, e.g. 'zip', inferred from file extension if *None*
+        layoutkey: Optional key for the cached layout, e.g. the filetype name
+        content: Optional content of the file that was already read into memory, e.g.
+            a decompressed zip member, the file itself is then not opened
+
+    Returns:
+        header columns, number of header columns and number of columns in first data row
+    """
+    filepath = Path(filepath)
+    skiprows = set(skiprows) if skiprows else set()
+    headerrows = list(headerrows) if headerrows else [0]
+
+    headerlines, firstdataline = _read_first_lines(filepath=filepath,
+                                                   skiprows=skiprows,
+                                                   num_headerlines=len(headerrows),
+                                                   compression=compression,
+                                                   content=content)
+
+    headercols = _header_layout(headertext=''.join(headerlines),
+                                num_headerlines=len(headerrows),
+                                delimiter=delimiter,
+                                directory=str(filepath.parent),
+                                layoutkey=layoutkey)
+    headercols = list(headercols)  # Copy, callers may extend the list
+
+    num_datacols = 0
+    if firstdataline is not None:
+        num_datacols = len(next(csv.reader([firstdataline], delimiter=delimiter)))
+
+    return HeaderSniff(headercols=headercols, num_headercols=len(headercols), num_datacols=num_datacols)
+
+
+def clear_header_cache():
+    """Remove all cached header layouts"""
+    _header_layout.cache_clear()
+
+
+@lru_cache(maxsize=256)
+def _header_layout(headertext: str, num_headerlines: int, delimiter: str,
+                   directory: str, layoutkey: str) -> tuple:
+    """Column names from header lines, cached
+
+    Column names are created by `pd.read_csv` from the header lines only, this
+    way names of empty or duplicate columns are the same as when reading the
+    whole file. *directory* and *layoutkey* are only part of the cache key.
+    """
+    headercols_df = pd.read_csv(io.StringIO(headertext),
+                                header=list(range(num_headerlines)),
+                                delimiter=delimiter,
+                                nrows=0)
+    return tuple(headercols_df.columns.to_list())
+
+
+def _read_first_lines(filepath: Path, skiprows: set, num_headerlines: int,
+                      compression: str = None, content: bytes = None) -> tuple[list, str or None]:
+    """Read header lines and the first data line
+
+    Lines in *skiprows* (line numbers in the file) and blank lines are skipped,
+    the same as in `pd.read_csv`.
+    """
+    headerlines = []
+    firstdataline = None
+    with _open_text(filepath=filepath, compression=compression, content=content) as f:
+        for ix, line in enumerate(f):
+            if (ix in skiprows) or (not line.strip()):
+                continue
+            if len(headerlines) < num_headerlines:
+                headerlines.append(line)
+                continue
+            firstdataline = line
+            break
+    return headerlines, firstdataline
+
+
+@contextmanager
+def _open_text(filepath: Path, compression: str = None, content: bytes = None):
+    """Open (compressed) file or content in memory in text mode"""
+    if content is not None:
+        yield io.TextIOWrapper(io.BytesIO(content), encoding='utf-8', newline='')
+        return
+    if not compression:
+        compression = _COMPRESSION_BY_SUFFIX.get(filepath.suffix.lower(), None)
+    if compression == 'zip':
+        # Same as pandas: the first file in the zip archive is read
+        with zipfile.ZipFile(filepath) as zf, zf.open(zf.namelist()[0]) as member:
+            yield io.TextIOWrapper(member, encoding='utf-8', newline='')
+        return
+    openers = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+    opener = openers.get(compression, open)
+    with opener(filepath, 'rt', encoding='utf-8', newline='') as f:
+        yield f
@@ -0,0 +1,112 @@
+"""
+STREAM
+======
+This package is part of the diive library.
+
+Streaming reader for high-resolution raw data files, e.g. 20 Hz eddy
+covariance raw data. Data are read in chunks and yielded as blocks of a
+fixed number of records, memory use does not depend on the number or
+size of files.
+
+"""
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+from pandas import DataFrame
+
+from diive.core.io.filereader import get_filetypeconfig
+from diive.core.io.sniff import sniff_header
+
+
+def stream_record_blocks(filepaths: list,
+                         filetype: str = None,
+                         filetypeconfig: dict = None,
+                         block_size: int = 36000,
+                         chunksize: int = 100000,
+                         usecols: list = None,
+                         yield_incomplete_last: bool = True) -> Iterator[DataFrame]:
+    """
+    Read files one after the other and yield blocks of *block_size* records
+
+    Blocks are built across file boundaries: when a file ends in the middle of a
+    block, the block is completed with records from the next file. For example,
+    with 20 Hz data and block_size=36000, each yielded block contains 30 minutes
+    of data, regardless of how the raw data were split into files.
+
+    Files are read in chunks of *chunksize* records, at any time at most
+    *block_size* + *chunksize* records are held in memory.
+
+    Data are read as they are in the files, there is no timestamp sanitizing.
+    The index of the yielded blocks is the continuous record number across
+    all files, starting at 0. Column names are the variable names from the
+    first header row.
+
+    Args:
+        filepaths: List of filepaths, read in this order
+        filetype: Filetype of the files, e.g. 'RECORD_DAT_20HZ'
+        filetypeconfig: Filetype settings, alternative to *filetype*
+        block_size: Number of records per block, e.g. 36000 for 30-minute blocks of 20 Hz data
+        chunksize: Number of records read from a file at once
+        usecols: Variable names of columns that are read, all columns if *None*
+        yield_incomplete_last: If *True*, the last block is yielded even if it
+            contains less than *block_size* records
+
+    Yields:
+        DataFrame with *block_size* records
+
+    Example:
+        filepaths = search_files(searchdirs=r"F:\\rawdata", pattern='*.dat')
+        for block in stream_record_blocks(filepaths=filepaths, filetype='RECORD_DAT_20HZ', block_size=36000):
+            agc = get_encoded_value_series(int_series=block['GA_DIAG_VALUE'], bit_start=4, bit_end=8, gain=6.25)
+    """
+    if filetype:
+        filetypeconfig = get_filetypeconfig(filetype=filetype)
+
+    leftover = None  # Records that did not yet fill a complete block
+    n_records = 0  # Number of records yielded so far
+    for filepath in filepaths:
+        for chunk in _read_chunks(filepath=Path(filepath), filetypeconfig=filetypeconfig,
+                                  chunksize=chunksize, usecols=usecols):
+            if leftover is not None:
+                chunk = pd.concat([leftover, chunk], axis=0, ignore_index=True)
+            n_complete = len(chunk) // block_size
+            for b in range(n_complete):
+                block = chunk.iloc[b * block_size:(b + 1) * block_size].copy()
+                block.index = pd.RangeIndex(n_records, n_records + block_size)
+                n_records += block_size
+                yield block
+            rest = chunk.iloc[n_complete * block_size:]
+            leftover = rest if len(rest) > 0 else None
+
+    if yield_incomplete_last and leftover is not None:
+        leftover = leftover.copy()
+        leftover.index = pd.RangeIndex(n_records, n_records + len(leftover))
+        yield leftover
+
+
+def _read_chunks(filepath: Path, filetypeconfig: dict, chunksize: int, usecols: list = None) -> Iterator[DataFrame]:
+    """Read file in chunks of *chunksize* records, values are converted to numeric"""
+    headercols = sniff_header(filepath=filepath,
+                              skiprows=filetypeconfig['DATA']['SKIP_ROWS'],
+                              headerrows=filetypeconfig['DATA']['HEADER_ROWS'],
+                              delimiter=filetypeconfig['DATA']['DELIMITER'],
+                              compression=filetypeconfig['FILE']['COMPRESSION'],
+                              layoutkey=filetypeconfig['GENERAL']['NAME']).headercols
+    # Variable names only, units are not needed here
+    names = [col[0] if isinstance(col, tuple) else col for col in headercols]
+    reader = pd.read_csv(filepath,
+                         skiprows=filetypeconfig['DATA']['HEADER_SECTION_ROWS'],
+                         header=None,
+                         names=names,
+                         usecols=usecols,
+                         na_values=filetypeconfig['DATA']['NA_VALUES'],
+                         encoding='utf-8',
+                         delimiter=filetypeconfig['DATA']['DELIMITER'],
+                         skip_blank_lines=True,
+                         engine='c',
+                         chunksize=chunksize,
+                         compression=filetypeconfig['FILE']['COMPRESSION'])
+    with reader:
+        for chunk in reader:
+            yield chunk.apply(pd.to_numeric, errors='coerce')
@@ -1,11 +1,10 @@
 # todo check for other estimators
 
-import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
 
-from sklearn.metrics import PredictionErrorDisplay, max_error, median_absolute_error, mean_absolute_error, \
-    mean_absolute_percentage_error, r2_score, mean_squared_error
-from yellowbrick.regressor import PredictionError, ResidualsPlot
+# scikit-learn, matplotlib and yellowbrick are imported in the functions, they take
+# long to import and are only needed when scores are calculated or plots are shown
 
 
 # import pandas as pd
@@ -123,6 +122,43 @@ from yellowbrick.regressor import PredictionError, ResidualsPlot
 #     return importances
 
 
+def stratified_record_subsample(timestamp: np.ndarray,
+                              fraction: float,
+                              freq: str = 'M',
+                              random_state: int = None) -> np.ndarray:
+    """
+    Positions of a random subsample with the same fraction of records from each time period
+
+    For example, with fraction=0.1 and freq='M', 10% of the records of each month are
+    drawn (at least one record per month). Compared to a simple random subsample, all
+    parts of the time series, e.g. all seasons, are represented in the subsample.
+
+    Sampling is record-level: records are drawn individually within each period, not
+    as contiguous blocks, the subsample therefore does not keep the autocorrelation
+    of the time series. This is intended for subsampling records that are already a
+    random selection, e.g. the test records for permutation importance.
+
+    Args:
+        timestamp: timestamps of the records, does not need to be sorted
+        fraction: fraction of records drawn from each period, between 0 and 1
+        freq: length of the periods, e.g. 'W', 'M' or 'Q'
+        random_state: seed for drawing the records
+
+    Returns:
+        sorted positions of the drawn records
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError(f"(!) fraction must be between 0 and 1, but is {fraction}.")
+    codes = pd.DatetimeIndex(timestamp).to_period(freq).asi8
+    rng = np.random.RandomState(random_state)
+    # Records in random order within each period
+    order = np.lexsort((rng.random_sample(len(codes)), codes))
+    _, starts, sizes = np.unique(codes[order], return_index=True, return_counts=True)
+    rank = np.arange(len(codes)) - np.repeat(starts, sizes)
+    keep = rank < np.repeat(np.ceil(sizes * fraction), sizes)
+    return np.sort(order[keep])
+
+
 def prediction_scores_regr(predictions: np.array,
                            targets: np.array,
                            infotxt: str = None,
@@ -134,6 +170,8 @@ def prediction_scores_regr(predictions: np.array,
     See:
     - https://scikit-learn.org/stable/modules/model_evaluation.html#regression-metrics
     """
+    from sklearn.metrics import max_error, median_absolute_error, mean_absolute_error, \
+        mean_absolute_percentage_error, r2_score, mean_squared_error
 
     # Calculate stats
     scores = {
@@ -148,6 +186,8 @@ def prediction_scores_regr(predictions: np.array,
 
     # Plot observed and predicted
     if showplot:
+        import matplotlib.pyplot as plt
+        from sklearn.metrics import PredictionErrorDisplay
         fig, axs = plt.subplots(ncols=2, figsize=(8, 4))
         PredictionErrorDisplay.from_predictions(
             targets,
@@ -198,6 +238,8 @@ def plot_prediction_residuals_error_regr(model,
     - https://www.scikit-yb.org/en/latest/api/regressor/peplot.html
 
     """
+    import matplotlib.pyplot as plt
+    from yellowbrick.regressor import PredictionError, ResidualsPlot
 
     # fig, axs = plt.subplots(ncols=2, figsize=(14, 4))
     # fig, ax = plt.subplots()
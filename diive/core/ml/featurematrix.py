@@ -0,0 +1,195 @@
+"""
+FEATURE MATRIX
+==============
+This package is part of the diive library.
+
+Target and features of a model as numpy arrays, built once from a dataframe
+and shared by all steps that need them, e.g. feature reduction, training
+and gap-filling.
+
+"""
+from pathlib import Path
+
+import numpy as np
+from pandas import DataFrame, Index
+
+
+class FeatureMatrix:
+    """
+    Immutable target and feature arrays of a model dataframe
+
+    Features are converted to one array when the matrix is built, the arrays
+    for complete rows (target and all features available) and for rows where
+    all features are available are created on first use and then re-used. All
+    arrays are read-only, they can be passed to several models without copying.
+    With *missing_features*, complete rows only need the target, for models that
+    handle missing values in features.
+
+    Features are stored variable by variable (each variable is contiguous in
+    memory), `select` therefore creates a matrix with a subset of features by
+    copying only the selected variables.
+
+    Example:
+        fm = FeatureMatrix.from_frame(df=df, target_col='NEE')
+        model.fit(X=fm.X, y=fm.y)  # Complete rows
+        predictions = model.predict(X=fm.X_features_available)  # Rows where all features are available
+        fm_reduced = fm.select(features=['TA', 'SW_IN'])
+
+    """
+
+    def __init__(self, columns: np.ndarray, target: np.ndarray, feature_names: list, index: Index,
+                 missing_features: bool = False):
+        """
+        Args:
+            columns: 2D array of features, variables x records
+            target: 1D array of target values, one per record
+            feature_names: names of the variables in *columns*
+            index: index of the records, e.g. timestamp
+            missing_features: if *True*, features can be missing (NaN) in all arrays,
+                only the target must be available in complete rows. For models that
+                handle missing values, e.g. histogram-based gradient boosting.
+        """
+        if columns.shape != (len(feature_names), len(index)) or len(target) != len(index):
+            raise ValueError(f"(!) Shape of features {columns.shape} and target {target.shape} "
+                             f"does not match {len(feature_names)} feature names and {len(index)} records.")
+        self._columns = self._readonly(columns)
+        self._target = self._readonly(target)
+        self._feature_names = tuple(feature_names)
+        self._index = index
+        self._missing_features = missing_features
+
+        # Rows where all features are available, rows where also the target is available
+        if missing_features:
+            self._feature_rows = self._readonly(np.ones(len(index), dtype=bool))
+        else:
+            self._feature_rows = self._readonly(~np.isnan(self._columns).any(axis=0))
+        self._complete_rows = self._readonly(self._feature_rows & ~np.isnan(self._target))
+
+        # Created on first use
+        self._X = None
+        self._X_features_available = None
+
+    @classmethod
+    def from_frame(cls, df: DataFrame, target_col: str or tuple, missing_features: bool = False) -> 'FeatureMatrix':
+        """Build feature matrix from *df*, all columns except *target_col* are features"""
+        feature_names = [col for col in df.columns if col != target_col]
+        columns = np.empty((len(feature_names), len(df)), dtype=_features_dtype(df=df, target_col=target_col))
+        for ix, col in enumerate(feature_names):
+            columns[ix] = df[col].to_numpy()
+        target = np.array(df[target_col])
+        return cls(columns=columns, target=target, feature_names=feature_names, index=df.index,
+                   missing_features=missing_features)
+
+    @property
+    def feature_names(self) -> list:
+        """Names of features, in the same order as the columns of *X*"""
+        return list(self._feature_names)
+
+    @property
+    def index(self) -> Index:
+        """Index of all records"""
+        return self._index
+
+    @property
+    def missing_features(self) -> bool:
+        """*True* if features can be missing in complete rows"""
+        return self._missing_features
+
+    @property
+    def complete_rows(self) -> np.ndarray:
+        """Boolean mask of records where target and all features are available"""
+        return self._complete_rows
+
+    @property
+    def feature_rows(self) -> np.ndarray:
+        """Boolean mask of records where all features are available"""
+        return self._feature_rows
+
+    @property
+    def X(self) -> np.ndarray:
+        """Features of complete rows, records x features"""
+        if self._X is None:
+            self._X = self._readonly(self._columns[:, self._complete_rows].T)
+        return self._X
+
+    @property
+    def y(self) -> np.ndarray:
+        """Target of complete rows"""
+        return self._readonly(self._target[self._complete_rows])
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        """Index of complete rows"""
+        return np.array(self._index[self._complete_rows])
+
+    @property
+    def X_features_available(self) -> np.ndarray:
+        """Features of all records where all features are available, records x features"""
+        if self._X_features_available is None:
+            self._X_features_available = self._readonly(self._columns[:, self._feature_rows].T)
+        return self._X_features_available
+
+    @property
+    def index_features_available(self) -> Index:
+        """Index of records where all features are available"""
+        return self._index[self._feature_rows]
+
+    def select(self, features: list) -> 'FeatureMatrix':
+        """Feature matrix with a subset of *features*, only the selected features are copied"""
+        positions = [self._feature_names.index(f) for f in features]
+        return FeatureMatrix(columns=self._columns[positions], target=self._target,
+                             feature_names=features, index=self._index, missing_features=self._missing_features)
+
+    @staticmethod
+    def _readonly(array: np.ndarray) -> np.ndarray:
+        array.flags.writeable = False
+        return array
+
+
+def memmap_frame(df: DataFrame, target_col: str or tuple, folder: str or Path) -> dict:
+    """
+    Write target and features of *df* to memory-mapped files in *folder*
+
+    Worker processes can then load records of *df* with `load_memmap_frame`
+    without the data being sent to each worker. Features are written variable
+    by variable with their common data type, as in `FeatureMatrix`.
+
+    Returns:
+        dict with filepaths and column names, needed by `load_memmap_frame`
+    """
+    feature_names = [col for col in df.columns if col != target_col]
+    spec = {'columns': df.columns.tolist(),
+            'target_col': target_col,
+            'features_file': str(Path(folder) / 'features.npy'),
+            'target_file': str(Path(folder) / 'target.npy')}
+    columns = np.lib.format.open_memmap(spec['features_file'], mode='w+', shape=(len(feature_names), len(df)),
+                                        dtype=_features_dtype(df=df, target_col=target_col))
+    for ix, col in enumerate(feature_names):
+        columns[ix] = df[col].to_numpy()
+    columns.flush()
+    del columns
+    np.save(spec['target_file'], df[target_col].to_numpy())
+    return spec
+
+
+def load_memmap_frame(spec: dict, start: int, stop: int, index: Index) -> DataFrame:
+    """Dataframe of records *start* to *stop* from the memory-mapped files in *spec*, data are not copied
+
+    Args:
+        spec: returned by `memmap_frame`
+        start: position of first record
+        stop: position after the last record, as in `df.iloc[start:stop]`
+        index: index of the records
+    """
+    columns = np.load(spec['features_file'], mmap_mode='r')
+    target = np.load(spec['target_file'], mmap_mode='r')
+    feature_names = [col for col in spec['columns'] if col != spec['target_col']]
+    df = DataFrame(columns[:, start:stop].T, index=index, columns=feature_names, copy=False)
+    df.insert(loc=spec['columns'].index(spec['target_col']), column=spec['target_col'], value=target[start:stop])
+    return df
+
+
+def _features_dtype(df: DataFrame, target_col: str or tuple) -> np.dtype:
+    """Common data type of features, the same as when converting all features at once, e.g. with `np.array(df)`"""
+    dtypes = df.dtypes.drop(target_col)
+    return np.result_type(*dtypes) if len(dtypes) else np.dtype('float64')
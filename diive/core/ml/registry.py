@@ -0,0 +1,168 @@
+"""
+MODEL REGISTRY
+==============
+This package is part of the diive library.
+
+On-disk registry of trained models. A trained model is stored together with
+its features, scores and a fingerprint of training data and parameters. When
+the same model is trained again on the same data with the same parameters, it
+is loaded from the registry instead.
+
+"""
+import hashlib
+import importlib
+import json
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from diive.core.io.dirs import verify_dir
+
+# Increase when the layout of registry entries changes, old entries are then ignored
+REGISTRY_VERSION = 1
+
+# Model parameters that do not change the trained model
+_IGNORED_PARAMS = ['n_jobs', 'verbose']
+
+
+def fingerprint_model(X: np.ndarray, y: np.ndarray, feature_names: list, model, **options) -> str:
+    """
+    Fingerprint of training data and parameters of a model
+
+    Args:
+        X: features of the training data, records x features
+        y: targets of the training data
+        feature_names: names of the features in *X*
+        model: unfitted model, its class and parameters are part of the fingerprint
+        **options: other options that change the trained model, e.g. *test_size*
+
+    Returns:
+        hex digest, changes whenever data, parameters, the scikit-learn version or the
+        version of the library of the model (e.g. xgboost for XGBRegressor) change
+    """
+    import sklearn
+
+    h = hashlib.sha256()
+    for array in [X, y]:
+        h.update(f"{array.dtype.str}{array.shape}".encode('utf-8'))
+        # Features are hashed variable by variable, the layout of FeatureMatrix.X, which is then not copied
+        h.update(np.ascontiguousarray(array.T).data)
+    params = {k: v for k, v in model.get_params().items() if k not in _IGNORED_PARAMS}
+    library = type(model).__module__.split('.')[0]
+    keyparts = {
+        'version': REGISTRY_VERSION,
+        'sklearn': sklearn.__version__,
+        'library': [library, getattr(importlib.import_module(library), '__version__', None)],
+        'model': type(model).__name__,
+        'params': params,
+        'feature_names': feature_names,
+        'options': options
+    }
+    h.update(json.dumps(keyparts, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Registry of trained models on disk
+
+    Each model is stored in its own subfolder of *registrydir*, the name of the
+    subfolder is the fingerprint of the model (see `fingerprint_model`):
+        - `model.joblib`: compressed model, features, scores and feature importances
+        - `info.json`: label, features and scores, to list entries without loading models
+
+    Example:
+        registry = ModelRegistry(registrydir=r"F:\\models")
+        rfts = RandomForestTS(input_df=df, target_col='NEE', registry=registry, ...)
+        rfts.trainmodel()  # Loaded from registry if trained before on the same data
+        rfts.fillgaps()
+
+    """
+
+    def __init__(self, registrydir: str or Path, compress: int = 3):
+        """
+        Args:
+            registrydir: Folder where models are stored, created if needed
+            compress: Compression level for joblib, between 0 (no compression) and 9
+        """
+        self.registrydir = Path(registrydir)
+        self.compress = compress
+        verify_dir(self.registrydir)
+
+    def load(self, key: str) -> dict or None:
+        """Load registered model and its results, returns *None* if *key* is not registered"""
+        entrydir = self.registrydir / key
+        infofile = entrydir / 'info.json'
+        if not infofile.is_file():
+            return None
+        import joblib
+        return joblib.load(entrydir / 'model.joblib')
+
+    def latest(self, label: str) -> dict or None:
+        """Load the most recently registered model with *label*, *None* if there is none"""
+        entries = self.entries()
+        entries = entries.loc[entries['LABEL'] == str(label)]
+        if entries.empty:
+            return None
+        return self.load(key=entries.sort_values(by='CREATED')['KEY'].iloc[-1])
+
+    def save(self, key: str, model, label: str, feature_names: list, scores: dict,
+             feature_importances: DataFrame = None, n_records: int = None):
+        """
+        Register trained *model* under *key*
+
+        Args:
+            key: fingerprint of the model, see `fingerprint_model`
+            model: trained model
+            label: name for the model, e.g. name of the target, used to find the latest model
+            feature_names: names of the features the model was trained with, in the same order
+            scores: model scores
+            feature_importances: feature importances
+            n_records: number of records the model was trained and tested with
+        """
+        import joblib
+
+        entrydir = self.registrydir / key
+        verify_dir(entrydir)
+        entry = dict(model=model, label=label, feature_names=list(feature_names), scores=scores,
+                     feature_importances=feature_importances)
+        joblib.dump(entry, entrydir / 'model.joblib', compress=self.compress)
+        info = {
+            'label': str(label),
+            'model': type(model).__name__,
+            'feature_names': [str(f) for f in feature_names],
+            'n_records': n_records,
+            'scores': scores,
+            'created': time.time()
+        }
+        # Info file is written last, entries without info file are incomplete
+        with open(entrydir / 'info.json', 'w', encoding='utf-8') as f:
+            json.dump(info, f, default=float)
+
+    def entries(self) -> DataFrame:
+        """Overview of registered models with label, model, number of features and R2 score"""
+        rows = []
+        for entrydir in self.registrydir.iterdir():
+            infofile = entrydir / 'info.json'
+            if not infofile.is_file():
+                continue
+            with open(infofile, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            rows.append({'KEY': entrydir.name,
+                         'LABEL': info['label'],
+                         'MODEL': info['model'],
+                         'N_FEATURES': len(info['feature_names']),
+                         'N_RECORDS': info['n_records'],
+                         'R2': info['scores'].get('r2', None),
+                         'CREATED': info['created']})
+        return pd.DataFrame(rows, columns=['KEY', 'LABEL', 'MODEL', 'N_FEATURES', 'N_RECORDS', 'R2', 'CREATED'])
+
+    def remove(self, key: str = None):
+        """Remove model *key*, or all models if *key* is *None*"""
+        keys = [key] if key else self.entries()['KEY'].tolist()
+        for key in keys:
+            shutil.rmtree(self.registrydir / key, ignore_errors=True)
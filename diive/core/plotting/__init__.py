@@ -1,2 +1,3 @@
-from . import styles
-from . import plotfuncs
+from diive.core.utils.lazy import lazy_module
+
+__getattr__, __dir__ = lazy_module(__name__, ['styles', 'plotfuncs'])
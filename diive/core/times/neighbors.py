@@ -1,4 +1,5 @@
-from pandas import DataFrame
+import numpy as np
+from pandas import DataFrame, DatetimeIndex
 
 from diive.core.funcs.funcs import find_nearest_val
 
@@ -7,15 +8,22 @@ def neighboring_years(df: DataFrame) -> dict:
     """Collect data for year and its two neighboring years"""
 
     print("\nCollecting data from neighboring years ...")
-    uniq_years = list(df.index.year.unique())
+    yearpools_dict = neighboring_poolyears(years=list(df.index.year.unique()))
+    for year, yearpool in yearpools_dict.items():
+        yearpool['df'] = _limit_yearpool_data(df=df, poolyears=yearpool['poolyears'])
+    return yearpools_dict
+
+
+def neighboring_poolyears(years: list) -> dict:
+    """Assign each year and its two nearest neighboring years to the data pool of the year"""
     yearpools_dict = {}
 
     # For each year, build model from the 2 neighboring years
 
-    for ix, year in enumerate(uniq_years):
+    for ix, year in enumerate(years):
         yearpools_dict[str(year)] = {}  # Init dict for this year
         poolyears = []
-        _uniq_years = uniq_years.copy()
+        _uniq_years = years.copy()
         _uniq_years.remove(year)
         poolyears.append(year)
 
@@ -33,12 +41,21 @@ def neighboring_years(df: DataFrame) -> dict:
         yearpools_dict[str(year)]['poolyears'] = poolyears
         print(f"Assigned {poolyears} to data pool for {year}.")
 
-        yearpools_dict[str(year)]['df'] = _limit_yearpool_data(df=df, poolyears=poolyears)
-
     return yearpools_dict
 
 
-def _limit_yearpool_data(df:DataFrame, poolyears: list) -> DataFrame:
+def yearpool_rows(index: DatetimeIndex, poolyears: list) -> tuple[int, int]:
+    """Positions (start, stop) of the records of *poolyears* in the sorted *index*
+
+    The data pool of a year can be selected as `df.iloc[start:stop]` without copying.
+    """
+    years = index.year.to_numpy()
+    start = int(np.searchsorted(years, min(poolyears), side='left'))
+    stop = int(np.searchsorted(years, max(poolyears), side='right'))
+    return start, stop
+
+
+def _limit_yearpool_data(df: DataFrame, poolyears: list) -> DataFrame:
     """Get data for poolyears"""
     firstyear = min(poolyears)
     lastyear = max(poolyears)
@@ -1,10 +1,11 @@
 from typing import Literal
 
+import numpy as np
 import pandas as pd
-from pandas import Series
+from pandas import DataFrame, Series
 from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
 
-from diive.core.times.times import TimestampSanitizer
 from diive.core.times.times import convert_series_timestamp_to_middle
 from diive.core.utils.prints import ConsoleOutputDecorator
 
@@ -43,90 +44,129 @@ def resample_series_to_30MIN(series: Series,
 
     """
 
-    current_freq = to_offset(series.index.freqstr)
-    requested_freq = to_offset(to_freqstr)
-
     # Resampling only 30MIN time resolution
     if not any(chr in to_freqstr for chr in ['30T']):
         raise NotImplementedError("Error during resampling: Only resampling to 30 minutes (30T) allowed.")
 
-    # Timestamp must be regular
-    if not series.index.freq:
-        raise NotImplementedError("Error during resampling: Irregular timestamps are not supported.")
+    agg_ser = resample_to_freq(data=series, to_freq=to_freqstr, agg=agg, mincounts_perc=mincounts_perc,
+                               output_timestamp_shows=output_timestamp_shows)
 
-    # Requested frequency must be larger than data freq
-    if current_freq > requested_freq:
-        raise NotImplementedError(
-            f"Error during resampling: "
-            f"Upsampling not allowed. "
-            f"Target frequency {to_freqstr} must be lower time resolution than "
-            f"source frequency {series.index.freqstr}.")
+    # Remove aggregates without enough values at start and end
+    if agg_ser.notnull().any():
+        agg_ser = agg_ser.loc[agg_ser.first_valid_index():agg_ser.last_valid_index()]
+    else:
+        agg_ser = agg_ser.dropna()
 
-    _series = series.copy()
+    return agg_ser
 
-    # Make middle timestamp, for correct resampling
-    _series = convert_series_timestamp_to_middle(data=_series)
+
+def resample_to_freq(data: Series or DataFrame,
+                     to_freq: str = '30T',
+                     agg: str = 'mean',
+                     mincounts_perc: float = .9,
+                     output_timestamp_shows: Literal['start', 'middle', 'end'] = 'end',
+                     return_counts: bool = False) -> Series or DataFrame or tuple:
+    """Downsample data to a lower time resolution, all columns in one pass
+
+    Counts and aggregates of all columns are calculated from the same grouping
+    of records. Aggregates that were calculated from too few values are set to
+    missing, separately for each column. The minimum number of values is relative
+    to the number of records that are possible in each aggregation period, e.g.
+    with *mincounts_perc=0.9*, at least 27 values of 1MIN data are needed for a
+    30MIN aggregate. Minimum counts below 3 are set to 1, e.g. for 10MIN data
+    (3 values per half-hour) one value is enough.
+
+    Input data must have a regular timestamp (with frequency) named 'TIMESTAMP_END',
+    'TIMESTAMP_START' or 'TIMESTAMP_MIDDLE'. Before resampling, the timestamp is
+    converted to show the MIDDLE of the time period, this way each record is
+    assigned to the correct aggregation period.
+
+    Aggregation periods:
+        - fixed frequencies, e.g. '30T', '3H', 'D': periods start at midnight of the
+          first day, the same as in `.resample`
+        - calendar frequencies, e.g. 'W', 'M', 'A': calendar weeks (Monday to Sunday),
+          months and years
+
+    Args:
+        data: Series or DataFrame with regular timestamp
+        to_freq: Target frequency, e.g. '30T', 'H', 'D', 'M'
+        agg: Aggregation, e.g. 'mean', 'sum', 'max'
+        mincounts_perc: Minimum number of values per aggregation period, relative
+            to the possible number of records per period
+        output_timestamp_shows: Timestamp of the resampled data shows the start,
+            middle or end of the aggregation period
+        return_counts: If *True*, the number of values per aggregation period is
+            also returned
+
+    Returns:
+        resampled data with continuous timestamp, and counts if *return_counts* is *True*
+    """
+
+    # Timestamp must be regular
+    if not data.index.freq:
+        raise NotImplementedError("Error during resampling: Irregular timestamps are not supported.")
+
+    current_freq = to_offset(data.index.freqstr)
+    requested_freq = to_offset(to_freq)
 
     print(f"Resampling data from {current_freq.freqstr} "
           f"to {requested_freq.freqstr} frequency ...")
 
-    # Check maximum number of counts per aggregation interval
-    # Needed to calculate the required minimum number of counts from
-    # 'mincounts_perc', which is a relative threshold.
-    maxcounts = pd.Series(index=_series.index, data=1)  # Dummy series of 1s
-    maxcounts = maxcounts.resample(to_freqstr, label='right').count().max()
-    # maxcounts = maxcounts.resample(to_freqstr, label=label, closed=closed).count().max()
-    mincounts = int(maxcounts * mincounts_perc)
-
-    # Require minimum 1 value
+    # Make middle timestamp, for correct resampling, only the index is changed
+    _data = convert_series_timestamp_to_middle(data=data.copy(deep=False))
+
+    if isinstance(requested_freq, Tick):
+        # Requested frequency must be larger than data freq
+        if current_freq > requested_freq:
+            raise NotImplementedError(
+                f"Error during resampling: "
+                f"Upsampling not allowed. "
+                f"Target frequency {to_freq} must be lower time resolution than "
+                f"source frequency {data.index.freqstr}.")
+
+        # Periods start at the labels, closed='left'
+        grouped = _data.resample(requested_freq, closed='left', label='left')
+        agg_counts = grouped.count()
+        aggregated = grouped.agg(agg)
+        start = agg_counts.index
+        end = start + requested_freq
+        maxcounts = np.full(len(start), requested_freq.nanos // current_freq.nanos)
+
+    else:
+        # Calendar periods, e.g. months
+        periods = _data.index.to_period(requested_freq)
+        grouped = _data.groupby(periods)
+        allperiods = pd.period_range(start=periods[0], end=periods[-1], freq=periods.freq)
+        agg_counts = grouped.count().reindex(allperiods, fill_value=0)
+        aggregated = grouped.agg(agg).reindex(allperiods)
+        start = allperiods.to_timestamp(how='start')
+        end = (allperiods + 1).to_timestamp(how='start')
+        maxcounts = (end - start).asi8 // current_freq.nanos
+
+    # Minimum number of values for each period, at least 1 value
     # Relevant e.g. for 10MIN data (3 values per half-hour)
-    mincounts = 1 if mincounts < 3 else mincounts
-
-    # Aggregation
-    resampled_ser = _series.resample(to_freqstr, label='right')  # default: closed='left'
-    # resampled_df = _series.resample(to_freqstr, label=label, closed=closed)
-    agg_counts_ser = resampled_ser.count()  # Count aggregated values, always needed
-    agg_ser = resampled_ser.agg(agg)
-
-    # Timestamp index shows end after resampling b/c label='right'
-    agg_counts_ser.index.name = 'TIMESTAMP_END'
-    agg_ser.index.name = 'TIMESTAMP_END'
-
-    # Keep aggregates with enough values
-    filter_min = agg_counts_ser >= mincounts
-    agg_ser = agg_ser[filter_min]
-
-    # Re-assign 30MIN resolution as freq
-    agg_ser = agg_ser.asfreq(to_freqstr)
-
-    # elif current_freq == requested_freq:
-    #     # Requested frequency must be different from data freq
-    #     # 'to_offset' allows comparison of frequencies (larger, smaller, equal)
-    #     print(f"No resampling needed, data freq {current_freq} "
-    #           f"is already in requested freq {requested_freq} ...")
-    #     agg_ser = _series.copy()
-
-    # Sanitize resampled timestamp index
-    if not agg_ser.empty:
-        if output_timestamp_shows == 'middle':
-            agg_ser = TimestampSanitizer(data=agg_ser).get()
-        elif output_timestamp_shows == 'end':
-            agg_ser = TimestampSanitizer(data=agg_ser, output_middle_timestamp=False).get()
-
-    # agg_df = sanitize_timestamp_index(data=agg_df, freq='30T')
-
-    # # Insert additional timestamps
-    # timestamp_freq = agg_df.index.freq
-    # timedelta = pd.to_timedelta(timestamp_freq)
-    # agg_df['TIMESTAMP_END'] = agg_df.index + pd.Timedelta(timedelta)
-    # agg_df['TIMESTAMP_MIDDLE'] = agg_df.index + pd.Timedelta(timedelta / 2)
-
-    # print(agg_df)
-    # # # TIMESTAMP CONVENTION
-    # # # --------------------
-    # agg_df, timestamp_info_df = timestamp_convention(df=agg_df,
-    #                                                  timestamp_shows_start=timestamp_shows_start,
-    #                                                  out_timestamp_convention='Middle of Record')
-    # agg_df.index = pd.to_datetime(agg_df.index)
-
-    return agg_ser
+    mincounts = (maxcounts * mincounts_perc).astype(int)
+    mincounts = np.where(mincounts < 3, 1, mincounts)
+
+    # Keep aggregates with enough values, for each column
+    enough = agg_counts.ge(mincounts, axis=0)
+    aggregated = aggregated.where(enough)
+
+    # Timestamp convention of output
+    timestamps = {'start': start, 'middle': start + (end - start) / 2, 'end': end}
+    if output_timestamp_shows not in timestamps:
+        raise ValueError(f"output_timestamp_shows must be 'start', 'middle' or 'end', "
+                         f"not '{output_timestamp_shows}'")
+    if isinstance(requested_freq, Tick):
+        freq = requested_freq
+    else:
+        # Calendar periods have different lengths, e.g. months, middle timestamps are irregular
+        freq = 'infer' if (output_timestamp_shows != 'middle') and (len(start) > 2) else None
+    index = pd.DatetimeIndex(timestamps[output_timestamp_shows], freq=freq,
+                             name=f'TIMESTAMP_{output_timestamp_shows.upper()}')
+    aggregated = aggregated.set_axis(index, copy=False)
+    agg_counts = agg_counts.set_axis(index, copy=False)
+
+    if return_counts:
+        return aggregated, agg_counts
+    return aggregated
@@ -1,6 +1,8 @@
 import datetime as dt
 import fnmatch
+import hashlib
 import time
+from collections import OrderedDict
 from typing import Literal
 
 import numpy as np
@@ -72,9 +74,84 @@ def detect_freq_groups(index: DatetimeIndex) -> Series:
     Returns:
         df: Time series dataframe with the new column 'FREQ_AUTO_SEC' added
 
+    The time differences are calculated once as integer nanoseconds with NumPy,
+    records with the same (unambiguous) time difference are then run-length
+    encoded into segments. The result is the same as in earlier versions that
+    filtered the data separately for each found time difference, but much
+    faster for long time series with many changes in time resolution.
+
     :: Added in v0.43.0
+    :: Changed in v0.71.0 (vectorized)
     """
 
+    n_records = len(index)
+    groups = np.full(n_records, np.nan)
+    if n_records < 3:
+        return pd.Series(index=index, data=groups, name='FREQ_AUTO_SEC')
+
+    # Time differences between neighbouring records, as integer nanoseconds
+    timestamps = np.asarray(index.values, dtype='datetime64[ns]').view('int64')
+    deltas = np.diff(timestamps)
+    valid = ~np.asarray(index.isna())
+    valid_deltas = valid[1:] & valid[:-1]
+
+    # Record i has an unambiguous time resolution if the difference to the previous
+    # record is the same as the difference to the next record, i.e. DELTA_DIFF = 0
+    unambiguous = (deltas[:-1] == deltas[1:]) & valid_deltas[:-1] & valid_deltas[1:]
+    positions = np.flatnonzero(unambiguous) + 1  # Record positions in index
+    if positions.size == 0:
+        return pd.Series(index=index, data=groups, name='FREQ_AUTO_SEC')
+    record_deltas = deltas[positions]
+
+    # Run-length encoding: segments of consecutive unambiguous records with the same delta
+    is_run_start = np.ones(positions.size, dtype=bool)
+    is_run_start[1:] = (np.diff(positions) != 1) | (record_deltas[1:] != record_deltas[:-1])
+    run_starts = np.flatnonzero(is_run_start)
+    run_ends = np.append(run_starts[1:], positions.size)
+    run_deltas = record_deltas[run_starts]
+    run_lengths = run_ends - run_starts
+
+    # First and last date of each segment: timestamp before the first and timestamp
+    # after the last unambiguous record, min/max in case the index is not sorted
+    run_first = np.minimum.reduceat(timestamps[positions - 1], run_starts)
+    run_last = np.maximum.reduceat(timestamps[positions + 1], run_starts)
+
+    # Aggregate segments per delta
+    unique_deltas, run_codes = np.unique(run_deltas, return_inverse=True)
+    counts = np.bincount(run_codes, weights=run_lengths).astype('int64')
+    first_dates = np.full(unique_deltas.size, np.iinfo('int64').max)
+    last_dates = np.full(unique_deltas.size, np.iinfo('int64').min)
+    np.minimum.at(first_dates, run_codes, run_first)
+    np.maximum.at(last_dates, run_codes, run_last)
+    seconds = pd.to_timedelta(unique_deltas).total_seconds().to_numpy()
+
+    # Deltas are assigned from the most to the least common delta, less common deltas
+    # overwrite first and last dates of more common deltas (same order as before)
+    order = pd.Series(counts).sort_values(ascending=False).index.to_numpy()
+    rank = np.empty(unique_deltas.size, dtype='int64')
+    rank[order] = np.arange(unique_deltas.size)
+
+    record_codes = np.repeat(run_codes, run_lengths)
+    groups[positions] = seconds[record_codes]
+    assigned_rank = np.full(n_records, -1, dtype='int64')
+    assigned_rank[positions] = rank[record_codes]
+
+    # Add first and last date of each delta
+    sorter = None if index.is_monotonic_increasing else np.argsort(timestamps, kind='stable')
+    for code in order:
+        for date in (first_dates[code], last_dates[code]):
+            loc = np.searchsorted(timestamps, date, sorter=sorter)
+            loc = loc if sorter is None else sorter[loc]
+            if assigned_rank[loc] <= rank[code]:
+                groups[loc] = seconds[code]
+                assigned_rank[loc] = rank[code]
+
+    return pd.Series(index=index, data=groups, name='FREQ_AUTO_SEC')
+
+
+def _detect_freq_groups_pandas(index: DatetimeIndex) -> Series:
+    """Previous implementation of `detect_freq_groups`, used in `benchmark_detect_freq_groups`"""
+
     groups_ser = pd.Series(index=index, data=np.nan, name='FREQ_AUTO_SEC')
     # index['FREQ_AUTO_SEC'] = np.nan
 
@@ -145,6 +222,35 @@ def detect_freq_groups(index: DatetimeIndex) -> Series:
     return groups_ser
 
 
+def benchmark_detect_freq_groups(n_records: int = 10_000_000, n_changes: int = 100, repeats: int = 3) -> DataFrame:
+    """Compare `detect_freq_groups` with the previous pandas implementation
+
+    The test index has *n_records* records and changes *n_changes* times between
+    10S, 1MIN and 10MIN time resolution.
+    """
+    seglen = n_records // (n_changes + 1)
+    freqs = np.array([10, 60, 600], dtype='int64') * 1_000_000_000
+    deltas = np.repeat(freqs[np.arange(n_changes + 1) % freqs.size], seglen)
+    timestamps = np.datetime64('2013-01-01', 'ns').astype('int64') + np.concatenate([[0], np.cumsum(deltas)])
+    index = pd.DatetimeIndex(timestamps.view('datetime64[ns]'), name='TIMESTAMP_END')
+
+    results = {}
+    groups = {}
+    for name, func in {'pandas': _detect_freq_groups_pandas, 'numpy': detect_freq_groups}.items():
+        durations = []
+        for _ in range(repeats):
+            tic = time.perf_counter()
+            groups[name] = func(index=index)
+            durations.append(time.perf_counter() - tic)
+        results[name] = {'MEDIAN_SECONDS': np.median(durations), 'MIN_SECONDS': np.min(durations)}
+    if not groups['pandas'].equals(groups['numpy']):
+        raise Exception('detect_freq_groups: results of pandas and numpy implementation differ')
+    results = pd.DataFrame(results).T
+    print(f"detect_freq_groups, {len(index)} records, {n_changes} changes in time resolution:")
+    print(results)
+    return results
+
+
 class TimestampSanitizer:
 
     def __init__(self,
@@ -155,6 +261,7 @@ class TimestampSanitizer:
                  sort_ascending: bool = True,
                  remove_duplicates: bool = True,
                  regularize: bool = True,
+                 fused: bool = True,
                  verbose: bool = False):
         """
         Validate and prepare timestamps for further processing
@@ -171,6 +278,12 @@ class TimestampSanitizer:
         The `TimestampSanitizer` class acts as a wrapper to combine various
         timestamp functions.
 
+        By default (*fused=True*), all steps are done in one pass: sorting, removing
+        duplicates and regularizing are combined into one positional indexer, the data
+        are then copied only once. Steps that are not needed, e.g. sorting an index that
+        is already sorted, are skipped. The result is the same as when running the
+        functions one after the other (*fused=False*), where each step copies the data.
+
         Args:
             data:
             output_middle_timestamp:
@@ -186,6 +299,8 @@ class TimestampSanitizer:
                 Remove duplicates in the timestamp index (keep last)
             regularize:
                 Generate continuous timestamp of given frequency between first and last date of index
+            fused:
+                Do all steps in one pass with at most one copy of the data
             verbose:
                 Generate more text output if *True*
 
@@ -195,18 +310,22 @@ class TimestampSanitizer:
             data: Data with timestamp index
             output_middle_timestamp:
         """
-        self.data = data.copy()
+        self.data = data if fused else data.copy()
         self.output_middle_timestamp = output_middle_timestamp
         self.validate_naming = validate_naming
         self.convert_to_datetime = convert_to_datetime
         self.sort_ascending = sort_ascending
         self.remove_duplicates = remove_duplicates
         self.regularize = regularize
+        self.fused = fused
         self.verbose = verbose
 
         self.inferred_freq = None if not data.index.freq else data.index.freq
 
-        self._run()
+        if self.fused:
+            self._run_fused()
+        else:
+            self._run()
 
     def get(self) -> Series or DataFrame:
         return self.data
@@ -243,6 +362,113 @@ class TimestampSanitizer:
         if self.output_middle_timestamp:
             self.data = convert_series_timestamp_to_middle(data=self.data, verbose=self.verbose)
 
+    def _run_fused(self):
+        """Sanitize timestamp in one pass, data are copied at most once"""
+        if self.verbose:
+            print("\nSanitizing timestamp (single pass) ...")
+
+        # Validate timestamp name
+        if self.validate_naming:
+            _ = validate_timestamp_naming(data=self.data, verbose=self.verbose)
+
+        # Convert timestamp to datetime, only the index is converted
+        index = self.data.index
+        if self.convert_to_datetime and not isinstance(index, DatetimeIndex):
+            try:
+                index = pd.to_datetime(index)
+            except:
+                raise Exception("Conversion of timestamp to datetime format failed.")
+
+        # Positions of the records in the sanitized data, *None* as long as
+        # the records are used as they are
+        positions = None
+
+        # Sort timestamp index ascending, same sorting as in `sort_index`
+        if self.sort_ascending and not index.is_monotonic_increasing:
+            index, positions = index.sort_values(return_indexer=True)
+            if self.verbose:
+                print(f"Sorted timestamp {index.name} ascending.")
+
+        # Remove index duplicates (keep last)
+        if self.remove_duplicates and not index.is_unique:
+            keep = ~index.duplicated(keep='last')
+            if self.verbose:
+                print(f"Removed {(~keep).sum()} rows with duplicate timestamps.")
+            index = index[keep]
+            positions = np.flatnonzero(keep) if positions is None else positions[keep]
+
+        # Detect time resolution from data
+        if not self.inferred_freq:
+            self.inferred_freq = DetectFrequency(index=index, verbose=self.verbose).get()
+
+        # Make timestamp continuous w/o date gaps, records that are not in the
+        # continuous timestamp are removed, missing records are added (-1)
+        if self.regularize:
+            continuous_index = pd.date_range(start=index[0], end=index[-1], freq=self.inferred_freq,
+                                             name=index.name)
+            if not index.equals(continuous_index):
+                located = index.get_indexer(continuous_index)
+                if positions is not None:
+                    located = np.where(located >= 0, positions[located], -1)
+                positions = located
+                if self.verbose:
+                    print(f"Created continuous {self.inferred_freq} timestamp index for timestamp "
+                          f"{index.name} between {index[0]} and {index[-1]}.")
+            index = continuous_index
+
+        # Build sanitized data, the only copy of the data
+        if positions is None:
+            self.data = self.data.copy()
+        else:
+            # Reindex on record numbers: -1 is not found and becomes a missing record,
+            # data types are then converted in the same way as in `reindex`
+            self.data = self.data.set_axis(pd.RangeIndex(len(self.data)), copy=False).reindex(positions)
+        self.data = self.data.set_axis(index, copy=False)
+
+        # Convert timestamp to middle, only the index is changed
+        if self.output_middle_timestamp:
+            self.data = convert_series_timestamp_to_middle(data=self.data, verbose=self.verbose)
+
+
+def benchmark_timestamp_sanitizer(n_records: int = 1_000_000, n_cols: int = 20, repeats: int = 3) -> DataFrame:
+    """Compare time and peak memory of `TimestampSanitizer` in single-pass and stepwise mode
+
+    Two datasets with 1MIN time resolution are sanitized: one with a timestamp that
+    is already sorted, unique and continuous, and one with unsorted records, duplicates
+    and missing records.
+    """
+    import tracemalloc
+
+    rng = np.random.default_rng(42)
+    index = pd.date_range('2013-01-01 00:01', periods=n_records, freq='1min', name='TIMESTAMP_END')
+    clean = pd.DataFrame(rng.random((n_records, n_cols)), index=index,
+                         columns=[f'VAR_{c}' for c in range(n_cols)])
+    messy = clean.iloc[rng.random(n_records) > 0.01]  # Missing records
+    messy = pd.concat([messy, messy.iloc[rng.integers(0, len(messy), 1000)]])  # Duplicates
+    messy = messy.iloc[rng.permutation(len(messy))]  # Unsorted
+    messy.index.freq = None
+
+    results = {}
+    for dataname, data in {'clean': clean, 'messy': messy}.items():
+        for fused in [False, True]:
+            durations = []
+            for _ in range(repeats):
+                tic = time.perf_counter()
+                TimestampSanitizer(data=data, fused=fused).get()
+                durations.append(time.perf_counter() - tic)
+            tracemalloc.start()
+            TimestampSanitizer(data=data, fused=fused).get()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            mode = 'single pass' if fused else 'stepwise'
+            results[(dataname, mode)] = {'MEDIAN_SECONDS': np.median(durations),
+                                         'PEAK_MEMORY_MB': peak / 1024 / 1024}
+    results = pd.DataFrame(results).T
+    print(f"TimestampSanitizer, {n_records} records, {n_cols} columns "
+          f"(data size {clean.memory_usage().sum() / 1024 / 1024:.0f} MB):")
+    print(results)
+    return results
+
 
 def sort_timestamp_ascending(data: Series or DataFrame, verbose: bool = False) -> Series or DataFrame:
     """Sort timestamp in ascending order"""
@@ -522,6 +748,14 @@ def include_timestamp_as_cols(df,
     """
     Include timestamp info as data columns
 
+    Calendar features are calculated with integer arithmetic and cached for each
+    distinct timestamp index (see `calendar_features`), repeated calls for the same
+    index, e.g. for the main and the fallback model in gap-filling, re-use the
+    cached features.
+
+    Combined columns join the digits of year and month, DOY or week, e.g.
+    '.YEARMONTH' is 20238 for August 2023 and 202312 for December 2023.
+
     Kudos:
     - https://datascience.stackexchange.com/questions/60951/is-it-necessary-to-convert-labels-in-string-to-integer-for-scikit-learn-and-xgbo
     - https://scikit-learn.org/stable/modules/generated/sklearn.preprocessing.OneHotEncoder.html
@@ -529,82 +763,105 @@ def include_timestamp_as_cols(df,
     """
     print("\nAdding timestamp as data columns ...")
 
-    df = df.copy()
-    newcols = []
-
-    if year:
-        year_col = '.YEAR'
-        newcols.append(year_col)
-        df[year_col] = df.index.year.astype(int)
-
-    if season:
-        season_col = '.SEASON'
-        newcols.append(season_col)
-        df[season_col] = insert_season(timestamp=df.index)
-
-    if month:
-        month_col = '.MONTH'
-        newcols.append(month_col)
-        df[month_col] = df.index.month.astype(int)
+    features = calendar_features(index=df.index)
+    include = {'.YEAR': year, '.SEASON': season, '.MONTH': month, '.WEEK': week, '.DOY': doy, '.HOUR': hour,
+               '.YEARMONTH': True, '.YEARDOY': True, '.YEARWEEK': True}
+    newcols = [col for col, included in include.items() if included]
 
-    if week:
-        week_col = '.WEEK'
-        newcols.append(week_col)
-        df[week_col] = df.index.isocalendar().week.astype(int)
-
-    if doy:
-        doy_col = '.DOY'
-        newcols.append(doy_col)
-        df[doy_col] = df.index.dayofyear.astype(int)
+    df = df.copy()
+    for col in newcols:
+        df[col] = features[col]
 
-    if hour:
-        hour_col = '.HOUR'
-        newcols.append(hour_col)
-        df[hour_col] = df.index.hour.astype(int)
+    if verbose > 0:
+        print(f"Added timestamp as columns: {newcols} {txt}")
 
-    # Year and month: YEAR2023+MONTH8 = 20238
-    yearmonth_col = '.YEARMONTH'
-    newcols.append(yearmonth_col)
-    df[yearmonth_col] = (df[year_col].astype(str) + df[month_col].astype(str)).astype(int)
+    return df
 
-    # Year and DOY: YEAR2023+DOY194 = 2023194
-    yeardoy_col = '.YEARDOY'
-    newcols.append(yeardoy_col)
-    df[yeardoy_col] = (df[year_col].astype(str) + df[doy_col].astype(str)).astype(int)
 
-    # Year and week: YEAR2023+WEEK15 = 202315
-    yearweek_col = '.YEARWEEK'
-    newcols.append(yearweek_col)
-    df[yearweek_col] = (df[year_col].astype(str) + df[week_col].astype(str)).astype(int)
+# Calendar features of recently used timestamp indexes, by index fingerprint
+_CALENDAR_CACHE = OrderedDict()
+_CALENDAR_CACHE_MAXSIZE = 8
 
-    # yearmonthweekdoy_col = '.YEARMONTHWEEKDOY'
 
-    # yearmonthweek_col = '.YEARMONTHWEEK'
-    # weekhour_col = '.WEEKHOUR'
+def calendar_features(index: DatetimeIndex) -> dict:
+    """
+    Calendar features of a timestamp index as integer arrays, cached
 
-    # Combined variables
+    Features are cached for the most recently used indexes, the cache key is a
+    fingerprint of the index (see `_index_fingerprint`). The returned arrays are
+    read-only.
 
-    # Year and month and week: YEAR2023+MONTH8+WEEK15 = 2023815
-    # df[yearmonthweek_col] = (df[year_col].astype(str) + df[month_col].astype(str) + df[week_col].astype(str)).astype(
-    #     int)
+    Args:
+        index: timestamp index
 
-    # Week and hour: WEEK42+HOUR22 = 4222
-    # df[weekhour_col] = (df[week_col].astype(str) + df[hour_col].astype(str)).astype(int)
+    Returns:
+        dict of arrays '.YEAR', '.SEASON', '.MONTH', '.WEEK', '.DOY', '.HOUR',
+        '.YEARMONTH', '.YEARDOY' and '.YEARWEEK'
+    """
+    key = _index_fingerprint(index=index)
+    if key in _CALENDAR_CACHE:
+        _CALENDAR_CACHE.move_to_end(key)
+        return _CALENDAR_CACHE[key]
+
+    year = index.year.to_numpy().astype('int64')
+    month = index.month.to_numpy().astype('int64')
+    week = index.isocalendar().week.to_numpy().astype('int64')
+    doy = index.dayofyear.to_numpy().astype('int64')
+    features = {
+        '.YEAR': year,
+        '.SEASON': insert_season(timestamp=index).to_numpy(),
+        '.MONTH': month,
+        '.WEEK': week,
+        '.DOY': doy,
+        '.HOUR': index.hour.to_numpy().astype('int64'),
+        '.YEARMONTH': _join_digits(year, month),  # YEAR2023+MONTH8 = 20238
+        '.YEARDOY': _join_digits(year, doy),  # YEAR2023+DOY194 = 2023194
+        '.YEARWEEK': _join_digits(year, week),  # YEAR2023+WEEK15 = 202315
+    }
+    for values in features.values():
+        values.flags.writeable = False
+
+    _CALENDAR_CACHE[key] = features
+    if len(_CALENDAR_CACHE) > _CALENDAR_CACHE_MAXSIZE:
+        _CALENDAR_CACHE.popitem(last=False)
+    return features
+
+
+def clear_calendar_cache():
+    """Remove all cached calendar features"""
+    _CALENDAR_CACHE.clear()
+
+
+def _index_fingerprint(index: DatetimeIndex) -> tuple:
+    """Fingerprint of a timestamp index, the same for indexes with the same timestamps
+
+    For an index with frequency, first timestamp, length and frequency describe all
+    timestamps. Otherwise, a hash of the timestamps is used.
+    """
+    if len(index) == 0:
+        return 'empty', str(index.tz)
+    if index.freq is not None:
+        return 'freq', index[0].value, len(index), index.freqstr, str(index.tz)
+    timestamps = np.ascontiguousarray(index.asi8)
+    return 'hash', hashlib.blake2b(timestamps.tobytes(), digest_size=16).hexdigest(), len(index), str(index.tz)
 
-    if verbose > 0:
-        print(f"Added timestamp as columns: {newcols} {txt}")
 
-    return df
+def _join_digits(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Join the digits of two positive integers, e.g. 2023 and 8 to 20238, 2023 and 12 to 202312"""
+    scale = np.full_like(second, 10)
+    while (too_small := second >= scale).any():
+        scale[too_small] *= 10
+    return first * scale + second
 
 
 def insert_season(timestamp: DatetimeIndex) -> Series:
     """
     Insert meteorological season as integer
 
-    spring = 1 (DJF)
-    summer = 2 (MAM)
-    autumn = 3 (JJA)
-    winter = 4 (SON)
+    spring = 1 (MAM)
+    summer = 2 (JJA)
+    autumn = 3 (SON)
+    winter = 4 (DJF)
 
     Args:
         timestamp: timestamp of time series
@@ -612,24 +869,10 @@ def insert_season(timestamp: DatetimeIndex) -> Series:
     Returns:
         season series with timestamp
     """
-
-    winter = [1, 2, 12]
-    spring = [3, 4, 5]
-    summer = [6, 7, 8]
-    autumn = [9, 10, 11]
-    season = pd.Series(data=timestamp.month, index=timestamp)
-
-    is_winter = season.isin(winter)
-    is_spring = season.isin(spring)
-    is_summer = season.isin(summer)
-    is_autumn = season.isin(autumn)
-
-    season[is_spring] = 1
-    season[is_summer] = 2
-    season[is_autumn] = 3
-    season[is_winter] = 4
-
-    return season
+    month = timestamp.month
+    # Season for months 1-12
+    seasons = np.array([4, 4, 1, 1, 1, 2, 2, 2, 3, 3, 3, 4], dtype=month.dtype)
+    return pd.Series(data=seasons[month - 1], index=timestamp)
 
 
 class DetectFrequency:
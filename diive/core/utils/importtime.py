@@ -0,0 +1,71 @@
+"""
+IMPORTTIME
+==========
+
+Measure how long it takes to import diive modules.
+
+Heavy plotting and machine learning dependencies (matplotlib, scikit-learn,
+scipy, ...) are imported only when they are used, e.g. when a plot is shown
+or a model is trained. The functions here check that importing a module
+stays fast and does not load these dependencies.
+
+"""
+import subprocess
+import sys
+
+import pandas as pd
+from pandas import DataFrame
+
+# Dependencies that are only imported on first use of plot or model functions
+HEAVY_DEPENDENCIES = ['matplotlib', 'seaborn', 'sklearn', 'xgboost', 'yellowbrick', 'uncertainties',
+                      'statsmodels', 'scipy', 'bokeh', 'IPython']
+
+
+def measure_importtime(module: str) -> DataFrame:
+    """
+    Import *module* in a new interpreter and collect import times with `python -X importtime`
+
+    Args:
+        module: Name of the module, e.g. 'diive.core.io.filereader'
+
+    Returns:
+        dataframe with one row per imported module, with self and cumulative
+        import time in seconds, sorted by cumulative time
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        selftime, cumulative, name = line.removeprefix('import time:').split('|')
+        rows.append({'MODULE': name.strip(),
+                     'SELF_SECONDS': int(selftime) / 1e6,
+                     'CUMULATIVE_SECONDS': int(cumulative) / 1e6})
+    df = pd.DataFrame(rows, columns=['MODULE', 'SELF_SECONDS', 'CUMULATIVE_SECONDS'])
+    return df.sort_values(by='CUMULATIVE_SECONDS', ascending=False).reset_index(drop=True)
+
+
+def total_importtime(module: str) -> float:
+    """Cumulative time in seconds needed to import *module* in a new interpreter"""
+    df = measure_importtime(module=module)
+    return df.loc[df['MODULE'] == module, 'CUMULATIVE_SECONDS'].iloc[0]
+
+
+def imported_heavy_dependencies(module: str) -> list:
+    """Heavy dependencies that are imported together with *module*"""
+    df = measure_importtime(module=module)
+    imported = set(df['MODULE'].str.split('.').str[0])
+    return [d for d in HEAVY_DEPENDENCIES if d in imported]
+
+
+def example():
+    for module in ['diive', 'diive.core.io.filereader', 'diive.pkgs.qaqc.meteoscreening',
+                   'diive.pkgs.gapfilling.randomforest_ts']:
+        print(f"{module}: {total_importtime(module=module):.3f}s, "
+              f"heavy dependencies: {imported_heavy_dependencies(module=module)}")
+    print(measure_importtime(module='diive.pkgs.qaqc.meteoscreening').head(20))
+
+
+if __name__ == '__main__':
+    example()
@@ -0,0 +1,36 @@
+"""
+LAZY
+====
+
+Import submodules of a package on first access, e.g. `diive.core.dfun`. This keeps
+importing diive fast, heavy dependencies are only loaded when they are needed.
+
+"""
+import importlib
+import sys
+
+
+def lazy_module(name: str, submodules: list) -> tuple:
+    """
+    Module-level `__getattr__` and `__dir__` that import *submodules* on first access
+
+    Args:
+        name: Name of the package, `__name__` in the package's `__init__.py`
+        submodules: Names of the submodules that are imported on first access
+
+    Returns:
+        functions `__getattr__` and `__dir__` for the package
+
+    Example:
+        __getattr__, __dir__ = lazy_module(__name__, ['fits', 'frames'])
+    """
+
+    def __getattr__(attr):
+        if attr in submodules:
+            return importlib.import_module(f'{name}.{attr}')
+        raise AttributeError(f"module {name!r} has no attribute {attr!r}")
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[name])) | set(submodules))
+
+    return __getattr__, __dir__
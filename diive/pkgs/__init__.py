@@ -1,5 +1,3 @@
-from diive.pkgs import analyses
-from diive.pkgs import corrections
-from diive.pkgs import createvar
-from diive.pkgs import flux
-from diive.pkgs import qaqc
+from diive.core.utils.lazy import lazy_module
+
+__getattr__, __dir__ = lazy_module(__name__, ['analyses', 'corrections', 'createvar', 'flux', 'qaqc'])
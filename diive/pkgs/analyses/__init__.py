@@ -1,2 +1,3 @@
-import diive.pkgs.analyses.optimumrange
-import diive.pkgs.analyses.gapfinder
+from diive.core.utils.lazy import lazy_module
+
+__getattr__, __dir__ = lazy_module(__name__, ['optimumrange', 'gapfinder'])
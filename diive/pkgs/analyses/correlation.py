@@ -1,5 +1,4 @@
 import pandas as pd
-from matplotlib import pyplot as plt, gridspec as gridspec
 from pandas import Series
 
 from diive.pkgs.createvar.potentialradiation import potrad
@@ -56,6 +55,8 @@ def daily_correlation(s1: Series,
 
 
 def _plot_daily_correlation(daycorrs, mincorr, df, s1, s2):
+    from matplotlib import pyplot as plt, gridspec as gridspec
+
     # Identify dates with low correlation
     _lowcorrs = daycorrs.between(-mincorr, mincorr, inclusive='neither')
     lowcorrs = daycorrs[_lowcorrs]
@@ -12,16 +12,11 @@ DECOUPLING: SORTING BINS METHOD
 """
 from pathlib import Path
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
-import diive.core.plotting.styles.LightTheme as theme
 from diive.core.io.files import load_pickle
-from diive.core.plotting.plotfuncs import default_legend, default_format
-from diive.core.plotting.plotfuncs import save_fig
 
 
 class SortingBinsMethod:
@@ -76,6 +71,10 @@ class SortingBinsMethod:
                                 title: str = None,
                                 path: Path or str = None,
                                 **kwargs):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.plotfuncs import save_fig
+
         fig = plt.figure(figsize=(9, 9))
         gs = gridspec.GridSpec(1, 1)  # rows, cols
         # gs.update(wspace=.2, hspace=1, left=.1, right=.9, top=.85, bottom=.1)
@@ -87,6 +86,10 @@ class SortingBinsMethod:
             save_fig(fig=fig, title=title, path=path)
 
     def plot_bins(self, ax, **kwargs):
+        import matplotlib.pyplot as plt
+        import diive.core.plotting.styles.LightTheme as theme
+        from diive.core.plotting.plotfuncs import default_format
+
         colors = plt.cm.YlOrRd(np.linspace(0.1, 1, self.n_bins_var1))
         for ix, m in enumerate(self.binmeans.keys()):
             ax.plot(self.binmeans[m].index, self.binmeans[m][self.var3_col],
@@ -7,14 +7,10 @@ from math import isclose
 from pathlib import Path
 from typing import Literal
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from matplotlib.legend_handler import HandlerTuple
 from pandas import DataFrame
 
-from diive.core.plotting.plotfuncs import save_fig
 
 
 class FindOptimumRange:
@@ -245,6 +241,10 @@ class FindOptimumRange:
                 saveplot: bool = False,
                 title: str = None,
                 path: Path or str = None):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.plotfuncs import save_fig
+
         fig = plt.figure(figsize=(16, 9))
         gs = gridspec.GridSpec(4, 1)  # rows, cols
         gs.update(wspace=.2, hspace=.5, left=.05, right=.95, top=.95, bottom=.05)
@@ -260,6 +260,7 @@ class FindOptimumRange:
 
     def plot_vals_in_optimum_range(self, ax):
         """Plot optimum range: values in, above and below optimum per year"""
+        import matplotlib.pyplot as plt
 
         # kudos: https://matplotlib.org/stable/gallery/lines_bars_and_markers/horizontal_barchart_distribution.html#sphx-glr-gallery-lines-bars-and-markers-horizontal-barchart-distribution-py
 
@@ -310,6 +311,7 @@ class FindOptimumRange:
 
     def plot_bin_aggregates(self, ax):
         """Plot y median in bins of x"""
+        from matplotlib.legend_handler import HandlerTuple
 
         # Get data
         bin_aggs_df = self.results_optrange['bin_aggs_df'].copy()
@@ -351,6 +353,7 @@ class FindOptimumRange:
 
     def plot_rolling_bin_aggregates(self, ax):
         """Plot rolling mean of y medians in bins of x"""
+        from matplotlib.legend_handler import HandlerTuple
 
         # Get data
         rbin_aggs_df = self.results_optrange['rbin_aggs_df'].copy()
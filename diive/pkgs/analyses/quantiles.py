@@ -2,10 +2,11 @@ import numpy as np
 import pandas as pd
 from pandas import Series, DataFrame
 
-from diive.core.plotting.scatter import ScatterXY
 
 
 def percentiles(series: Series, showplot: bool = True) -> DataFrame:
+    from diive.core.plotting.scatter import ScatterXY
+
     percentiles_df = pd.DataFrame()
     percentiles_df['PERCENTILE'] = np.arange(0, 101, 1)
     vals_sorted = series.copy().sort_values().dropna()  # Pre-sort array
@@ -112,12 +112,12 @@ def example_series():
     from pathlib import Path
     import pandas as pd
     from diive.core.io.filereader import ReadFileType, search_files
+    from diive.core.io.stream import stream_record_blocks
 
     OUTDIR = r"F:\01-NEW\CH-FRU-FF202401\2023_rECord\raw_data_ascii_rECord_filesWithAGC"
 
     batch = 4
 
-    df_all = pd.Series()
     files = search_files(searchdirs=fr"F:\01-NEW\CH-FRU-FF202401\2023_rECord\raw_data_ascii_rECord_{batch}",
                          pattern='*.dat')
     # files = files[0:40]
@@ -141,16 +141,22 @@ def example_series():
         df.to_csv(outfilepath, index=False)
         print(f"Saved file {outfilepath}.")
 
-        if ix == 0:
-            df_all = df.copy()
-        # elif ix == 10:
-        #     break
-        else:
-            df_all = pd.concat([df_all, df], ignore_index=True)
+    # Median of all variables in 30-minute blocks (36000 records @20Hz) across all files,
+    # files are streamed block by block instead of collecting all data in memory
+    blocks_medians = []
+    for block in stream_record_blocks(filepaths=files, filetype='RECORD_DAT_20HZ', block_size=36000):
+        block['AGC'] = get_encoded_value_series(int_series=block['GA_DIAG_VALUE'].copy(),
+                                                bit_start=4,
+                                                bit_end=8,
+                                                gain=6.25,
+                                                base=2,
+                                                n_bits=8)
+        blocks_medians.append(block.median())
+    df_all = pd.DataFrame(blocks_medians)
 
     # Plot all variables across all files
     for ix, v in enumerate(df_all.columns):
-        plot = df_all[v].plot(title=f"{v} @20Hz across all files", figsize=(20, 9)).get_figure()
+        plot = df_all[v].plot(title=f"{v} 30-min block medians across all files", figsize=(20, 9)).get_figure()
         outplotpath = Path(OUTDIR) / f"{ix}_{v}_timesseries_across_all_files_batch_{batch}.png"
         plot.savefig(outplotpath)
         plot.show()
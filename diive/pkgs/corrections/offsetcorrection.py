@@ -30,11 +30,10 @@ def remove_relativehumidity_offset(series: Series,
     exceeds_ix = _series_exceeds.index
 
     # Calculate daily mean of values > 100
-    _daily_mean_above_100 = frames.aggregated_as_hires(aggregate_series=_series_exceeds,
+    _daily_mean_above_100 = frames.aggregate_broadcast(data=_series_exceeds,
                                                        to_freq='D',
                                                        to_agg='mean',
-                                                       hires_timestamp=series.index,
-                                                       interpolate_missing_vals=True)
+                                                       hires_timestamp=series.index)
 
     # Calculate and gap-fill offset values
     _offset = _daily_mean_above_100.sub(100)  # Offset is the difference to 100
@@ -115,11 +114,10 @@ def remove_radiation_zero_offset(series: Series,
     nighttime_datetimes = series_nighttime.index
 
     # Calculate offset as the daily nighttime mean
-    _offset = frames.aggregated_as_hires(aggregate_series=series_nighttime,
+    _offset = frames.aggregate_broadcast(data=series_nighttime,
                                          to_freq='D',
                                          to_agg='mean',
-                                         hires_timestamp=series.index,
-                                         interpolate_missing_vals=True)
+                                         hires_timestamp=series.index)
 
     # Gap-fill offset values
     _offset = _offset.fillna(_offset.median())
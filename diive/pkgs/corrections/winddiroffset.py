@@ -6,7 +6,6 @@ WINDDIROFFSET
 
 """
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from pandas import Series, DataFrame
@@ -119,6 +118,8 @@ class WindDirOffset:
 
     def showplots(self):
         """Plot absolute correlations for each year"""
+        import matplotlib.pyplot as plt
+
         for key, val in self.shiftdict.items():
             shiftdf = val.set_index(keys='SHIFT', drop=True)
             shiftdf.plot()
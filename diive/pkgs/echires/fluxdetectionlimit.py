@@ -44,8 +44,6 @@ FLUX DETECTION LIMIT
 import math
 from pathlib import Path
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import pandas as pd
 from pandas import Series, DataFrame
 
@@ -280,6 +278,9 @@ class FluxDetectionLimit:
         return flux_detection_limit, flux_noise_rmse
 
     def plot_(self, cov_df: DataFrame) -> None:
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+
         fig = plt.figure(figsize=(10, 10))
         gs = gridspec.GridSpec(1, 1)  # rows, cols
         gs.update(wspace=.2, hspace=0, left=.05, right=.95, top=.95, bottom=.05)
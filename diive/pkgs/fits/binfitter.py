@@ -16,20 +16,11 @@ PI ... prediction interval
 from pathlib import Path
 from typing import Literal
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import uncertainties as unc
-import uncertainties.unumpy as unp
-from matplotlib.legend_handler import HandlerTuple
 from pandas import DataFrame
-from scipy import stats
-from scipy.optimize import curve_fit
 
 from diive.core.dfun.stats import q25, q75
-from diive.core.plotting.plotfuncs import save_fig, default_format, add_zeroline_y
-from diive.core.plotting.styles.LightTheme import FONTSIZE_LEGEND
 
 
 def groupagg(df, num_bins, bin_col) -> DataFrame:
@@ -137,6 +128,10 @@ class BinFitterBTS:
                            title: str = None,
                            path: Path or str = None,
                            **kwargs):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.plotfuncs import save_fig
+
         fig = plt.figure(figsize=(9, 9))
         gs = gridspec.GridSpec(1, 1)  # rows, cols
         # gs.update(wspace=.2, hspace=1, left=.1, right=.9, top=.85, bottom=.1)
@@ -184,6 +179,10 @@ class PlotBinFitterBTS:
         self.fit_type = fit_type
 
     def plot_binfitter(self):
+        from matplotlib.legend_handler import HandlerTuple
+        from diive.core.plotting.plotfuncs import default_format, add_zeroline_y
+        from diive.core.plotting.styles.LightTheme import FONTSIZE_LEGEND
+
         # Data
         xdata = self.fit_results['x']
         ydata = self.fit_results['y']
@@ -383,6 +382,8 @@ class BinFitter:
 
     def _predband(self, px, x, y, params_opt, func, conf=0.95):
         """Prediction band"""
+        from scipy import stats
+
         # px = requested points, x = x data, y = y data, params_opt = parameters, func = function name
         alpha = 1.0 - conf  # significance
         N = x.size  # data sample size
@@ -441,6 +442,9 @@ class BinFitter:
 
         kudos: https://apmonitor.com/che263/index.php/Main/PythonRegressionStatistics
         """
+        import uncertainties as unc
+        import uncertainties.unumpy as unp
+        from scipy.optimize import curve_fit
 
         df, x, y, len_y, numvals_per_bin = self._set_fit_data(df=df)
 
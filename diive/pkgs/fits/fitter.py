@@ -16,20 +16,11 @@ PI ... prediction interval
 from pathlib import Path
 from typing import Literal
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import uncertainties as unc
-import uncertainties.unumpy as unp
-from matplotlib.legend_handler import HandlerTuple
 from pandas import DataFrame
-from scipy import stats
-from scipy.optimize import curve_fit
 
 from diive.core.dfun.stats import q25, q75
-from diive.core.plotting.plotfuncs import save_fig, default_format, add_zeroline_y
-from diive.core.plotting.styles.LightTheme import FONTSIZE_LEGEND
 
 
 
@@ -69,6 +60,10 @@ class PlotBinFitterBTS:
         self.fit_type = fit_type
 
     def plot_binfitter(self):
+        from matplotlib.legend_handler import HandlerTuple
+        from diive.core.plotting.plotfuncs import default_format, add_zeroline_y
+        from diive.core.plotting.styles.LightTheme import FONTSIZE_LEGEND
+
         # Data
         xdata = self.fit_results['x']
         ydata = self.fit_results['y']
@@ -259,6 +254,8 @@ class QuadraticFit:
 
     def _predband(self, px, x, y, params_opt, func, conf=0.95):
         """Prediction band"""
+        from scipy import stats
+
         # px = requested points, x = x data, y = y data, params_opt = parameters, func = function name
         alpha = 1.0 - conf  # significance
         N = x.size  # data sample size
@@ -289,6 +286,9 @@ class QuadraticFit:
 
         kudos: https://apmonitor.com/che263/index.php/Main/PythonRegressionStatistics
         """
+        import uncertainties as unc
+        import uncertainties.unumpy as unp
+        from scipy.optimize import curve_fit
 
         df, x, y = self._set_fit_data(df=df)
 
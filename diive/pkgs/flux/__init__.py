@@ -1,2 +1,3 @@
-import diive.pkgs.flux.criticaldays
-import diive.pkgs.flux.co2_penalty
+from diive.core.utils.lazy import lazy_module
+
+__getattr__, __dir__ = lazy_module(__name__, ['criticaldays', 'co2_penalty'])
@@ -3,20 +3,12 @@
 from pathlib import Path
 from typing import Literal
 
-import matplotlib as mpl
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from matplotlib import dates as mdates
 from pandas import DataFrame, Series
 
 import diive.core.dfun.frames as frames
-from diive.core.dfun.fits import BinFitterCP
 # from diive.core.dfun.frames import steplagged_variants
-from diive.core.plotting.fitplot import fitplot
-from diive.core.plotting.plotfuncs import default_legend, default_format, nice_date_ticks, save_fig, add_zeroline_y
-from diive.core.plotting.styles.LightTheme import COLOR_NEP, COLOR_RECO
 from diive.core.times.times import include_timestamp_as_cols
 from diive.pkgs.createvar.vpd import calc_vpd_from_ta_rh
 from diive.pkgs.gapfilling.randomforest_ts import RandomForestTS
@@ -246,25 +238,15 @@ class CO2penalty:
     def _insert_aggregates_into_hires(self, hires_df: DataFrame) -> tuple[DataFrame, str, str]:
         """Insert daily max of TA and VPD into high-res dataframe"""
 
-        # Aggregation settings
-        settings = dict(to_freq='D',
-                        to_agg='max',
-                        interpolate_missing_vals=False,
-                        interpolation_lim=False)
-
-        # Insert aggregated TA as column in hires dataframe
-        _hiresagg_ta = frames.aggregated_as_hires(aggregate_series=hires_df[self.ta_col],
-                                                  hires_timestamp=hires_df.index,
-                                                  **settings)
-        hires_df[_hiresagg_ta.name] = _hiresagg_ta
-        hiresagg_ta_name = str(_hiresagg_ta.name)
-
-        # Insert aggregated VPD as column in hires dataframe
-        _hiresagg_vpd = frames.aggregated_as_hires(aggregate_series=hires_df[self.vpd_col],
-                                                   hires_timestamp=hires_df.index,
-                                                   **settings)
-        hires_df[_hiresagg_vpd.name] = _hiresagg_vpd
-        hiresagg_vpd_name = str(_hiresagg_vpd.name)
+        # Daily max of TA and VPD, inserted as columns in hires dataframe
+        to_freq = 'D'
+        to_agg = 'max'
+        _hiresagg_df = frames.aggregate_broadcast(data=hires_df[[self.ta_col, self.vpd_col]],
+                                                  to_freq=to_freq, to_agg=to_agg)
+        hiresagg_ta_name = f".{self.ta_col}_{to_freq}_{to_agg}"
+        hiresagg_vpd_name = f".{self.vpd_col}_{to_freq}_{to_agg}"
+        hires_df[hiresagg_ta_name] = _hiresagg_df[self.ta_col]
+        hires_df[hiresagg_vpd_name] = _hiresagg_df[self.vpd_col]
         return hires_df, hiresagg_ta_name, hiresagg_vpd_name
 
     def _get_hires_chd_data(self,
@@ -297,6 +279,7 @@ class CO2penalty:
         - Set CHD data to their diel cycle medians
         - Remove NEP CHD data
         """
+        import matplotlib.pyplot as plt
 
         # High-res dataframe
         hires_df = self.df.copy()
@@ -407,6 +390,11 @@ class CO2penalty:
                             decorate_labels1: list = None,
                             decorate_labels2: list = None):
 
+        from diive.core.dfun.fits import BinFitterCP
+        from diive.core.plotting.fitplot import fitplot
+        from diive.core.plotting.plotfuncs import default_legend, default_format, add_zeroline_y
+        from diive.core.plotting.styles.LightTheme import COLOR_RECO
+
         df = self.df.copy()
 
         if fit_n_bootstraps < 2: fit_n_bootstraps = 2
@@ -591,6 +579,11 @@ class CO2penalty:
                          showfill_penalty: bool = True,
                          showtitle: bool = True):
 
+        import matplotlib as mpl
+        from matplotlib import dates as mdates
+        from diive.core.plotting.plotfuncs import default_legend, default_format
+        from diive.core.plotting.styles.LightTheme import COLOR_NEP, COLOR_RECO
+
         gapfilled_col = f'_LIMITED_{self.nep_col}_gfRF'
         label_penalty = r"$\mathrm{CO_{2}\ penalty}$"
         label_units_cumulative = r"$\mathrm{gCO_{2}\ m^{-2}}$"
@@ -733,6 +726,9 @@ class CO2penalty:
                          showfill_penalty: bool = True,
                          ):
 
+        from diive.core.plotting.plotfuncs import default_legend, default_format, nice_date_ticks
+        from diive.core.plotting.styles.LightTheme import COLOR_NEP, COLOR_RECO
+
         label_penalty = r"$\mathrm{NEP\ penalty}$"
         label_units = r"$\mathrm{gCO_{2}\ m^{-2}\ 30min^{-1}}$"
 
@@ -825,6 +821,10 @@ class CO2penalty:
                                 path: Path or str = None,
                                 dpi: int = 72,
                                 **kwargs):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.plotfuncs import save_fig
+
         fig = plt.figure(facecolor='white', figsize=(9, 9), dpi=dpi)
         gs = gridspec.GridSpec(1, 1)  # rows, cols
         # gs.update(wspace=0, hspace=0, left=.2, right=.8, top=.8, bottom=.2)
@@ -841,6 +841,10 @@ class CO2penalty:
                              path: Path or str = None,
                              dpi: int = 72,
                              **kwargs):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.plotfuncs import save_fig
+
         fig = plt.figure(facecolor='white', figsize=(23, 6), dpi=dpi)
         gs = gridspec.GridSpec(1, 4)  # rows, cols
         # gs.update(wspace=0, hspace=0, left=.2, right=.8, top=.8, bottom=.2)
@@ -861,6 +865,10 @@ class CO2penalty:
                              path: Path or str = None,
                              dpi: int = 72,
                              **kwargs):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.plotfuncs import save_fig
+
         fig = plt.figure(facecolor='white', figsize=(9, 9), dpi=dpi)
         gs = gridspec.GridSpec(1, 1)  # rows, cols
         # gs.update(wspace=0, hspace=0, left=.2, right=.8, top=.8, bottom=.2)
@@ -6,20 +6,10 @@ CRITICAL DAYS
 from pathlib import Path
 from typing import Literal
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from matplotlib.legend_handler import HandlerTuple
 from pandas import DataFrame
 
-import diive.core.plotting.styles.LightTheme as theme
-from diive.core.plotting import plotfuncs
-from diive.core.plotting.plotfuncs import save_fig
-from diive.core.plotting.rectangle import rectangle
-from diive.core.plotting.styles.LightTheme import COLOR_THRESHOLD, \
-    FONTSIZE_LEGEND, COLOR_NEE, INFOTXT_FONTSIZE
-from diive.pkgs.fits.binfitter import BinFitterBTS, PlotBinFitterBTS
 
 pd.set_option('display.width', 1500)
 pd.set_option('display.max_columns', 30)
@@ -186,6 +176,12 @@ class CriticalDays:
                                      showrange_dcrit: bool = True,
                                      label_threshold: str = None):
         """Plot results from critical days threshold detection"""
+        from matplotlib.legend_handler import HandlerTuple
+        import diive.core.plotting.styles.LightTheme as theme
+        from diive.core.plotting import plotfuncs
+        from diive.core.plotting.rectangle import rectangle
+        from diive.core.plotting.styles.LightTheme import COLOR_THRESHOLD, FONTSIZE_LEGEND, COLOR_NEE, INFOTXT_FONTSIZE
+        from diive.pkgs.fits.binfitter import PlotBinFitterBTS
 
         label_threshold = 'threshold' if not label_threshold else label_threshold
 
@@ -339,6 +335,7 @@ class CriticalDays:
                         y_agg: str,
                         fit_to_bins: int = 10) -> tuple[dict, dict]:
         """Bootstrap ycols and fit to x"""
+        from diive.pkgs.fits.binfitter import BinFitterBTS
 
         # Get column names in aggregated df
         x_col = (x_col, x_agg)
@@ -476,6 +473,10 @@ class CriticalDays:
                               path: Path or str = None,
                               dpi: int = 72,
                               **kwargs):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.plotfuncs import save_fig
+
         fig = plt.figure(figsize=(9, 9), dpi=dpi)
         gs = gridspec.GridSpec(1, 1)  # rows, cols
         # gs.update(wspace=.2, hspace=1, left=.1, right=.9, top=.85, bottom=.1)
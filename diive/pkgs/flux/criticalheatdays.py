@@ -1,19 +1,12 @@
 from pathlib import Path
 from typing import Literal
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from matplotlib.legend_handler import HandlerTuple
 from pandas import DataFrame, Series
 
 from diive.core.dfun.frames import flatten_multiindex_all_df_cols
-from diive.core.plotting.heatmap_xyz import HeatmapPivotXYZ
-from diive.core.plotting.plotfuncs import default_format, save_fig
-from diive.core.plotting.styles.LightTheme import COLOR_NEP, FONTSIZE_LEGEND
 from diive.pkgs.analyses.quantilexyaggz import QuantileXYAggZ
-from diive.pkgs.fits.fitter import QuadraticFit
 
 
 class FluxCriticalHeatDaysP95:
@@ -425,6 +418,8 @@ class FluxCriticalHeatDaysP95:
 
     def fit(self, n_predictions: int = 1000):
 
+        from diive.pkgs.fits.fitter import QuadraticFit
+
         _df = self.xyz_long_extended_bins_equal_df
         fitter = QuadraticFit(
             df=_df,
@@ -443,6 +438,10 @@ class FluxCriticalHeatDaysP95:
                                      path: Path or str = None,
                                      dpi: int = 72,
                                      **kwargs):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.plotfuncs import save_fig
+
         fig = plt.figure(figsize=(10, 9), dpi=dpi)
         gs = gridspec.GridSpec(1, 1)  # rows, cols
         # gs.update(wspace=.2, hspace=1, left=.1, right=.9, top=.85, bottom=.1)
@@ -455,6 +454,8 @@ class FluxCriticalHeatDaysP95:
         return ax
 
     def plot_heatmap_percentiles(self, ax, **kwargs):
+        from diive.core.plotting.heatmap_xyz import HeatmapPivotXYZ
+
         hm = HeatmapPivotXYZ(pivotdf=self.xyz_pivot_df)
         hm.plot(ax=ax,
                 xlabel=r'Daily maximum air temperature ($\mathrm{percentile}$)',
@@ -471,6 +472,10 @@ class FluxCriticalHeatDaysP95:
                               path: Path or str = None,
                               dpi: int = 72,
                               **kwargs):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.plotfuncs import save_fig
+
         fig = plt.figure(figsize=(9, 9), dpi=dpi)
         gs = gridspec.GridSpec(1, 1)  # rows, cols
         # gs.update(wspace=.2, hspace=1, left=.1, right=.9, top=.85, bottom=.1)
@@ -500,6 +505,10 @@ class FluxCriticalHeatDaysP95:
         # diff['aaa'].plot()
         # plt.show()
 
+        from matplotlib.legend_handler import HandlerTuple
+        from diive.core.plotting.plotfuncs import default_format
+        from diive.core.plotting.styles.LightTheme import COLOR_NEP, FONTSIZE_LEGEND
+
         _plotdf = self.combobins_bins_equal_df
 
         # Plot z var as y in scatter plot
@@ -1,17 +1,11 @@
 import datetime as dt
 import time
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from pandas import DataFrame, Series
-from uncertainties import ufloat
 
-import diive.core.plotting.styles.LightTheme as theme
 from diive.core.dfun.frames import df_between_two_dates
-from diive.core.plotting.plotfuncs import default_format, default_legend, nice_date_ticks
-from diive.core.plotting.scatter import ScatterXY
 
 
 # todo
@@ -110,6 +104,7 @@ class RandomUncertaintyPAS20:
 
         Uses the uncertainties package.
         """
+        from uncertainties import ufloat
 
         fluxunc = 'FLUX+/-UNC'
         flux_upper = 'FLUX+UNC'
@@ -151,10 +146,18 @@ class RandomUncertaintyPAS20:
               f"Cumulative upper limit: {upper}")
 
     def showplot_cumulative_uncertainty_propagation(self):
+        import matplotlib.pyplot as plt
+
         self.randunc_results_cumulatives[[self.fluxgapfilledcol, 'FLUX+UNC', 'FLUX-UNC']].plot()
         plt.show()
 
     def showplot_random_uncertainty(self):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        import diive.core.plotting.styles.LightTheme as theme
+        from diive.core.plotting.plotfuncs import default_format, default_legend, nice_date_ticks
+        from diive.core.plotting.scatter import ScatterXY
+
         fig = plt.figure(facecolor='white', figsize=(18, 9))
         fig.suptitle("Random uncertainties", fontsize=theme.FIGHEADER_FONTSIZE)
         gs = gridspec.GridSpec(2, 4)  # rows, cols
@@ -432,6 +435,8 @@ class RandomUncertaintyPAS20:
 
 
 def example():
+    import matplotlib.pyplot as plt
+
     # Test: Load test data, using pickle for fast loading
     from diive.configs.exampledata import load_exampledata_pickle
     data_df = load_exampledata_pickle()
@@ -1,11 +1,7 @@
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from pandas import Series, DataFrame
 
-import diive.core.plotting.plotfuncs as pf
-import diive.core.plotting.styles.LightTheme as theme
 from diive.core.utils.prints import ConsoleOutputDecorator
 from diive.pkgs.createvar.daynightflag import daytime_nighttime_flag_from_swinpot
 
@@ -84,6 +80,11 @@ class UstarThresholdConstantScenarios:
         if self.showplot: self._plot(daytimedf=_scenariosdf_daytime, nighttimedf=_scenariosdf_nighttime)
 
     def _plot(self, daytimedf, nighttimedf):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        import diive.core.plotting.plotfuncs as pf
+        import diive.core.plotting.styles.LightTheme as theme
+
         # Count available records for each USTAR threshold
         counts = self._scenariosdf.describe().loc['count']
         counts_daytime = daytimedf.describe().loc['count']
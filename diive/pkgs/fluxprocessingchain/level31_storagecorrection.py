@@ -1,13 +1,10 @@
 from typing import Literal
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import pandas as pd
 from pandas import DataFrame
 
 from diive.core.dfun.stats import sstats  # Time series stats
 from diive.core.funcs.funcs import validate_id_string
-from diive.core.plotting.heatmap_datetime import HeatmapDateTime
 from diive.pkgs.gapfilling.randomforest_ts import QuickFillRFTS
 
 
@@ -193,6 +190,10 @@ class FluxStorageCorrectionSinglePointEddyPro:
 
     def showplot(self, maxflux: float):
 
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.heatmap_datetime import HeatmapDateTime
+
         fig = plt.figure(facecolor='white', figsize=(16, 9))
         gs = gridspec.GridSpec(1, 3)  # rows, cols
         gs.update(wspace=0.3, hspace=0.3, left=0.06, right=0.94, top=0.9, bottom=0.1)
@@ -1 +1,3 @@
-from . import interpolate
\ No newline at end of file
+from diive.core.utils.lazy import lazy_module
+
+__getattr__, __dir__ = lazy_module(__name__, ['interpolate'])
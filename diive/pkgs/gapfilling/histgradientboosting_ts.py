@@ -0,0 +1,84 @@
+"""
+=================================================================
+HISTOGRAM-BASED GRADIENT BOOSTING GAP-FILLING FOR TIME SERIES
+histgradientboosting_ts
+=================================================================
+
+This module is part of the diive library:
+https://gitlab.ethz.ch/diive/diive
+
+Gap-filling with scikit-learn's HistGradientBoostingRegressor. Features are
+binned into histograms before training, which makes training much faster than
+random forest for large datasets, e.g. multi-year 30-min or 1-min data.
+
+The model handles missing values in features natively, records with missing
+features are therefore used for training and are gap-filled by the full model.
+The fallback model (timestamp features only) is only needed when the target
+is still missing afterwards, which is usually not the case.
+
+Kudos:
+- https://scikit-learn.org/stable/modules/ensemble.html#histogram-based-gradient-boosting
+
+"""
+from typing import TYPE_CHECKING
+
+from diive.pkgs.gapfilling.mlbase import MlRegressorGapFillingBase
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+
+class HistGradientBoostingTS(MlRegressorGapFillingBase):
+    """
+    Gap-fill timeseries with predictions from histogram-based gradient boosting model
+
+    See `MlRegressorGapFillingBase` for the arguments, *kwargs* are the parameters of
+    HistGradientBoostingRegressor, e.g. max_iter=500, learning_rate=0.1, random_state=42.
+    *random_state* is required, it is also used to split training and test data.
+
+    Example:
+        hgbts = HistGradientBoostingTS(input_df=df, target_col='NEE', max_iter=500, random_state=42)
+        hgbts.trainmodel()
+        hgbts.fillgaps()
+        gapfilled = hgbts.get_gapfilled_target()
+    """
+
+    gfsuffix = 'gfHGB'
+    missing_features = True
+
+    def _new_model(self) -> 'HistGradientBoostingRegressor':
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        return HistGradientBoostingRegressor(**self.kwargs)
+
+
+def example():
+    from diive.configs.exampledata import load_exampledata_parquet
+
+    df = load_exampledata_parquet()
+    subsetcols = ['NEE_CUT_REF_f', 'Tair_f', 'Rg_f', 'VPD_f']
+    df = df[subsetcols].copy()
+    df = df.loc[(df.index.year >= 2019) & (df.index.year <= 2020)].copy()
+
+    hgbts = HistGradientBoostingTS(
+        input_df=df,
+        target_col='NEE_CUT_REF_f',
+        verbose=1,
+        features_lag=[-1, -1],
+        include_timestamp_as_features=True,
+        add_continuous_record_number=True,
+        sanitize_timestamp=True,
+        perm_n_repeats=3,
+        max_iter=500,
+        learning_rate=0.1,
+        random_state=42
+    )
+    hgbts.reduce_features()
+    hgbts.report_feature_reduction()
+    hgbts.trainmodel(showplot_scores=False, showplot_importance=False)
+    hgbts.report_traintest()
+    hgbts.fillgaps(showplot_scores=False, showplot_importance=False)
+    hgbts.report_gapfilling()
+
+
+if __name__ == '__main__':
+    example()
@@ -0,0 +1,351 @@
+"""
+=========================================
+MARGINAL DISTRIBUTION SAMPLING (MDS)
+mds
+=========================================
+
+This module is part of the diive library:
+https://gitlab.ethz.ch/diive/diive
+
+Gap-filling of ecosystem fluxes with marginal distribution sampling (MDS) after
+Reichstein et al. (2005), the standard method used in FLUXNET/ONEFlux and REddyProc.
+
+Missing flux values are replaced by the average of measured fluxes under similar
+meteorological conditions within a time window around the gap (look-up table),
+or by the average flux at the same time of day (mean diurnal course). The time
+window grows until enough similar conditions are found, the quality class of the
+filled value depends on the method and the window size.
+
+All window searches are done for all gaps of a step at once: window limits are
+found with `np.searchsorted` on the sorted timestamp, and the mean diurnal course
+is calculated from cumulative sums.
+
+References:
+    Reichstein, M. et al. (2005). On the separation of net ecosystem exchange into
+        assimilation and ecosystem respiration: review and improved algorithm. Global
+        Change Biology, 11(9), 1424–1439. https://doi.org/10.1111/j.1365-2486.2005.001002.x
+    https://github.com/bgctw/REddyProc/blob/master/R/EddyGapfilling.R
+
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+
+# Method numbers as in Reichstein et al. (2005)
+METHOD_LUT = 1  # Look-up table with radiation, air temperature and VPD
+METHOD_LUT_SWIN = 2  # Look-up table with radiation only
+METHOD_MDC = 3  # Mean diurnal course
+
+
+class FluxMDS:
+    """
+    Gap-fill flux time series with marginal distribution sampling (MDS)
+
+    The gaps are filled in steps, each step only fills gaps that are still missing:
+        1. Look-up table (LUT) with all drivers, window +/- 7 and 14 days
+        2. LUT with radiation only, window +/- 7 days
+        3. Mean diurnal course (MDC), window +/- 0, 1 and 2 days
+        4. LUT with all drivers, window +/- 21 to 70 days (7-day steps)
+        5. LUT with radiation only, window +/- 14 to 70 days (7-day steps)
+        6. MDC, window +/- 7 to 210 days (7-day steps)
+
+    LUT: average of measured fluxes in the window where all drivers are within their
+    tolerance of the drivers at the gap. The radiation tolerance is the radiation at the
+    gap, limited to the range *swin_tol* (20-50 W m-2 by default), as in REddyProc. It is
+    therefore smaller during night, which keeps day and night conditions apart.
+
+    MDC: average of measured fluxes in the window at the same time of day (+/- 1 hour).
+
+    Quality classes (also in the flag, 0 = measured):
+        1 (A): LUT with window <= 14 days, MDC with window <= 1 day
+        2 (B): LUT with window <= 56 days, MDC with window <= 5 days
+        3 (C): all other
+
+    Example:
+        mds = FluxMDS(df=df, flux='NEE', ta='TA', swin='SW_IN', vpd='VPD')
+        mds.run()
+        mds.report()
+        gapfilled = mds.get_gapfilled_target()
+    """
+
+    def __init__(self,
+                 df: DataFrame,
+                 flux: str,
+                 ta: str,
+                 swin: str,
+                 vpd: str,
+                 swin_tol: list = None,
+                 ta_tol: float = 2.5,
+                 vpd_tol: float = 5.0,
+                 min_n_vals: int = 2,
+                 verbose: int = 1):
+        """
+        Args:
+            df: Dataframe with flux and drivers, the timestamp must have a regular
+                time resolution, e.g. 30MIN
+            flux: Name of the flux that is gap-filled
+            ta: Name of air temperature (°C)
+            swin: Name of short-wave incoming radiation (W m-2)
+            vpd: Name of vapor pressure deficit (hPa)
+            swin_tol: Radiation tolerance [min, max] in W m-2, [20, 50] if *None*. The
+                tolerance is the radiation at the gap, clipped to this range.
+            ta_tol: Air temperature tolerance in °C
+            vpd_tol: VPD tolerance in hPa
+            min_n_vals: Minimum number of measured fluxes needed to calculate an average
+            verbose: Print info about the gap-filling steps if > 0
+        """
+        self.flux = flux
+        self.ta = ta
+        self.swin = swin
+        self.vpd = vpd
+        self.swin_tol = swin_tol if swin_tol else [20, 50]
+        self.ta_tol = ta_tol
+        self.vpd_tol = vpd_tol
+        self.min_n_vals = min_n_vals
+        self.verbose = verbose
+
+        self.df = self._regular_timestamp(df=df[[flux, ta, swin, vpd]])
+        self.target_gapfilled_col = f"{self.flux}_gfMDS"
+        self.target_gapfilled_flag_col = f"FLAG_{self.target_gapfilled_col}_ISFILLED"
+
+        # Records per day and records within +/- 1 hour, for the mean diurnal course
+        self._freq = pd.Timedelta(self.df.index.freq)
+        self._records_per_day = int(pd.Timedelta('1D') / self._freq)
+        self._records_per_hour = max(1, int(round(pd.Timedelta('1h') / self._freq)))
+
+        self._gapfilling_df = None
+
+    @property
+    def gapfilling_df_(self) -> DataFrame:
+        """Gap-filling results, with method, window size, number of values and quality class of filled values"""
+        if not isinstance(self._gapfilling_df, DataFrame):
+            raise Exception('Not available: gap-filled data.')
+        return self._gapfilling_df
+
+    def get_gapfilled_target(self) -> Series:
+        """Gap-filled target time series"""
+        return self.gapfilling_df_[self.target_gapfilled_col]
+
+    def get_flag(self) -> Series:
+        """Gap-filling flag, 0 = measured, 1/2/3 = filled with quality class A/B/C"""
+        return self.gapfilling_df_[self.target_gapfilled_flag_col]
+
+    def run(self):
+        """Fill gaps in all steps"""
+        tic = time.perf_counter()
+
+        timestamp = self.df.index.to_numpy().astype('int64')
+        target = self.df[self.flux].to_numpy(dtype=float)
+        ta = self.df[self.ta].to_numpy(dtype=float)
+        swin = self.df[self.swin].to_numpy(dtype=float)
+        vpd = self.df[self.vpd].to_numpy(dtype=float)
+
+        # Radiation tolerance is the radiation at the gap, e.g. max(min(50, SW_IN), 20)
+        swin_tol = np.clip(swin, self.swin_tol[0], self.swin_tol[1])
+        all_drivers = [(swin, swin_tol), (ta, np.full(len(ta), self.ta_tol)), (vpd, np.full(len(vpd), self.vpd_tol))]
+        swin_only = [(swin, swin_tol)]
+
+        filled = np.full(len(target), np.nan)
+        sd = np.full(len(target), np.nan)
+        n_vals = np.zeros(len(target), dtype=int)
+        method = np.zeros(len(target), dtype=int)
+        window = np.full(len(target), -1, dtype=int)
+
+        steps = [(METHOD_LUT, 7), (METHOD_LUT, 14), (METHOD_LUT_SWIN, 7),
+                 (METHOD_MDC, 0), (METHOD_MDC, 1), (METHOD_MDC, 2)]
+        steps += [(METHOD_LUT, days) for days in range(21, 71, 7)]
+        steps += [(METHOD_LUT_SWIN, days) for days in range(14, 71, 7)]
+        steps += [(METHOD_MDC, days) for days in range(7, 211, 7)]
+
+        for stepmethod, days in steps:
+            gaps = np.flatnonzero(np.isnan(target) & np.isnan(filled))
+            if stepmethod == METHOD_LUT:
+                drivers = all_drivers
+            elif stepmethod == METHOD_LUT_SWIN:
+                drivers = swin_only
+            else:
+                drivers = []
+            # Look-up tables need all their drivers at the gap
+            for driver, _ in drivers:
+                gaps = gaps[~np.isnan(driver[gaps])]
+            if not len(gaps):
+                continue
+
+            if stepmethod == METHOD_MDC:
+                avg, std, n = self._mean_diurnal_course(target=target, days=days)
+                avg, std, n = avg[gaps], std[gaps], n[gaps]
+            else:
+                avg, std, n = self._lookup_table(timestamp=timestamp, target=target, gaps=gaps,
+                                                 drivers=drivers, days=days)
+            ok = n >= self.min_n_vals
+            gaps = gaps[ok]
+            filled[gaps] = avg[ok]
+            sd[gaps] = std[ok]
+            n_vals[gaps] = n[ok]
+            method[gaps] = stepmethod
+            window[gaps] = days
+            if self.verbose:
+                print(f"MDS step method {stepmethod} with window +/- {days} days: filled {len(gaps)} gaps.")
+
+        self._gapfilling_df = self._collect(target=target, filled=filled, sd=sd, n_vals=n_vals,
+                                            method=method, window=window)
+        if self.verbose:
+            print(f"MDS gap-filling of {self.flux} finished in {time.perf_counter() - tic:.2f}s.")
+
+    def report(self):
+        """Summary of gap-filling results"""
+        df = self.gapfilling_df_
+        flag = self.get_flag()
+        n_missing_before = df[self.flux].isnull().sum()
+        print("\nMDS GAP-FILLING RESULTS\n"
+              "=======================\n"
+              f"- target: {self.flux}\n"
+              f"- gap-filled target: {self.target_gapfilled_col}\n"
+              f"- tolerances: {self.swin} {self.swin_tol} (clipped radiation at gap), "
+              f"{self.ta} {self.ta_tol}, {self.vpd} {self.vpd_tol}\n"
+              f"- missing records before gap-filling: {n_missing_before}\n"
+              f"- gap-filled records: {(flag > 0).sum()}\n"
+              f"    quality class A (1): {(flag == 1).sum()}\n"
+              f"    quality class B (2): {(flag == 2).sum()}\n"
+              f"    quality class C (3): {(flag == 3).sum()}\n"
+              f"- missing records after gap-filling: {df[self.target_gapfilled_col].isnull().sum()}\n"
+              f"- filled records per method and window size (days):")
+        print(df.loc[flag > 0].groupby(['.METHOD', '.WINDOW_DAYS']).size().to_string())
+
+    def _lookup_table(self, timestamp: np.ndarray, target: np.ndarray, gaps: np.ndarray,
+                      drivers: list, days: int, max_elements: int = 2 ** 22) -> tuple:
+        """Average, standard deviation and number of measured fluxes with similar drivers for each gap
+
+        Windows of all gaps are searched at once: window limits are found with
+        searchsorted, records of the windows are compared to the drivers of the
+        gaps in chunks of gaps with at most *max_elements* comparisons.
+        """
+        halfwindow = pd.Timedelta(days=days).value
+        starts = np.searchsorted(timestamp, timestamp[gaps] - halfwindow, side='left')
+        stops = np.searchsorted(timestamp, timestamp[gaps] + halfwindow, side='right')
+        width = int((stops - starts).max())
+        chunksize = max(1, max_elements // width)
+
+        avg = np.full(len(gaps), np.nan)
+        std = np.full(len(gaps), np.nan)
+        n = np.zeros(len(gaps), dtype=int)
+        for first in range(0, len(gaps), chunksize):
+            chunk = slice(first, first + chunksize)
+            positions = starts[chunk, None] + np.arange(width)
+            inwindow = positions < stops[chunk, None]
+            positions = np.minimum(positions, len(target) - 1)
+            values = target[positions]
+            similar = inwindow & ~np.isnan(values)
+            for driver, tolerance in drivers:
+                gapdriver = driver[gaps[chunk]]
+                similar &= np.abs(driver[positions] - gapdriver[:, None]) < tolerance[gaps[chunk]][:, None]
+            avg[chunk], std[chunk], n[chunk] = _masked_stats(values=values, mask=similar)
+        return avg, std, n
+
+    def _mean_diurnal_course(self, target: np.ndarray, days: int) -> tuple:
+        """Average, standard deviation and number of measured fluxes at the same time of day (+/- 1 hour)
+        within +/- *days* days, for each record
+
+        Sums over the hour window are calculated from cumulative sums of the time series,
+        sums over the day window from cumulative sums over days of the same time of day.
+        """
+        available = ~np.isnan(target)
+        values = np.where(available, target, 0.0)
+        sums = [self._window_sum(x, days=days) for x in [values, values ** 2, available.astype(float)]]
+        total, total_sq, n = sums
+        n = np.rint(n).astype(int)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg = total / n
+            var = (total_sq - n * avg ** 2) / (n - 1)
+        avg[n == 0] = np.nan
+        std = np.sqrt(np.clip(var, 0, None))
+        std[n < 2] = np.nan
+        return avg, std, n
+
+    def _window_sum(self, x: np.ndarray, days: int) -> np.ndarray:
+        """Sum of *x* at the same time of day (+/- 1 hour) within +/- *days* days"""
+        hour = self._records_per_hour
+        perday = self._records_per_day
+
+        # Sum over +/- 1 hour
+        cumsum = np.concatenate([[0.0], np.cumsum(x)])
+        positions = np.arange(len(x))
+        upper = np.minimum(positions + hour + 1, len(x))
+        lower = np.maximum(positions - hour, 0)
+        hoursum = cumsum[upper] - cumsum[lower]
+
+        # Sum over +/- days, records of the same time of day are in the same column
+        n_days = -(-len(x) // perday)
+        grid = np.zeros(n_days * perday)
+        grid[:len(x)] = hoursum
+        grid = grid.reshape(n_days, perday)
+        cumsum = np.concatenate([np.zeros((1, perday)), np.cumsum(grid, axis=0)])
+        dayix = np.arange(n_days)
+        upper = np.minimum(dayix + days + 1, n_days)
+        lower = np.maximum(dayix - days, 0)
+        daysum = cumsum[upper] - cumsum[lower]
+        return daysum.ravel()[:len(x)]
+
+    def _collect(self, target, filled, sd, n_vals, method, window) -> DataFrame:
+        """Collect gap-filled target and details of filled records"""
+        df = self.df.copy()
+        quality = np.where(method == METHOD_MDC,
+                           np.select([window <= 1, window <= 5], [1, 2], default=3),
+                           np.select([window <= 14, window <= 56], [1, 2], default=3))
+        isfilled = method > 0
+        df[self.target_gapfilled_col] = np.where(np.isnan(target), filled, target)
+        df[self.target_gapfilled_flag_col] = np.where(isfilled, quality, np.where(np.isnan(target), np.nan, 0))
+        df['.PREDICTIONS'] = filled
+        df['.PREDICTIONS_SD'] = sd
+        df['.N_VALS'] = n_vals
+        df['.METHOD'] = method
+        df['.WINDOW_DAYS'] = np.where(isfilled, window, -1)
+        return df
+
+    @staticmethod
+    def _regular_timestamp(df: DataFrame) -> DataFrame:
+        """Sorted data with continuous timestamp, missing records are added as gaps"""
+        df = df.sort_index()
+        freq = df.index.freq or pd.infer_freq(df.index)
+        if not freq:
+            diffs = df.index.to_series().diff().dropna()
+            if diffs.empty:
+                raise ValueError("(!) MDS gap-filling needs a timestamp with regular time resolution.")
+            freq = diffs.mode().iloc[0]
+        index = pd.date_range(start=df.index[0], end=df.index[-1], freq=freq, name=df.index.name)
+        if len(index) != len(df) or not index.equals(df.index):
+            df = df.reindex(index)
+        df.index.freq = index.freq
+        return df
+
+
+def _masked_stats(values: np.ndarray, mask: np.ndarray) -> tuple:
+    """Average, standard deviation and number of *values* where *mask* is *True*, for each row"""
+    n = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg = np.where(mask, values, 0.0).sum(axis=1) / n
+        var = np.where(mask, (values - avg[:, None]) ** 2, 0.0).sum(axis=1) / (n - 1)
+    avg[n == 0] = np.nan
+    std = np.sqrt(var)
+    std[n < 2] = np.nan
+    return avg, std, n
+
+
+def example():
+    from diive.configs.exampledata import load_exampledata_parquet
+
+    df = load_exampledata_parquet()
+
+    # Only high-quality (QCF=0) measured NEE is used
+    df.loc[df['QCF_NEE'] > 0, 'NEE_CUT_REF_orig'] = np.nan
+
+    mds = FluxMDS(df=df, flux='NEE_CUT_REF_orig', ta='Tair_f', swin='Rg_f', vpd='VPD_f')
+    mds.run()
+    mds.report()
+    print(mds.get_gapfilled_target().describe())
+
+
+if __name__ == '__main__':
+    example()
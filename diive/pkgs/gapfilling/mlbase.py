@@ -1,46 +1,92 @@
-# TODO TimeSeriesSplit like in https://www.youtube.com/watch?v=z3ZnOW-S550
-# TODO generalization bias
-# TODO SHAP values
-# https://pypi.org/project/shap/
-# https://mljar.com/blog/feature-importance-in-random-forest/
-
 """
-=========================================
-RANDOM FOREST GAP-FILLING FOR TIME SERIES
-randomforest_ts
-=========================================
+=================================================
+MACHINE LEARNING GAP-FILLING FOR TIME SERIES: BASE
+mlbase
+=================================================
 
 This module is part of the diive library:
 https://gitlab.ethz.ch/diive/diive
 
-    - Example notebook available in:
-        notebooks/GapFilling/RandomForestGapFilling.ipynb
-
-Kudos, optimization of hyper-parameters, grid search
-- https://scikit-learn.org/stable/modules/grid_search.html
-- https://www.kaggle.com/code/carloscliment/random-forest-regressor-and-gridsearch
+Workflow shared by gap-filling classes that use a regression model, e.g.
+`RandomForestTS`: adding features, feature reduction, model training,
+gap-filling and reports.
 
 """
-import matplotlib.pyplot as plt
+import time
+
 import numpy as np
 import pandas as pd
-import xgboost as xgb
 from pandas import DataFrame
-from sklearn.ensemble import RandomForestRegressor  # Import the model we are using
-from sklearn.inspection import permutation_importance
-from sklearn.model_selection import train_test_split
 
 import diive.core.dfun.frames as fr
-from diive.core.ml.common import prediction_scores_regr, plot_prediction_residuals_error_regr
+from diive.core.ml.common import prediction_scores_regr, plot_prediction_residuals_error_regr, \
+    stratified_record_subsample
+from diive.core.ml.featurematrix import FeatureMatrix
+from diive.core.ml.registry import ModelRegistry, fingerprint_model
 from diive.core.times.times import TimestampSanitizer
 from diive.core.times.times import include_timestamp_as_cols
 
-pd.set_option('display.max_rows', 50)
-pd.set_option('display.max_columns', 12)
-pd.set_option('display.width', 1000)
 
+def prepare_model_df(df: DataFrame,
+                     target_col: str or tuple,
+                     features_lag: list = None,
+                     include_timestamp_as_features: bool = False,
+                     add_continuous_record_number: bool = False,
+                     sanitize_timestamp: bool = False,
+                     features_float32: bool = False,
+                     copy: bool = True,
+                     verbose: int = 0) -> DataFrame:
+    """
+    Add features to a copy of *df*, see `MlRegressorGapFillingBase` for the arguments
+
+    Returns:
+        dataframe with target and all features, used as *model_df* for the model
+    """
+    # Without new features *df* is not changed and does not need to be copied
+    adds_features = features_lag or include_timestamp_as_features or add_continuous_record_number \
+                    or sanitize_timestamp
+    model_df = df.copy() if copy or adds_features else df
+
+    if features_lag and (len(model_df.columns) > 1):
+        # Add lagged variants of variables as new features
+        model_df = fr.lagged_variants(df=model_df,
+                                      stepsize=1,
+                                      lag=features_lag,
+                                      exclude_cols=[target_col],
+                                      dtype='float32' if features_float32 else None)
+
+    if include_timestamp_as_features:
+        model_df = include_timestamp_as_cols(df=model_df, txt="")
+
+    if add_continuous_record_number:
+        model_df = fr.add_continuous_record_number(df=model_df)
+
+    if sanitize_timestamp:
+        verbose = True if verbose > 0 else False
+        tss = TimestampSanitizer(data=model_df, output_middle_timestamp=True, verbose=verbose)
+        model_df = tss.get()
 
-class XGBoostTS:
+    if features_float32:
+        featurecols = [c for c in model_df.columns if c != target_col]
+        model_df = model_df.astype({c: 'float32' for c in featurecols}, copy=False)
+
+    return model_df
+
+
+class MlRegressorGapFillingBase:
+    """
+    Base class for gap-filling time series with predictions from a regression model
+
+    Subclasses create the model in `_new_model()`, everything else (features, feature
+    reduction, training, gap-filling, reports) is the same for all models.
+    """
+
+    # Suffix of the gap-filled target, e.g. 'gfRF' gives 'NEE_gfRF'
+    gfsuffix = 'gf'
+
+    # If *True*, records with missing features are used for training and are
+    # gap-filled by the full model, the model must handle missing values
+    missing_features = False
 
     def __init__(
             self,
@@ -50,14 +96,16 @@ class XGBoostTS:
             perm_n_repeats: int = 10,
             test_size: float = 0.25,
             features_lag: list = None,
-            features_lagmax: int = None,
             include_timestamp_as_features: bool = False,
             add_continuous_record_number: bool = False,
             sanitize_timestamp: bool = False,
+            features_float32: bool = False,
+            registry: ModelRegistry = None,
+            copy: bool = True,
             **kwargs
     ):
         """
-        Gap-fill timeseries with predictions from random forest model
+        Gap-fill timeseries with predictions from a regression model
 
         Args:
             input_df:
@@ -95,46 +143,67 @@ class XGBoostTS:
             sanitize_timestamp:
                 Validate and prepare timestamps for further processing
 
+            features_float32:
+                Store features as float32 instead of float64, this halves the memory
+                needed for features e.g. for long 1-minute training sets with many lagged
+                variants. Results do not change for models that convert features to float32
+                internally, e.g. random forest.
+
+            registry:
+                Registry where trained models are stored. In `.trainmodel()`, a model that
+                was already trained on the same data with the same parameters is loaded from
+                the registry instead of being trained again. Use `.load_model()` to fill gaps
+                with a registered model without training, e.g. when new records arrived.
+
+            copy:
+                If *False* and no features are added, *input_df* is used as it is instead of
+                a copy, e.g. for data pools where features were already prepared. *input_df*
+                is not changed by the model.
+
         Attributes:
             gapfilled_df
-            - .PREDICTIONS_FULLMODEL uses the output from the full RF model where
+            - .PREDICTIONS_FULLMODEL uses the output from the full model where
               all features where available.
-            - .PREDICTIONS_FALLBACK uses the output from the fallback RF model, which
+            - .PREDICTIONS_FALLBACK uses the output from the fallback model, which
               was trained on the combined observed + .PREDICTIONS_FULLMODEL data, using
               only the timestamp info as features.
         """
 
         # Args
-        self.model_df = input_df.copy()
         self.target_col = target_col
         self.kwargs = kwargs
         self.perm_n_repeats = perm_n_repeats
         self.test_size = test_size
         self.features_lag = features_lag
-        self.features_lagmax = features_lagmax
+        self.features_float32 = features_float32
+        self.registry = registry
         self.verbose = verbose
 
-        self._check_n_cols()
-
-        if self.features_lag:
-            self.model_df = self._lag_features()
+        self.model_df = prepare_model_df(df=input_df,
+                                         target_col=self.target_col,
+                                         features_lag=self.features_lag,
+                                         include_timestamp_as_features=include_timestamp_as_features,
+                                         add_continuous_record_number=add_continuous_record_number,
+                                         sanitize_timestamp=sanitize_timestamp,
+                                         features_float32=self.features_float32,
+                                         copy=copy,
+                                         verbose=self.verbose)
 
-        if include_timestamp_as_features:
-            self.model_df = include_timestamp_as_cols(df=self.model_df, txt="")
+        self._check_n_cols()
 
-        if add_continuous_record_number:
-            self.model_df = fr.add_continuous_record_number(df=self.model_df)
+        self.random_col = None
 
-        if sanitize_timestamp:
-            verbose = True if verbose > 0 else False
-            tss = TimestampSanitizer(data=self.model_df, output_middle_timestamp=True, verbose=verbose)
-            self.model_df = tss.get()
+        # Target and feature arrays of model_df, shared by feature reduction, training and gap-filling
+        self._featurematrix = None
+        self._featurematrix_df = None  # model_df the feature matrix was built from
 
-        self.random_col = None
+        # Instantiate model with params
+        self._model = self._new_model()
+        self._model_key = None  # Fingerprint of the trained model in the registry
 
         # Attributes
         self._gapfilling_df = None  # Will contain gapfilled target and auxiliary variables
-        self._model = None
+        # self._model = None
         self._feature_importances = dict()
         self._feature_importances_traintest = dict()
         self._feature_importances_reduction = dict()
@@ -142,6 +211,8 @@ class XGBoostTS:
         self._scores_test = dict()
         self._accepted_features = []
         self._rejected_features = []
+        self._reduction_details = dict()  # Model and test data from feature reduction
+        self._reduction_settings = dict()
 
     def get_gapfilled_target(self):
         """Gap-filled target time series"""
@@ -152,17 +223,26 @@ class XGBoostTS:
         return self.gapfilling_df_[self.target_gapfilled_flag_col]
 
     @property
-    def model_(self) -> RandomForestRegressor:
+    def model_(self):
         """Return model, trained on test data"""
         if not self._model:
-            raise Exception(f'Not available: model.')
+            raise Exception('Not available: model.')
         return self._model
 
+    @property
+    def featurematrix_(self) -> FeatureMatrix:
+        """Return target and feature arrays of *model_df*, built again only if *model_df* was replaced"""
+        if self._featurematrix is None or self._featurematrix_df is not self.model_df:
+            self._featurematrix = FeatureMatrix.from_frame(df=self.model_df, target_col=self.target_col,
+                                                           missing_features=self.missing_features)
+            self._featurematrix_df = self.model_df
+        return self._featurematrix
+
     @property
     def feature_importances_(self) -> DataFrame:
         """Return feature importance for model used in gap-filling"""
         if not isinstance(self._feature_importances, DataFrame):
-            raise Exception(f'Not available: feature importances for gap-filling.')
+            raise Exception('Not available: feature importances for gap-filling.')
         return self._feature_importances
 
     @property
@@ -170,7 +250,7 @@ class XGBoostTS:
         """Return feature importance from model training on training data,
         with importances calculated using test data (holdout set)"""
         if not isinstance(self._feature_importances_traintest, DataFrame):
-            raise Exception(f'Not available: feature importances from training & testing.')
+            raise Exception('Not available: feature importances from training & testing.')
         return self._feature_importances_traintest
 
     @property
@@ -178,14 +258,14 @@ class XGBoostTS:
         """Return feature importance from feature reduction, model training on training data,
         with importances calculated using test data (holdout set)"""
         if not isinstance(self._feature_importances_reduction, DataFrame):
-            raise Exception(f'Not available: feature importances from feature reduction.')
+            raise Exception('Not available: feature importances from feature reduction.')
         return self._feature_importances_reduction
 
     @property
     def scores_(self) -> dict:
         """Return model scores for model used in gap-filling"""
         if not self._scores:
-            raise Exception(f'Not available: model scores for gap-filling.')
+            raise Exception('Not available: model scores for gap-filling.')
         return self._scores
 
     @property
@@ -193,38 +273,42 @@ class XGBoostTS:
         """Return model scores for model trained on training data,
         with scores calculated using test data (holdout set)"""
         if not self._scores_test:
-            raise Exception(f'Not available: model scores for gap-filling.')
+            raise Exception('Not available: model scores for gap-filling.')
         return self._scores_test
 
     @property
     def gapfilling_df_(self) -> DataFrame:
         """Return gapfilled data and auxiliary variables"""
         if not isinstance(self._gapfilling_df, DataFrame):
-            raise Exception(f'Gapfilled data not available.')
+            raise Exception('Gapfilled data not available.')
         return self._gapfilling_df
 
     @property
     def traintest_details_(self) -> dict:
         """Return details from train/test splits"""
         if not self._traintest_details:
-            raise Exception(f'Not available: details about training & testing.')
+            raise Exception('Not available: details about training & testing.')
         return self._traintest_details
 
     @property
     def accepted_features_(self) -> list:
         """Return list of accepted features from feature reduction"""
         if not self._accepted_features:
-            raise Exception(f'Not available: accepted features from feature reduction.')
+            raise Exception('Not available: accepted features from feature reduction.')
         return self._accepted_features
 
     @property
     def rejected_features_(self) -> list:
         """Return list of rejected features from feature reduction"""
         if not self._rejected_features:
-            raise Exception(f'Not available: accepted features from feature reduction.')
+            raise Exception('Not available: accepted features from feature reduction.')
         return self._rejected_features
 
-    def reduce_features(self):
+    def reduce_features(self,
+                        perm_subsample: float = None,
+                        perm_subsample_freq: str = 'M',
+                        perm_n_repeats: int = None,
+                        perm_n_jobs: int = -1):
         """Reduce number of features using permutation importance
 
         A random variable is added to features and the permutation importances
@@ -232,134 +316,71 @@ class XGBoostTS:
         benchmark to determine whether a feature is relevant. All features where
         permutation importance is smaller or equal to the importance of the random
         variable are rejected.
+
+        Permutation importances are calculated from the test data. For long time series,
+        e.g. multi-year 1-minute data, a subsample of the test data with the same fraction
+        of records from each period (e.g. each month) can be used instead. Whether a
+        subsample (and less repeats) still select the same features can be checked
+        with `.feature_reduction_stability()`.
+
+        Args:
+            perm_subsample: Fraction of test records used to calculate permutation importance,
+                between 0 and 1. All test records are used if *None*.
+            perm_subsample_freq: Periods from which the same fraction of test records is
+                drawn for the subsample, e.g. 'M' for months
+            perm_n_repeats: Number of permutations of each feature, *perm_n_repeats* given
+                when the class was initialized if *None*
+            perm_n_jobs: Number of jobs calculating permutation importance in parallel,
+                -1 uses all processors
         """
+        from sklearn.model_selection import train_test_split
 
-        df = self.model_df.copy()
+        fm = self.featurematrix_
 
         # Info
-        print(f"Feature reduction ...")
+        print("Feature reduction ...")
 
-        # Add random variable as feature
-        df, self.random_col = self._add_random_variable(df=df)
+        # Add random variable as feature, it has no missing values and
+        # therefore does not change which rows are complete
+        random_values, self.random_col = self._random_variable(n_records=len(fm.index))
 
         # Data as arrays, y = targets, X = features
-        y, X, X_names, timestamp = fr.convert_to_arrays(
-            df=df, target_col=self.target_col, complete_rows=True)
+        y = fm.y
+        X = np.column_stack([fm.X, random_values[fm.complete_rows]])
+        X_names = fm.feature_names + [self.random_col]
 
-        # Train and test set
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=self.test_size, random_state=self.kwargs['random_state'])
-
-        # TODO -------------------------------------------------------------------------->
-        # TODO -------------------------------------------------------------------------->
-        # TODO -------------------------------------------------------------------------->
-        from sklearn.model_selection import TimeSeriesSplit
-        splitter = TimeSeriesSplit(n_splits=5)
-
-        from sklearn.model_selection import GridSearchCV
-        params = {
-            'max_depth': [2, 4, 8],
-            'n_estimators': [5, 10, 20],
-            'learning_rate': [0.1, 0.05, 0.01],
-            'gamma': [0],
-            'reg_lambda': [0, 1, 5],
-            'early_stopping_rounds': [10],
-            'colsample_bytree': [0.3, 0.5, 1],
-            'scale_pos_weight': [0.1, 1, 3]
-        }
-        grid = GridSearchCV(estimator=xgb.XGBRegressor(subsample=0.1),
-                            param_grid=params,
-                            scoring='neg_mean_squared_error',
-                            cv=TimeSeriesSplit(n_splits=10),
-                            n_jobs=-1, verbose=1)
-        grid.fit(X_train, y_train,
-                 eval_set=[(X_train, y_train), (X_test, y_test)],
-                 verbose=100)
-        grid.best_params_
-
-        # # Plot
-        # fig, axs = plt.subplots(10, 1, figsize=(15, 30), sharex=True)
-        # fold = 0
-        # for train_idx, val_idx in splitter.split(df):
-        #     train = df.iloc[train_idx]
-        #     test = df.iloc[val_idx]
-        #     train[self.target_col].plot(ax=axs[fold], label='Training Set', title=f'Data Train/Test Split Fold {fold}')
-        #     test[self.target_col].plot(ax=axs[fold], label='Test Set')
-        #     axs[fold].axvline(test.index.min(), color='black', ls='--')
-        #     fold += 1
-        # plt.show()
-
-        fold = 0
-        preds = []
-        scores = []
-        df = df.dropna()
-        for train_idx, val_idx in splitter.split(df):
-            train = df.iloc[train_idx]
-            test = df.iloc[val_idx]
-
-            features_list = df.columns.tolist()
-            features_list.remove(self.target_col)
-
-            X_train = train[features_list]
-            y_train = train[self.target_col]
-
-            X_test = test[features_list]
-            y_test = test[self.target_col]
-
-            reg = xgb.XGBRegressor(base_score=0.5, booster='gbtree',
-                                   n_estimators=1000,
-                                   early_stopping_rounds=50,
-                                   objective='reg:squarederror',
-                                   max_depth=3,
-                                   learning_rate=0.02)
-            reg.fit(X_train, y_train,
-                    early_stopping_rounds=10,
-                    eval_set=[(X_train, y_train), (X_test, y_test)],
-                    verbose=100)
-
-            y_pred = reg.predict(X_test)
-            preds.append(y_pred)
-            from sklearn.metrics import mean_squared_error
-            score = np.sqrt(mean_squared_error(y_test, y_pred))
-            scores.append(score)
-            fold += 1
-
-        print(f'Score across folds {np.mean(scores):0.4f}')
-        print(f'Fold scores:{scores}')
-
-        # TODO <--------------------------------------------------------------------------
-        # TODO <--------------------------------------------------------------------------
-        # TODO <--------------------------------------------------------------------------
+        # Train and test set, with timestamps of test records for subsampling
+        X_train, X_test, y_train, y_test, timestamp_train, timestamp_test = train_test_split(
+            X, y, fm.timestamp, test_size=self.test_size, random_state=self.kwargs['random_state'])
 
         # Instantiate model with params
-        model = xgb.XGBRegressor(**self.kwargs)
-        # model = RandomForestRegressor(**self.kwargs)
+        model = self._new_model()
 
         # Train the model
-        model.fit(X=X_train, y=y_train)
+        self._fit_model(model=model, X=X_train, y=y_train, timestamp=timestamp_train)
 
-        # # Predict targets in test data
-        # pred_y_test = model.predict(X=X_test)
+        # Model and test data, also used to check the stability of feature reduction
+        self._reduction_details = dict(model=model, X_test=X_test, y_test=y_test,
+                                       timestamp_test=timestamp_test, X_names=X_names)
+        self._reduction_settings = dict(subsample=perm_subsample, subsample_freq=perm_subsample_freq,
+                                        n_repeats=perm_n_repeats if perm_n_repeats else self.perm_n_repeats)
 
         # Calculate permutation importance and store in dataframe
-        self._feature_importances_reduction = self._permutation_importance(
-            model=model, X=X_test, y=y_test, X_names=X_names, showplot_importance=False)
-
-        # Threshold for feature acceptance
-        fi_threshold = self.feature_importances_reduction_['PERM_IMPORTANCE'][self.random_col]
+        self._feature_importances_reduction = self._reduction_importance(
+            subsample=perm_subsample, subsample_freq=perm_subsample_freq,
+            n_repeats=self._reduction_settings['n_repeats'], n_jobs=perm_n_jobs, random_state=42)
 
         # Get accepted and rejected features
-        fidf_accepted = self.feature_importances_reduction_.loc[
-            self.feature_importances_reduction_['PERM_IMPORTANCE'] > fi_threshold].copy()
-        self._accepted_features = fidf_accepted.index.tolist()
-        fidf_rejected = self.feature_importances_reduction_.loc[
-            self.feature_importances_reduction_['PERM_IMPORTANCE'] <= fi_threshold].copy()
-        self._rejected_features = fidf_rejected.index.tolist()
-
-        # Assemble dataframe for next model
+        self._accepted_features, self._rejected_features = \
+            self._select_features(fidf=self.feature_importances_reduction_)
+
+        # Assemble dataframe and feature matrix for next model, the random variable
+        # is never accepted because its importance is the threshold
         usecols = [self.target_col]
         usecols = usecols + self._accepted_features
-        self.model_df = df[usecols].copy()
+        self.model_df = self.model_df[usecols]
+        self._featurematrix = fm.select(features=self._accepted_features)
+        self._featurematrix_df = self.model_df
 
         # # This could be a way to combine permutation importance with RFECV,
         # # but at the time of this writing an import failed (Oct 2023)
@@ -392,11 +413,84 @@ class XGBoostTS:
         # # rfecv.ranking_
         # # rfecv.support_
 
+    def feature_reduction_stability(self,
+                                    subsamples: list = None,
+                                    n_repeats: list = None,
+                                    n_trials: int = 3,
+                                    subsample_freq: str = 'M',
+                                    n_jobs: int = -1) -> DataFrame:
+        """
+        Check which permutation importance settings select the same features
+
+        The model trained in `.reduce_features()` is used. For each combination of
+        subsample size and number of repeats, permutation importances are calculated
+        *n_trials* times, each time with a different random subsample and permutations.
+        The features accepted in each trial are compared to the features accepted
+        when all test records and *perm_n_repeats* permutations are used.
+
+        Args:
+            subsamples: Fractions of test records, 1 uses all test records
+            n_repeats: Numbers of permutations of each feature
+            n_trials: Number of calculations for each setting
+            subsample_freq: Periods from which the same fraction of records is drawn
+            n_jobs: Number of jobs calculating permutation importance in parallel
+
+        Returns:
+            dataframe with one row per setting, sorted from the cheapest setting:
+                - SUBSAMPLE, N_REPEATS: the setting
+                - N_RECORDS: number of test records used
+                - SECONDS: median time needed to calculate permutation importances
+                - SAME_FEATURES: fraction of trials that accepted the same features as all records
+                - JACCARD: mean similarity of the accepted features to the features accepted
+                  with all records, 1 means the same features
+                - IMPORTANCE_CV: median coefficient of variation of the importances of the
+                  features accepted with all records, across trials (lower is more stable)
+        """
+        if not self._reduction_details:
+            raise Exception('Not available: model from feature reduction, run .reduce_features() first.')
+        subsamples = subsamples if subsamples else [0.05, 0.1, 0.25, 0.5, 1]
+        n_repeats = n_repeats if n_repeats else [3, 5, 10]
+
+        reference = self._reduction_importance(subsample=None, subsample_freq=subsample_freq,
+                                               n_repeats=self.perm_n_repeats, n_jobs=n_jobs, random_state=42)
+        reference_accepted = set(self._select_features(fidf=reference)[0])
+
+        rows = []
+        for subsample in subsamples:
+            for repeats in n_repeats:
+                seconds = []
+                accepted = []
+                importances = []
+                for trial in range(n_trials):
+                    tic = time.perf_counter()
+                    fidf = self._reduction_importance(subsample=subsample, subsample_freq=subsample_freq,
+                                                      n_repeats=repeats, n_jobs=n_jobs, random_state=42 + trial)
+                    seconds.append(time.perf_counter() - tic)
+                    accepted.append(set(self._select_features(fidf=fidf)[0]))
+                    importances.append(fidf['PERM_IMPORTANCE'])
+                importances = pd.concat(importances, axis=1).loc[list(reference_accepted)]
+                cv = importances.std(axis=1) / importances.mean(axis=1).abs()
+                jaccard = [len(a & reference_accepted) / len(a | reference_accepted)
+                           if (a | reference_accepted) else 1.0 for a in accepted]
+                rows.append({'SUBSAMPLE': subsample,
+                             'N_REPEATS': repeats,
+                             'N_RECORDS': fidf.attrs['n_records'],
+                             'SECONDS': np.median(seconds),
+                             'SAME_FEATURES': np.mean([a == reference_accepted for a in accepted]),
+                             'JACCARD': np.mean(jaccard),
+                             'IMPORTANCE_CV': cv.median()})
+
+        stability_df = pd.DataFrame(rows).sort_values(by='SECONDS').reset_index(drop=True)
+        print(f"\nStability of feature reduction ({n_trials} trials per setting), compared to features accepted "
+              f"with all {len(self._reduction_details['y_test'])} test records and {self.perm_n_repeats} "
+              f"repeats: {sorted(reference_accepted, key=str)}\n{stability_df}")
+        return stability_df
+
     def trainmodel(self,
                    showplot_scores: bool = True,
                    showplot_importance: bool = True):
         """
-        Train random forest model for gap-filling
+        Train model for gap-filling
 
         No gap-filling is done here, only the model is trained.
 
@@ -406,45 +500,58 @@ class XGBoostTS:
             verbose: if > 0 prints more text output
 
         """
+        from sklearn.model_selection import train_test_split
 
-        df = self.model_df.copy()
+        fm = self.featurematrix_
 
         # Info
-        idtxt = f"TRAIN & TEST "
-        print(f"Building random forest model based on data between "
-              f"{df.index[0]} and {df.index[-1]} ...")
+        idtxt = "TRAIN & TEST "
+        print(f"Building {type(self._model).__name__} model based on data between "
+              f"{fm.index[0]} and {fm.index[-1]} ...")
 
         # Data as arrays
         # y = targets, X = features
-        y, X, X_names, timestamp = fr.convert_to_arrays(
-            df=df, target_col=self.target_col, complete_rows=True)
+        y, X, X_names, timestamp = fm.y, fm.X, fm.feature_names, fm.timestamp
 
         # Train and test set
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=self.test_size, random_state=self.kwargs['random_state'])
+        X_train, X_test, y_train, y_test, timestamp_train, _ = train_test_split(
+            X, y, timestamp, test_size=self.test_size, random_state=self.kwargs['random_state'])
+
+        # Model trained before on the same data with the same parameters
+        registered = None
+        if self.registry:
+            self._model_key = fingerprint_model(X=X, y=y, feature_names=X_names, model=self._model,
+                                                test_size=self.test_size, **self._fit_options())
+            registered = self.registry.load(key=self._model_key)
+
+        if registered:
+            print(f"Loaded model {self._model_key} from registry {self.registry.registrydir}, "
+                  f"it was trained on the same data with the same parameters.")
+            self._model = registered['model']
+            self._feature_importances_traintest = registered['feature_importances']
+            if showplot_importance:
+                self._plot_permutation_importance(fidf=self._feature_importances_traintest)
+        else:
+            # Train the model
+            self._fit_model(model=self._model, X=X_train, y=y_train, timestamp=timestamp_train)
 
-        # Instantiate model with params
-        self._model = xgb.XGBRegressor(**self.kwargs)
-        # self._model = RandomForestRegressor(**self.kwargs)
-
-        # Train the model
-        self._model.fit(X=X_train, y=y_train,
-                        eval_set=[(X_train, y_train), (X_test, y_test)],
-                        # early_stopping_rounds=50,
-                        verbose=1)
+            # Calculate permutation importance and store in dataframe
+            self._feature_importances_traintest = self._permutation_importance(
+                model=self._model, X=X_test, y=y_test, X_names=X_names, showplot_importance=showplot_importance)
 
         # Predict targets in test data
         pred_y_test = self._model.predict(X=X_test)
 
-        # Calculate permutation importance and store in dataframe
-        self._feature_importances_traintest = self._permutation_importance(
-            model=self._model, X=X_test, y=y_test, X_names=X_names, showplot_importance=showplot_importance)
-
         # Stats
         self._scores_test = prediction_scores_regr(
             predictions=pred_y_test, targets=y_test, showplot=showplot_scores,
             infotxt=f"{idtxt} trained on training set, tested on test set")
 
+        if self.registry and not registered:
+            self.registry.save(key=self._model_key, model=self._model, label=self.target_col,
+                               feature_names=X_names, scores=self._scores_test,
+                               feature_importances=self._feature_importances_traintest, n_records=len(y))
+
         if showplot_scores:
             plot_prediction_residuals_error_regr(
                 model=self._model, X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
@@ -465,6 +572,33 @@ class XGBoostTS:
             model=self._model,
         )
 
+    def load_model(self, registry: ModelRegistry = None, key: str = None):
+        """
+        Use a registered model for gap-filling, instead of training a new model
+
+        Gaps can then be filled right away with `.fillgaps()`, e.g. when new
+        records arrived since the model was trained.
+
+        Args:
+            registry: Registry with trained models, the registry given when the
+                class was initialized if *None*
+            key: Fingerprint of the model, the most recently registered model for
+                the target if *None*
+        """
+        registry = registry if registry else self.registry
+        if not registry:
+            raise Exception('(!) No model registry given.')
+        registered = registry.load(key=key) if key else registry.latest(label=self.target_col)
+        if not registered:
+            raise Exception(f'(!) No model for {self.target_col} found in registry {registry.registrydir}.')
+        if registered['feature_names'] != self.featurematrix_.feature_names:
+            raise Exception(f"(!) Features of the registered model ({registered['feature_names']}) "
+                            f"are not the same as in the data ({self.featurematrix_.feature_names}).")
+        self._model = registered['model']
+        self._feature_importances_traintest = registered['feature_importances']
+        self._scores_test = registered['scores']
+        print(f"Loaded model for {self.target_col} from registry {registry.registrydir}.")
+
     def fillgaps(self,
                  showplot_scores: bool = True,
                  showplot_importance: bool = True):
@@ -489,9 +623,6 @@ class XGBoostTS:
 
         fi = self.feature_importances_reduction_
 
-        # TODO hier weiter
-
-        _X_names = [x for x in fi.index if x != self.random_col]  # Original features without random variable
         print(
             f"\n"
             f"{'=' * len(idtxt)}\n"
@@ -502,7 +633,9 @@ class XGBoostTS:
             f"used as benchmark for detecting relevant feature importances\n"
             f"- target variable: {self.target_col}\n"
             f"- features before reduction: {fi.index.to_list()}\n"
-            f"- permutation importance was calculated from {self.perm_n_repeats} permutations\n"
+            f"- permutation importance was calculated from {self._reduction_settings['n_repeats']} permutations "
+            f"of {fi.attrs.get('n_records')} test records"
+            f"{self._reduction_subsample_txt()}\n"
             f"- These results are from feature reduction. Note that feature importances for "
             f"the final model are calculated during gap-filling.\n"
             f"\n"
@@ -520,6 +653,13 @@ class XGBoostTS:
             f"smaller than or equal to {self.random_col}: {self.rejected_features_}\n"
         )
 
+    def _reduction_subsample_txt(self) -> str:
+        subsample = self._reduction_settings['subsample']
+        if not subsample or subsample >= 1:
+            return ""
+        return (f" (subsample of {subsample:.0%} of the test records "
+                f"in each period '{self._reduction_settings['subsample_freq']}')")
+
     def report_traintest(self):
         """Results from model training on test data"""
 
@@ -650,49 +790,83 @@ class XGBoostTS:
             f"- R2:  {scores['r2']}\n"
         )
 
-    def _permutation_importance(self, model, X, y, X_names, showplot_importance) -> DataFrame:
+    def _permutation_importance(self, model, X, y, X_names, showplot_importance,
+                                n_repeats: int = None, n_jobs: int = -1, random_state: int = 42) -> DataFrame:
         """Calculate permutation importance"""
+        from sklearn.inspection import permutation_importance
+
         # https://scikit-learn.org/stable/modules/permutation_importance.html#permutation-feature-importance
         fi = permutation_importance(estimator=model,
                                     X=X, y=y,
-                                    n_repeats=self.perm_n_repeats,
-                                    random_state=42,
+                                    n_repeats=n_repeats if n_repeats else self.perm_n_repeats,
+                                    random_state=random_state,
                                     scoring='r2',
-                                    n_jobs=-1)
+                                    n_jobs=n_jobs)
 
         # Store permutation importance
         fidf = pd.DataFrame({'PERM_IMPORTANCE': fi.importances_mean,
                              'PERM_SD': fi.importances_std},
                             index=X_names)
+        fidf.attrs['n_records'] = len(y)
 
         fidf = fidf.sort_values(by='PERM_IMPORTANCE', ascending=False)
 
         if showplot_importance:
-            fig, axs = plt.subplots(ncols=1, figsize=(9, 16))
-            _fidf = fidf.copy().sort_values(by='PERM_IMPORTANCE', ascending=True)
-            _fidf['PERM_IMPORTANCE'].plot.barh(color='#008bfb', yerr=_fidf['PERM_SD'], ax=axs)
-            axs.set_xlabel("Feature importance")
-            axs.set_ylabel("Feature")
-            axs.set_title(f"Permutation importance ({self.perm_n_repeats} permutations)")
-            axs.legend(loc='lower right')
-            fig.tight_layout()
-            fig.show()
+            self._plot_permutation_importance(fidf=fidf)
 
         return fidf
 
-    def _add_random_variable(self, df: DataFrame) -> tuple[DataFrame, str]:
-        # Add random variable as benchmark for relevant feature importances
+    def _reduction_importance(self, subsample: float or None, subsample_freq: str, n_repeats: int,
+                              n_jobs: int, random_state: int) -> DataFrame:
+        """Permutation importance for the model from feature reduction, from all or a subsample of test records"""
+        details = self._reduction_details
+        X, y = details['X_test'], details['y_test']
+        if subsample and subsample < 1:
+            positions = stratified_record_subsample(timestamp=details['timestamp_test'], fraction=subsample,
+                                                    freq=subsample_freq, random_state=random_state)
+            X, y = X[positions], y[positions]
+        return self._permutation_importance(model=details['model'], X=X, y=y, X_names=details['X_names'],
+                                            showplot_importance=False, n_repeats=n_repeats, n_jobs=n_jobs,
+                                            random_state=random_state)
+
+    def _select_features(self, fidf: DataFrame) -> tuple[list, list]:
+        """Accepted and rejected features, accepted features are more important than the random variable"""
+        fi_threshold = fidf['PERM_IMPORTANCE'][self.random_col]
+        accepted = fidf.loc[fidf['PERM_IMPORTANCE'] > fi_threshold].index.tolist()
+        rejected = fidf.loc[fidf['PERM_IMPORTANCE'] <= fi_threshold].index.tolist()
+        return accepted, rejected
+
+    def _plot_permutation_importance(self, fidf: DataFrame):
+        import matplotlib.pyplot as plt
+        fig, axs = plt.subplots(ncols=1, figsize=(9, 16))
+        _fidf = fidf.copy().sort_values(by='PERM_IMPORTANCE', ascending=True)
+        _fidf['PERM_IMPORTANCE'].plot.barh(color='#008bfb', yerr=_fidf['PERM_SD'], ax=axs)
+        axs.set_xlabel("Feature importance")
+        axs.set_ylabel("Feature")
+        axs.set_title(f"Permutation importance ({self.perm_n_repeats} permutations)")
+        axs.legend(loc='lower right')
+        fig.tight_layout()
+        fig.show()
+
+    def _random_variable(self, n_records: int) -> tuple[np.ndarray, str]:
+        # Random variable as benchmark for relevant feature importances
         random_col = '.RANDOM'  # Random variable as benchmark for relevant importances
-        df[random_col] = np.random.RandomState(self.kwargs['random_state']).randn(df.shape[0], 1)
-        # df[random_col] = np.random.rand(df.shape[0], 1)
-        return df, random_col
+        random_values = np.random.RandomState(self.kwargs['random_state']).randn(n_records)
+        if self.features_float32:
+            random_values = random_values.astype('float32')
+        return random_values, random_col
+
+    def _new_model(self):
+        """New (untrained) model with the parameters given in *kwargs*"""
+        raise NotImplementedError
 
-    def _lag_features(self):
-        """Add lagged variants of variables as new features"""
-        return fr.lagged_variants(df=self.model_df,
-                                  stepsize=1,
-                                  lag=self.features_lag,
-                                  exclude_cols=[self.target_col])
+    def _fit_model(self, model, X: np.ndarray, y: np.ndarray, timestamp: np.ndarray):
+        """Train *model*, *timestamp* of the records is available for models that need the time order"""
+        model.fit(X=X, y=y)
+
+    def _fit_options(self) -> dict:
+        """Options of `_fit_model` that change the trained model, part of the registry fingerprint"""
+        return {}
 
     def _check_n_cols(self):
         """Check number of columns"""
@@ -704,17 +878,15 @@ class XGBoostTS:
         """Apply model to fill missing targets for records where all features are available
         (high-quality gap-filling)"""
 
-        # Original input data, contains target and features
-        # This dataframe has the full timestamp
-        df = self.model_df.copy()
+        # Target and features of the original input data, with the full timestamp
+        fm = self.featurematrix_
 
         # Test how the model performs with all y data
         # Since the model was previously trained on test data,
         # here it is checked how well the model performs when
         # predicting all available y data.
         # This is needed to calculate feature importance and scores.
-        y, X, X_names, timestamp = fr.convert_to_arrays(
-            df=df, target_col=self.target_col, complete_rows=True)
+        y, X, X_names = fm.y, fm.X, fm.feature_names
 
         # Predict all targets (no test split)
         pred_y = self.model_.predict(X=X)
@@ -733,10 +905,7 @@ class XGBoostTS:
         # In the next step, all available features are used to
         # predict the target for records where all features are available.
         # Feature data for records where all features are available:
-        features_df = df.drop(self.target_col, axis=1)  # Remove target data
-        features_df = features_df.dropna()  # Keep rows where all features available
-        X = features_df.to_numpy()  # Features are needed as numpy array
-        feature_names = features_df.columns.tolist()
+        X = fm.X_features_available
 
         # Predict targets for all records where all features are available
         pred_y = self.model_.predict(X=X)
@@ -746,10 +915,10 @@ class XGBoostTS:
         self._define_cols()
 
         # Collect predictions in dataframe
-        self._gapfilling_df = pd.DataFrame(data={self.pred_fullmodel_col: pred_y}, index=features_df.index)
+        self._gapfilling_df = pd.DataFrame(data={self.pred_fullmodel_col: pred_y}, index=fm.index_features_available)
 
         # Add target to dataframe
-        self._gapfilling_df[self.target_col] = df[self.target_col].copy()
+        self._gapfilling_df[self.target_col] = self.model_df[self.target_col].copy()
 
         # Gap locations
         # Make column that contains predicted values
@@ -775,7 +944,7 @@ class XGBoostTS:
             self._gapfilling_df[self.target_col].fillna(self._gapfilling_df[self.pred_fullmodel_col])
 
         # Restore original full timestamp
-        self._gapfilling_df = self._gapfilling_df.reindex(df.index)
+        self._gapfilling_df = self._gapfilling_df.reindex(fm.index)
 
         # SHAP values
         # https://pypi.org/project/shap/
@@ -823,18 +992,16 @@ class XGBoostTS:
         gf_fallback_df = include_timestamp_as_cols(df=gf_fallback_df, txt="(ONLY FALLBACK)")
 
         # Build model for target predictions *from timestamp*
-        y_fallback, X_fallback, _, _ = \
+        y_fallback, X_fallback, _, timestamp_fallback = \
             fr.convert_to_arrays(df=gf_fallback_df,
                                  target_col=self.target_gapfilled_col,
                                  complete_rows=True)
 
         # Instantiate new model with same params as before
-        self.kwargs['early_stopping_rounds'] = 0
-        model_fallback = xgb.XGBRegressor(**self.kwargs)
-        # model_fallback = RandomForestRegressor(**self.kwargs)
+        model_fallback = self._new_model()
 
         # Train the model on all available records ...
-        model_fallback.fit(X=X_fallback, y=y_fallback)
+        self._fit_model(model=model_fallback, X=X_fallback, y=y_fallback, timestamp=timestamp_fallback)
 
         # ... and use it to predict all records for full timestamp
         full_timestamp_df = gf_fallback_df.drop(self.target_gapfilled_col, axis=1)  # Remove target data
@@ -866,129 +1033,6 @@ class XGBoostTS:
         self.pred_fullmodel_col = ".PREDICTIONS_FULLMODEL"
         self.pred_fallback_col = ".PREDICTIONS_FALLBACK"
         self.pred_gaps_col = ".GAP_PREDICTIONS"
-        self.target_gapfilled_col = f"{self.target_col}_gfRF"
+        self.target_gapfilled_col = f"{self.target_col}_{self.gfsuffix}"
         self.target_gapfilled_flag_col = f"FLAG_{self.target_gapfilled_col}_ISFILLED"  # "[0=measured]"
         self.target_gapfilled_cumu_col = ".GAPFILLED_CUMULATIVE"
-
-
-def example_rfts():
-    # Setup, user settings
-    # TARGET_COL = 'LE_orig'
-    TARGET_COL = 'NEE_CUT_REF_orig'
-    subsetcols = [TARGET_COL, 'Tair_f', 'VPD_f', 'Rg_f']
-
-    # from datetime import datetime
-    # dt_string = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    # print(f"This page was last modified on: {dt_string}")
-    # import importlib.metadata
-    # version_diive = importlib.metadata.version("diive")
-    # print(f"diive version: v{version_diive}")
-
-    # # Show docstring for QuickFillRFTS
-    # print(RandomForestTS.__name__)
-    # print(RandomForestTS.__doc__)
-
-    # Example data
-    from diive.configs.exampledata import load_exampledata_parquet
-    df_orig = load_exampledata_parquet()
-
-    # # Create a large gap
-    # remove = df.index.year != 2014
-    # # df = df.drop(df.index[100:2200])
-    # df = df[remove].copy()
-
-    # Subset
-    keep = df_orig.index.year <= 2014
-    df = df_orig[keep].copy()
-    # df = df_orig.copy()
-
-    # Subset with target and features
-    # Only High-quality (QCF=0) measured NEE used for model training in this example
-    lowquality = df["QCF_NEE"] > 0
-    df.loc[lowquality, TARGET_COL] = np.nan
-    df = df[subsetcols].copy()
-
-    # Time series stats
-    # from diive.core.dfun.stats import sstats
-    # statsdf = sstats(df[TARGET_COL])
-    # print(statsdf)
-
-    # from diive.core.plotting.timeseries import TimeSeries  # For simple (interactive) time series plotting
-    # TimeSeries(series=df[TARGET_COL]).plot()
-
-    # XGBoost
-    # https://xgboost.readthedocs.io/en/stable/parameter.html#parameters-for-tree-booster
-    xts = XGBoostTS(
-        input_df=df,
-        target_col=TARGET_COL,
-        verbose=1,
-        # features_lag=None,
-        features_lag=[-1, -1],
-        # include_timestamp_as_features=False,
-        include_timestamp_as_features=True,
-        # add_continuous_record_number=False,
-        add_continuous_record_number=True,
-        sanitize_timestamp=True,
-        perm_n_repeats=9,
-        n_estimators=99,
-        random_state=42,
-        early_stopping_rounds=5,
-        max_depth=10,
-        learning_rate=0.05,
-        colsample_bytree=1,
-        n_jobs=-1
-    )
-    xts.reduce_features()
-    xts.report_feature_reduction()
-
-    xts.trainmodel(showplot_scores=False, showplot_importance=False)
-    xts.report_traintest()
-
-    xts.fillgaps(showplot_scores=False, showplot_importance=False)
-    xts.report_gapfilling()
-
-    observed = df[TARGET_COL]
-    gapfilled = xts.get_gapfilled_target()
-    # rfts.feature_importances
-    # rfts.scores
-    # rfts.gapfilling_df
-
-    # # https://www.datacamp.com/tutorial/introduction-to-shap-values-machine-learning-interpretability
-    # import shap
-    # explainer = shap.TreeExplainer(rfts.model_)
-    # xtest = rfts.traintest_details_['X_test']
-    # shap_values = explainer.shap_values(xtest)
-    # shap.summary_plot(shap_values, xtest)
-    # # shap.summary_plot(shap_values[0], xtest)
-    # shap.dependence_plot("Feature 12", shap_values, xtest, interaction_index="Feature 11")
-
-    # # Plot
-    # from diive.core.plotting.heatmap_datetime import HeatmapDateTime
-    # HeatmapDateTime(series=observed).show()
-    # HeatmapDateTime(series=gapfilled).show()
-
-    # mds = df_orig['NEE_CUT_REF_f'].copy()
-    # mds = mds[mds.index.year >= 2016]
-    import matplotlib.pyplot as plt
-    # # rfts.gapfilling_df_['.PREDICTIONS_FALLBACK'].cumsum().plot()
-    # # rfts.gapfilling_df_['.PREDICTIONS_FULLMODEL'].cumsum().plot()
-    # # rfts.gapfilling_df_['.PREDICTIONS'].cumsum().plot()
-    xts.get_gapfilled_target().cumsum().plot()
-    # mds.cumsum().plot()
-    # plt.legend()
-    plt.show()
-
-    # d = rfts.gapfilling_df['NEE_CUT_REF_orig'] - rfts.gapfilling_df['.PREDICTIONS']
-    # d.plot()
-    # plt.show()
-    # d = abs(d)
-    # d.mean()  # MAE
-
-    print("Finished.")
-
-
-if __name__ == '__main__':
-    # example_quickfill()
-    # example_longterm_rfts()
-    example_rfts()
-    # example_optimize()
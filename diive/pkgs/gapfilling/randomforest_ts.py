@@ -20,19 +20,28 @@ Kudos, optimization of hyper-parameters, grid search
 - https://www.kaggle.com/code/carloscliment/random-forest-regressor-and-gridsearch
 
 """
-import matplotlib.pyplot as plt
+import json
+import math
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING
+
 import numpy as np
 import pandas as pd
-from pandas import DataFrame, Series
-from sklearn.ensemble import RandomForestRegressor  # Import the model we are using
-from sklearn.inspection import permutation_importance
-from sklearn.model_selection import train_test_split, TimeSeriesSplit, GridSearchCV
+from pandas import DataFrame, DatetimeIndex, Series
 
 import diive.core.dfun.frames as fr
-from diive.core.ml.common import prediction_scores_regr, plot_prediction_residuals_error_regr
-from diive.core.times.neighbors import neighboring_years
-from diive.core.times.times import TimestampSanitizer
-from diive.core.times.times import include_timestamp_as_cols
+from diive.core.ml.common import prediction_scores_regr
+from diive.core.ml.featurematrix import load_memmap_frame, memmap_frame
+from diive.core.io.dirs import verify_dir
+from diive.core.ml.registry import ModelRegistry, fingerprint_model
+from diive.core.times.neighbors import neighboring_poolyears, yearpool_rows
+from diive.pkgs.gapfilling.mlbase import MlRegressorGapFillingBase, prepare_model_df
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestRegressor
 
 pd.set_option('display.max_rows', 50)
 pd.set_option('display.max_columns', 12)
@@ -43,6 +52,10 @@ class OptimizeParamsRFTS:
     """
     Optimize parameters for random forest model
 
+    Parameters are searched with cross-validation on time-ordered splits, either
+    exhaustively (grid search) or with successive halving / random search, see
+    `optimize`.
+
     """
 
     def __init__(self,
@@ -70,6 +83,7 @@ class OptimizeParamsRFTS:
         self.model_df = df.copy()
         self.target_col = target_col
 
+        from sklearn.ensemble import RandomForestRegressor
         self.regr = RandomForestRegressor()
 
         self.params = rf_params
@@ -80,6 +94,7 @@ class OptimizeParamsRFTS:
         self._cv_results = None
         self._best_score = None
         self._cv_n_splits = None
+        self._search_completed = None
 
     @property
     def best_params(self) -> dict:
@@ -116,7 +131,67 @@ class OptimizeParamsRFTS:
             raise Exception(f'Not available: cv scores.')
         return self._cv_n_splits
 
-    def optimize(self):
+    @property
+    def search_completed(self) -> bool:
+        """*False* if the search was stopped after *max_seconds*, it can be resumed from checkpoints"""
+        if self._search_completed is None:
+            raise Exception(f'Not available: search was not run.')
+        return self._search_completed
+
+    def optimize(self,
+                 search: str = 'grid',
+                 n_splits: int = 10,
+                 n_candidates: int = None,
+                 resource: str = 'n_samples',
+                 max_resources: int = None,
+                 factor: int = 3,
+                 checkpointdir: str or Path = None,
+                 max_seconds: float = None,
+                 random_state: int = 42,
+                 showplot: bool = True):
+        """Search the best parameters with cross-validation
+
+        Args:
+            search: Search strategy
+                - 'grid': all parameter combinations are evaluated with all records (GridSearchCV)
+                - 'halving': successive halving, all candidates are evaluated with a small budget
+                  (records or trees, see *resource*), only the best 1/*factor* of candidates are
+                  evaluated again with *factor* times the budget, until one candidate is left
+                - 'random': all candidates are evaluated with the full budget
+            n_splits: Number of time-ordered splits (TimeSeriesSplit), each candidate is trained
+                *n_splits* times per budget
+            n_candidates: 'halving' and 'random' only, number of parameter combinations drawn
+                at random from the parameter ranges. All combinations are candidates if *None*.
+            resource: 'halving' and 'random' only, budget that is increased in each round
+                - 'n_samples': number of records, the most recent records of the search data are used
+                - 'n_estimators': number of trees, *n_estimators* must then not be in the parameter ranges
+            max_resources: 'halving' and 'random' only, budget in the last round, all records
+                for 'n_samples' and 100 trees for 'n_estimators' if *None*
+            factor: 'halving' only, proportion of candidates kept after each round is 1/*factor*
+                and budget is multiplied by *factor*
+            checkpointdir: 'halving' and 'random' only, folder where the score of each completed
+                fold is stored. An interrupted search with the same data and settings continues
+                from there, completed folds are not trained again.
+            max_seconds: 'halving' and 'random' only, the search stops when it took longer than
+                this (no new folds are started) and *search_completed* is *False*. Best parameters
+                are then selected from the last iteration where all candidates were completed,
+                with the budget of this iteration for 'n_estimators'. If the first iteration was
+                not completed, from the candidates completed so far.
+            random_state: Random state for drawing candidates and for the models
+            showplot: Show plot of scores on the test set for the best parameters
+        """
+        if search == 'grid':
+            self._optimize_grid(n_splits=n_splits, showplot=showplot)
+        elif search in ['halving', 'random']:
+            self._optimize_successive(search=search, n_splits=n_splits, n_candidates=n_candidates,
+                                      resource=resource, max_resources=max_resources, factor=factor,
+                                      checkpointdir=checkpointdir, max_seconds=max_seconds,
+                                      random_state=random_state, showplot=showplot)
+        else:
+            raise ValueError(f"(!) Search {search} is not available, use 'grid', 'halving' or 'random'.")
+
+    def _optimize_grid(self, n_splits: int, showplot: bool):
+        from sklearn.model_selection import train_test_split, TimeSeriesSplit, GridSearchCV
 
         y, X, X_names, timestamp = \
             fr.convert_to_arrays(df=self.model_df,
@@ -128,7 +203,7 @@ class OptimizeParamsRFTS:
         grid = GridSearchCV(estimator=self.regr,
                             param_grid=self.params,
                             scoring='neg_mean_squared_error',
-                            cv=TimeSeriesSplit(n_splits=10),
+                            cv=TimeSeriesSplit(n_splits=n_splits),
                             n_jobs=-1)
         grid.fit(X_train, y_train)
 
@@ -146,6 +221,7 @@ class OptimizeParamsRFTS:
 
         # The number of cross-validation splits (folds/iterations)
         self._cv_n_splits = grid.n_splits_
+        self._search_completed = True
 
         grid_predictions = grid.predict(X_test)
 
@@ -154,748 +230,177 @@ class OptimizeParamsRFTS:
                                               targets=y_test,
                                               infotxt=f"trained on training set, "
                                                       f"tested on test set",
-                                              showplot=True)
-
-
-class RandomForestTS:
-
-    def __init__(
-            self,
-            input_df: DataFrame,
-            target_col: str or tuple,
-            verbose: int = 0,
-            perm_n_repeats: int = 10,
-            test_size: float = 0.25,
-            features_lag: list = None,
-            include_timestamp_as_features: bool = False,
-            add_continuous_record_number: bool = False,
-            sanitize_timestamp: bool = False,
-            **kwargs
-    ):
-        """
-        Gap-fill timeseries with predictions from random forest model
-
-        Args:
-            input_df:
-                Contains timeseries of 1 target column and 1+ feature columns.
-
-            target_col:
-                Column name of variable in *input_df* that will be gap-filled.
-
-            perm_n_repeats:
-                Number of repeats for calculating permutation feature importance.
-
-            test_size:
-                Proportion of the dataset to include in the test split,
-                between 0.0 and 1.0.
-
-            features_lag:
-                List of integers (number of records), includes lagged variants of predictors.
-                If features_lag=None, no lagged variants are added.
-                Example:
-                    - features_lag=[-2, +2] includes variants that are lagged by -2, -1, +1 and
-                    +2 records in the dataset, for each feature already present in the data.
-                     For a variable named *TA*, this created the following output:
-                    TA    = [  5,   6,   7, 8  ]
-                    TA-2  = [NaN, NaN,   5, 6  ]
-                    TA-1  = [NaN,   5,   6, 7  ]  --> each TA record is paired with the preceding record TA-1
-                    TA+1  = [  6,   7,   8, NaN]  --> each TA record is paired with the next record TA+1
-                    TA+2  = [  7,   8, NaN, NaN]
-
-            include_timestamp_as_features:
-                Include timestamp info as integer data: year, season, month, week, doy, hour
-
-            add_continuous_record_number:
-                Add continuous record number as new column
-
-            sanitize_timestamp:
-                Validate and prepare timestamps for further processing
-
-        Attributes:
-            gapfilled_df
-            - .PREDICTIONS_FULLMODEL uses the output from the full RF model where
-              all features where available.
-            - .PREDICTIONS_FALLBACK uses the output from the fallback RF model, which
-              was trained on the combined observed + .PREDICTIONS_FULLMODEL data, using
-              only the timestamp info as features.
-        """
-
-        # Args
-        self.model_df = input_df.copy()
-        self.target_col = target_col
-        self.kwargs = kwargs
-        self.perm_n_repeats = perm_n_repeats
-        self.test_size = test_size
-        self.features_lag = features_lag
-        self.verbose = verbose
-
-        if self.features_lag and (len(self.model_df.columns) > 1):
-            self.model_df = self._lag_features()
-
-        if include_timestamp_as_features:
-            self.model_df = include_timestamp_as_cols(df=self.model_df, txt="")
-
-        if add_continuous_record_number:
-            self.model_df = fr.add_continuous_record_number(df=self.model_df)
+                                              showplot=showplot)
 
-        if sanitize_timestamp:
-            verbose = True if verbose > 0 else False
-            tss = TimestampSanitizer(data=self.model_df, output_middle_timestamp=True, verbose=verbose)
-            self.model_df = tss.get()
+    def _optimize_successive(self, search: str, n_splits: int, n_candidates: int, resource: str,
+                             max_resources: int, factor: int, checkpointdir: str or Path,
+                             max_seconds: float, random_state: int, showplot: bool):
+        from sklearn.base import clone
+        from sklearn.metrics import mean_squared_error
+        from sklearn.model_selection import ParameterGrid, ParameterSampler, TimeSeriesSplit
 
-        self._check_n_cols()
+        if resource not in ['n_samples', 'n_estimators']:
+            raise ValueError(f"(!) Resource {resource} is not available, use 'n_samples' or 'n_estimators'.")
+        if resource == 'n_estimators' and 'n_estimators' in self.params:
+            raise ValueError(f"(!) n_estimators is the resource and cannot be in the parameter ranges.")
 
-        self.random_col = None
-
-        # Instantiate model with params
-        self._model = RandomForestRegressor(**self.kwargs)
-
-        # Attributes
-        self._gapfilling_df = None  # Will contain gapfilled target and auxiliary variables
-        # self._model = None
-        self._feature_importances = dict()
-        self._feature_importances_traintest = dict()
-        self._feature_importances_reduction = dict()
-        self._scores = dict()
-        self._scores_test = dict()
-        self._accepted_features = []
-        self._rejected_features = []
-
-    def get_gapfilled_target(self):
-        """Gap-filled target time series"""
-        return self.gapfilling_df_[self.target_gapfilled_col]
-
-    def get_flag(self):
-        """Gap-filling flag, where 0=observed, 1=gap-filled, 2=gap-filled with fallback"""
-        return self.gapfilling_df_[self.target_gapfilled_flag_col]
-
-    @property
-    def model_(self) -> RandomForestRegressor:
-        """Return model, trained on test data"""
-        if not self._model:
-            raise Exception(f'Not available: model.')
-        return self._model
-
-    @property
-    def feature_importances_(self) -> DataFrame:
-        """Return feature importance for model used in gap-filling"""
-        if not isinstance(self._feature_importances, DataFrame):
-            raise Exception(f'Not available: feature importances for gap-filling.')
-        return self._feature_importances
-
-    @property
-    def feature_importances_traintest_(self) -> DataFrame:
-        """Return feature importance from model training on training data,
-        with importances calculated using test data (holdout set)"""
-        if not isinstance(self._feature_importances_traintest, DataFrame):
-            raise Exception(f'Not available: feature importances from training & testing.')
-        return self._feature_importances_traintest
-
-    @property
-    def feature_importances_reduction_(self) -> DataFrame:
-        """Return feature importance from feature reduction, model training on training data,
-        with importances calculated using test data (holdout set)"""
-        if not isinstance(self._feature_importances_reduction, DataFrame):
-            raise Exception(f'Not available: feature importances from feature reduction.')
-        return self._feature_importances_reduction
-
-    @property
-    def scores_(self) -> dict:
-        """Return model scores for model used in gap-filling"""
-        if not self._scores:
-            raise Exception(f'Not available: model scores for gap-filling.')
-        return self._scores
-
-    @property
-    def scores_test_(self) -> dict:
-        """Return model scores for model trained on training data,
-        with scores calculated using test data (holdout set)"""
-        if not self._scores_test:
-            raise Exception(f'Not available: model scores for gap-filling.')
-        return self._scores_test
-
-    @property
-    def gapfilling_df_(self) -> DataFrame:
-        """Return gapfilled data and auxiliary variables"""
-        if not isinstance(self._gapfilling_df, DataFrame):
-            raise Exception(f'Gapfilled data not available.')
-        return self._gapfilling_df
-
-    @property
-    def traintest_details_(self) -> dict:
-        """Return details from train/test splits"""
-        if not self._traintest_details:
-            raise Exception(f'Not available: details about training & testing.')
-        return self._traintest_details
-
-    @property
-    def accepted_features_(self) -> list:
-        """Return list of accepted features from feature reduction"""
-        if not self._accepted_features:
-            raise Exception(f'Not available: accepted features from feature reduction.')
-        return self._accepted_features
-
-    @property
-    def rejected_features_(self) -> list:
-        """Return list of rejected features from feature reduction"""
-        if not self._rejected_features:
-            raise Exception(f'Not available: accepted features from feature reduction.')
-        return self._rejected_features
-
-    def reduce_features(self):
-        """Reduce number of features using permutation importance
-
-        A random variable is added to features and the permutation importances
-        are calculated. The permutation importance of the random variable is the
-        benchmark to determine whether a feature is relevant. All features where
-        permutation importance is smaller or equal to the importance of the random
-        variable are rejected.
-        """
-
-        df = self.model_df.copy()
-
-        # Info
-        print(f"Feature reduction ...")
-
-        # Add random variable as feature
-        df, self.random_col = self._add_random_variable(df=df)
-
-        # Data as arrays, y = targets, X = features
-        y, X, X_names, timestamp = fr.convert_to_arrays(
-            df=df, target_col=self.target_col, complete_rows=True)
-
-        # Train and test set
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=self.test_size, random_state=self.kwargs['random_state'])
-
-        # Instantiate model with params
-        model = RandomForestRegressor(**self.kwargs)
-
-        # Train the model
-        model.fit(X=X_train, y=y_train)
-
-        # # Predict targets in test data
-        # pred_y_test = model.predict(X=X_test)
-
-        # Calculate permutation importance and store in dataframe
-        self._feature_importances_reduction = self._permutation_importance(
-            model=model, X=X_test, y=y_test, X_names=X_names, showplot_importance=False)
-
-        # Threshold for feature acceptance
-        fi_threshold = self.feature_importances_reduction_['PERM_IMPORTANCE'][self.random_col]
-
-        # Get accepted and rejected features
-        fidf_accepted = self.feature_importances_reduction_.loc[
-            self.feature_importances_reduction_['PERM_IMPORTANCE'] > fi_threshold].copy()
-        self._accepted_features = fidf_accepted.index.tolist()
-        fidf_rejected = self.feature_importances_reduction_.loc[
-            self.feature_importances_reduction_['PERM_IMPORTANCE'] <= fi_threshold].copy()
-        self._rejected_features = fidf_rejected.index.tolist()
-
-        # Assemble dataframe for next model
-        usecols = [self.target_col]
-        usecols = usecols + self._accepted_features
-        self.model_df = df[usecols].copy()
-
-        # # This could be a way to combine permutation importance with RFECV,
-        # # but at the time of this writing an import failed (Oct 2023)
-        # # Train model with random variable included, to detect unimportant features
-        # df = df.dropna()
-        # targets = df[self.target_col].copy()
-        # df = df.drop(self.target_col, axis=1, inplace=False)
-        # features = df.copy()
-        # estimator = RandomForestRegressor(**self.kwargs)
-        # splitter = TimeSeriesSplit(n_splits=10)
-        # from eli5.sklearn import PermutationImportance
-        # rfecv = RFECV(estimator=PermutationImportance(estimator, scoring='r2', n_iter=10, random_state=42, cv=splitter),
-        #               step=1,
-        #               min_features_to_select=3,
-        #               cv=splitter,
-        #               scoring='r2',
-        #               verbose=self.verbose,
-        #               n_jobs=-1)
-        # rfecv.fit(features, targets)
-        # # Feature importances
-        # features.drop(features.columns[np.where(rfecv.support_ == False)[0]], axis=1, inplace=True)
-        # rfecv_fi_df = pd.DataFrame()
-        # rfecv_fi_df['FEATURE'] = list(features.columns)
-        # rfecv_fi_df['IMPORTANCE'] = rfecv.estimator_.feature_importances_
-        # rfecv_fi_df = rfecv_fi_df.set_index('FEATURE')
-        # rfecv_fi_df = rfecv_fi_df.sort_values(by='IMPORTANCE', ascending=False)
-        # # rfecv.cv_results_
-        # # rfecv.n_features_
-        # # rfecv.n_features_in_
-        # # rfecv.ranking_
-        # # rfecv.support_
-
-    def trainmodel(self,
-                   showplot_scores: bool = True,
-                   showplot_importance: bool = True):
-        """
-        Train random forest model for gap-filling
-
-        No gap-filling is done here, only the model is trained.
-
-        Args:
-            showplot_predictions: shows plot of predicted vs observed
-            showplot_importance: shows plot of permutation importances
-            verbose: if > 0 prints more text output
-
-        """
-
-        df = self.model_df.copy()
-
-        # Info
-        idtxt = f"TRAIN & TEST "
-        print(f"Building random forest model based on data between "
-              f"{df.index[0]} and {df.index[-1]} ...")
-
-        # Data as arrays
-        # y = targets, X = features
-        y, X, X_names, timestamp = fr.convert_to_arrays(
-            df=df, target_col=self.target_col, complete_rows=True)
-
-        # Train and test set
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=self.test_size, random_state=self.kwargs['random_state'])
-
-        # Train the model
-        self._model.fit(X=X_train, y=y_train)
-
-        # Predict targets in test data
-        pred_y_test = self._model.predict(X=X_test)
-
-        # Calculate permutation importance and store in dataframe
-        self._feature_importances_traintest = self._permutation_importance(
-            model=self._model, X=X_test, y=y_test, X_names=X_names, showplot_importance=showplot_importance)
-
-        # Stats
-        self._scores_test = prediction_scores_regr(
-            predictions=pred_y_test, targets=y_test, showplot=showplot_scores,
-            infotxt=f"{idtxt} trained on training set, tested on test set")
-
-        if showplot_scores:
-            plot_prediction_residuals_error_regr(
-                model=self._model, X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
-                infotxt=f"{idtxt} trained on training set, tested on test set")
-
-        # Collect results
-        self._traintest_details = dict(
-            X=X,
-            y=y,
-            timestamp=timestamp,
-            predictions=pred_y_test,
-            X_names=X_names,
-            y_name=self.target_col,
-            X_train=X_train,
-            y_train=y_train,
-            X_test=X_test,
-            y_test=y_test,
-            model=self._model,
-        )
-
-    def fillgaps(self,
-                 showplot_scores: bool = True,
-                 showplot_importance: bool = True):
-        """
-        Gap-fill data with previously built model
-
-        No new model is built here, instead the last model built in
-        the preceding step .trainmodel() is used.
-
-        y = target
-        X = features
-
-        """
-        self._fillgaps_fullmodel(showplot_scores, showplot_importance)
-        self._fillgaps_fallback()
-        self._fillgaps_combinepredictions()
-
-    def report_feature_reduction(self):
-        """Results from feature reduction"""
-
-        idtxt = "FEATURE REDUCTION"
-
-        fi = self.feature_importances_reduction_
-
-        # TODO hier weiter
-
-        _X_names = [x for x in fi.index if x != self.random_col]  # Original features without random variable
-        print(
-            f"\n"
-            f"{'=' * len(idtxt)}\n"
-            f"{idtxt}\n"
-            f"{'=' * len(idtxt)}\n"
-            f"\n"
-            f"- the random variable {self.random_col} was added to the original features, "
-            f"used as benchmark for detecting relevant feature importances\n"
-            f"- target variable: {self.target_col}\n"
-            f"- features before reduction: {fi.index.to_list()}\n"
-            f"- permutation importance was calculated from {self.perm_n_repeats} permutations\n"
-            f"- These results are from feature reduction. Note that feature importances for "
-            f"the final model are calculated during gap-filling.\n"
-            f"\n"
-            f"\n"
-            f"PERMUTATION IMPORTANCE (FULL RESULTS):\n"
-            f"\n"
-            f"{fi}"
-            f"\n"
-            f"\n"
-            f"--> {len(fi.index)} input features, "
-            f"including {self.random_col}: {fi.index.tolist()}\n"
-            f"--> {len(self.accepted_features_)} accepted features, "
-            f"larger than {self.random_col}: {self.accepted_features_}\n"
-            f"--> {len(self.rejected_features_)} rejected features, "
-            f"smaller than or equal to {self.random_col}: {self.rejected_features_}\n"
-        )
-
-    def report_traintest(self):
-        """Results from model training on test data"""
-
-        idtxt = "MODEL TRAINING & TESTING RESULTS"
-
-        results = self.traintest_details_
-        fi = self.feature_importances_traintest_
-
-        test_size_perc = self.test_size * 100
-        training_size_perc = 100 - test_size_perc
-        n_vals_observed = len(results['y'])
-        n_vals_train = len(results['y_train'])
-        n_vals_test = len(results['y_test'])
-        timestamp = results['timestamp']
-        used_features = results['X_names']
-        model = results['model']
-
-        print(
-            f"\n"
-            f"{'=' * len(idtxt)}\n"
-            f"{idtxt}\n"
-            f"{'=' * len(idtxt)}\n"
-            f"\n"
-            f"- the model was trained and tested based on data between "
-            f"{timestamp[0]} and {timestamp[-1]}.\n"
-            f"- in total, {n_vals_observed} observed target values were available for training and testing\n"
-            f"- the dataset was split into training and test datasets\n"
-            f"  > the training dataset comprised {n_vals_train} target values ({training_size_perc:.1f}%)\n"
-            f"  > the test dataset comprised {n_vals_test} target values ({test_size_perc:.1f}%)\n"
-            f"\n"
-            f"## FEATURE IMPORTANCES\n"
-            f"- feature importances were calculated for test data ({n_vals_test} target values).\n"
-            f"- permutation importances were calculated from {self.perm_n_repeats} repeats."
-            f"\n"
-            f"{fi}"
-            f"\n"
-            f"\n"
-            f"## MODEL\n"
-            f"The model was trained on the training set.\n"
-            f"- estimator:  {model}\n"
-            f"- parameters:  {model.get_params()}\n"
-            f"- names of features used in model:  {used_features}\n"
-            f"- number of features used in model:  {len(used_features)}\n"
-            f"\n"
-            f"## MODEL SCORES\n"
-            f"- the model was trained on training data ({n_vals_train} values).\n"
-            f"- the model was tested on test data ({n_vals_test} values).\n"
-            f"- all scores were calculated for test split.\n"
-            f"  > MAE:  {self.scores_test_['mae']} (mean absolute error)\n"
-            f"  > MedAE:  {self.scores_test_['medae']} (median absolute error)\n"
-            f"  > MSE:  {self.scores_test_['mse']} (mean squared error)\n"
-            f"  > RMSE:  {self.scores_test_['rmse']} (root mean squared error)\n"
-            f"  > MAXE:  {self.scores_test_['maxe']} (max error)\n"
-            f"  > MAPE:  {self.scores_test_['mape']:.3f} (mean absolute percentage error)\n"
-            f"  > R2:  {self.scores_test_['r2']}\n"
-        )
-
-    def report_gapfilling(self):
-        """Results from gap-filling"""
-        # Setup
-        idtxt = "GAP-FILLING RESULTS"
-
-        df = self.gapfilling_df_
-        model = self.model_
-        scores = self.scores_
-        fi = self.feature_importances_
-
-        feature_names = fi.index.to_list()
-        n_features = len(feature_names)
-
-        locs_observed = df[self.target_gapfilled_flag_col] == 0
-        locs_hq = df[self.target_gapfilled_flag_col] == 1
-        locs_observed_missing_fromflag = df[self.target_gapfilled_flag_col] > 0
-        locs_fallback = df[self.target_gapfilled_flag_col] == 2
-
-        n_observed = locs_observed.sum()
-        n_hq = locs_hq.sum()
-        n_observed_missing_fromflag = locs_observed_missing_fromflag.sum()
-        n_available = len(df[self.target_gapfilled_col].dropna())
-        n_potential = len(df.index)
-        n_fallback = locs_fallback.sum()
-        test_size_perc = self.test_size * 100
-
-        print(
-            f"\n"
-            f"{'=' * len(idtxt)}\n"
-            f"{idtxt}\n"
-            f"{'=' * len(idtxt)}\n"
-            f"\n"
-            f"Model scores and feature importances were calculated from high-quality "
-            f"predicted targets ({n_hq} values, {self.target_gapfilled_col} where flag=1) "
-            f"in comparison to observed targets ({n_observed} values, {self.target_col}).\n"
-            f"\n"
-            f"## TARGET\n"
-            f"- first timestamp:  {df.index[0]}\n"
-            f"- last timestamp:  {df.index[-1]}\n"
-            f"- potential number of values: {n_potential} values)\n"
-            f"- target column (observed):  {self.target_col}\n"
-            f"- missing records (observed):  {df[self.target_col].isnull().sum()} "
-            f"(cross-check from flag: {n_observed_missing_fromflag})\n"
-            f"- target column (gap-filled):  {self.target_gapfilled_col}  ({n_available} values)\n"
-            f"- missing records (gap-filled):  {df[self.target_gapfilled_col].isnull().sum()}\n"
-            f"- gap-filling flag: {self.target_gapfilled_flag_col}\n"
-            f"  > flag 0 ... observed targets ({n_observed} values)\n"
-            f"  > flag 1 ... targets gap-filled with high-quality, all features available ({n_hq} values)\n"
-            f"  > flag 2 ... targets gap-filled with fallback ({n_fallback} values)\n"
-            f"\n"
-            f"## FEATURE IMPORTANCES\n"
-            f"- names of features used in model:  {feature_names}\n"
-            f"- number of features used in model:  {n_features}\n"
-            f"- permutation importances were calculated from {self.perm_n_repeats} repeats.\n"
-            f"\n"
-            f"{fi}"
-            f"\n"
-            f"\n"
-            f"## MODEL\n"
-            f"The model was trained on a training set with test size {test_size_perc:.2f}%.\n"
-            f"- estimator:  {model}\n"
-            f"- parameters:  {model.get_params()}\n"
-            f"\n"
-            f"## MODEL SCORES\n"
-            f"- MAE:  {scores['mae']} (mean absolute error)\n"
-            f"- MedAE:  {scores['medae']} (median absolute error)\n"
-            f"- MSE:  {scores['mse']} (mean squared error)\n"
-            f"- RMSE:  {scores['rmse']} (root mean squared error)\n"
-            f"- MAXE:  {scores['maxe']} (max error)\n"
-            f"- MAPE:  {scores['mape']:.3f} (mean absolute percentage error)\n"
-            f"- R2:  {scores['r2']}\n"
-        )
-
-    def _permutation_importance(self, model, X, y, X_names, showplot_importance) -> DataFrame:
-        """Calculate permutation importance"""
-        # https://scikit-learn.org/stable/modules/permutation_importance.html#permutation-feature-importance
-        fi = permutation_importance(estimator=model,
-                                    X=X, y=y,
-                                    n_repeats=self.perm_n_repeats,
-                                    random_state=42,
-                                    scoring='r2',
-                                    n_jobs=-1)
-
-        # Store permutation importance
-        fidf = pd.DataFrame({'PERM_IMPORTANCE': fi.importances_mean,
-                             'PERM_SD': fi.importances_std},
-                            index=X_names)
-
-        fidf = fidf.sort_values(by='PERM_IMPORTANCE', ascending=False)
-
-        if showplot_importance:
-            fig, axs = plt.subplots(ncols=1, figsize=(9, 16))
-            _fidf = fidf.copy().sort_values(by='PERM_IMPORTANCE', ascending=True)
-            _fidf['PERM_IMPORTANCE'].plot.barh(color='#008bfb', yerr=_fidf['PERM_SD'], ax=axs)
-            axs.set_xlabel("Feature importance")
-            axs.set_ylabel("Feature")
-            axs.set_title(f"Permutation importance ({self.perm_n_repeats} permutations)")
-            axs.legend(loc='lower right')
-            fig.tight_layout()
-            fig.show()
-
-        return fidf
-
-    def _add_random_variable(self, df: DataFrame) -> tuple[DataFrame, str]:
-        # Add random variable as benchmark for relevant feature importances
-        random_col = '.RANDOM'  # Random variable as benchmark for relevant importances
-        df[random_col] = np.random.RandomState(self.kwargs['random_state']).randn(df.shape[0], 1)
-        # df[random_col] = np.random.rand(df.shape[0], 1)
-        return df, random_col
-
-    def _lag_features(self):
-        """Add lagged variants of variables as new features"""
-        return fr.lagged_variants(df=self.model_df,
-                                  stepsize=1,
-                                  lag=self.features_lag,
-                                  exclude_cols=[self.target_col])
-
-    def _check_n_cols(self):
-        """Check number of columns"""
-        if len(self.model_df.columns) == 1:
-            raise Exception(f"(!) Stopping execution because dataset comprises "
-                            f"only one single column : {self.model_df.columns}")
-
-    def _fillgaps_fullmodel(self, showplot_scores, showplot_importance):
-        """Apply model to fill missing targets for records where all features are available
-        (high-quality gap-filling)"""
-
-        # Original input data, contains target and features
-        # This dataframe has the full timestamp
-        df = self.model_df.copy()
-
-        # Test how the model performs with all y data
-        # Since the model was previously trained on test data,
-        # here it is checked how well the model performs when
-        # predicting all available y data.
-        # This is needed to calculate feature importance and scores.
-        y, X, X_names, timestamp = fr.convert_to_arrays(
-            df=df, target_col=self.target_col, complete_rows=True)
-
-        # Predict all targets (no test split)
-        pred_y = self.model_.predict(X=X)
-
-        # Calculate permutation importance and store in dataframe
-        self._feature_importances = self._permutation_importance(
-            model=self._model, X=X, y=y, X_names=X_names, showplot_importance=showplot_importance)
-
-        # Model scores, using all targets
-        self._scores = prediction_scores_regr(predictions=pred_y,
-                                              targets=y,
-                                              infotxt="trained on training set, "
-                                                      "tested on full set",
-                                              showplot=showplot_scores)
-
-        # In the next step, all available features are used to
-        # predict the target for records where all features are available.
-        # Feature data for records where all features are available:
-        features_df = df.drop(self.target_col, axis=1)  # Remove target data
-        features_df = features_df.dropna()  # Keep rows where all features available
-        X = features_df.to_numpy()  # Features are needed as numpy array
-        feature_names = features_df.columns.tolist()
-
-        # Predict targets for all records where all features are available
-        pred_y = self.model_.predict(X=X)
-
-        # Collect gapfilling results in df
-        # Define column names for gapfilled_df
-        self._define_cols()
-
-        # Collect predictions in dataframe
-        self._gapfilling_df = pd.DataFrame(data={self.pred_fullmodel_col: pred_y}, index=features_df.index)
-
-        # Add target to dataframe
-        self._gapfilling_df[self.target_col] = df[self.target_col].copy()
-
-        # Gap locations
-        # Make column that contains predicted values
-        # for rows where target is missing
-        _gap_locs = self._gapfilling_df[self.target_col].isnull()  # Locations where target is missing
-        self._gapfilling_df[self.pred_gaps_col] = self._gapfilling_df.loc[
-            _gap_locs, self.pred_fullmodel_col]
-
-        # Flag
-        # Make flag column that indicates where predictions for
-        # missing targets are available, where 0=observed, 1=gapfilled
-        # todo Note that missing predicted gaps = 0. change?
-        _gapfilled_locs = self._gapfilling_df[self.pred_gaps_col].isnull()  # Non-gapfilled locations
-        _gapfilled_locs = ~_gapfilled_locs  # Inverse for gapfilled locations
-        self._gapfilling_df[self.target_gapfilled_flag_col] = _gapfilled_locs
-        self._gapfilling_df[self.target_gapfilled_flag_col] = self._gapfilling_df[
-            self.target_gapfilled_flag_col].astype(
-            int)
-
-        # Gap-filled time series
-        # Fill missing records in target with predicions
-        self._gapfilling_df[self.target_gapfilled_col] = \
-            self._gapfilling_df[self.target_col].fillna(self._gapfilling_df[self.pred_fullmodel_col])
-
-        # Restore original full timestamp
-        self._gapfilling_df = self._gapfilling_df.reindex(df.index)
-
-        # SHAP values
-        # https://pypi.org/project/shap/
-        # https://mljar.com/blog/feature-importance-in-random-forest/
-
-    def _fillgaps_fallback(self):
-
-        # Fallback gapfilling
-        # Fill still existing gaps in full timestamp data
-        # Build fallback model exclusively from timestamp features.
-        # Here, the model is trained on the already gapfilled time series,
-        # using info from the timestamp, e.g. DOY
-        _still_missing_locs = self._gapfilling_df[self.target_gapfilled_col].isnull()
-        _num_still_missing = _still_missing_locs.sum()  # Count number of still-missing values
-        if _num_still_missing > 0:
-
-            fallback_predictions, \
-                fallback_timestamp = \
-                self._predict_fallback(series=self._gapfilling_df[self.target_gapfilled_col])
-
-            fallback_series = pd.Series(data=fallback_predictions, index=fallback_timestamp)
-            self._gapfilling_df[self.pred_fallback_col] = fallback_series
-            self._gapfilling_df[self.target_gapfilled_col] = \
-                self._gapfilling_df[self.target_gapfilled_col].fillna(fallback_series)
-
-            self._gapfilling_df.loc[_still_missing_locs, self.target_gapfilled_flag_col] = 2  # Adjust flag, 2=fallback
-        else:
-            self._gapfilling_df[self.pred_fallback_col] = None
-
-        # Cumulative
-        self._gapfilling_df[self.target_gapfilled_cumu_col] = \
-            self._gapfilling_df[self.target_gapfilled_col].cumsum()
-
-    def _fillgaps_combinepredictions(self):
-        """Combine predictions of full model with fallback predictions"""
-        # First add predictions from full model
-        self._gapfilling_df[self.pred_col] = self._gapfilling_df[self.pred_fullmodel_col].copy()
-        # Then fill remaining gaps with predictions from fallback model
-        self._gapfilling_df[self.pred_col] = (
-            self._gapfilling_df[self.pred_col].fillna(self._gapfilling_df[self.pred_fallback_col]))
-
-    def _predict_fallback(self, series: pd.Series):
-        """Fill data gaps using timestamp features only, fallback for still existing gaps"""
-        gf_fallback_df = pd.DataFrame(series)
-        gf_fallback_df = include_timestamp_as_cols(df=gf_fallback_df, txt="(ONLY FALLBACK)")
-
-        # Build model for target predictions *from timestamp*
-        y_fallback, X_fallback, _, _ = \
-            fr.convert_to_arrays(df=gf_fallback_df,
-                                 target_col=self.target_gapfilled_col,
+        y, X, X_names, timestamp = \
+            fr.convert_to_arrays(df=self.model_df,
+                                 target_col=self.target_col,
                                  complete_rows=True)
 
-        # Instantiate new model with same params as before
-        model_fallback = RandomForestRegressor(**self.kwargs)
-
-        # Train the model on all available records ...
-        model_fallback.fit(X=X_fallback, y=y_fallback)
-
-        # ... and use it to predict all records for full timestamp
-        full_timestamp_df = gf_fallback_df.drop(self.target_gapfilled_col, axis=1)  # Remove target data
-        X_fallback_full = full_timestamp_df.to_numpy()  # Features are needed as numpy array
-        pred_y_fallback = model_fallback.predict(X=X_fallback_full)  # Predict targets in test data
-        full_timestamp = full_timestamp_df.index
+        # Records are in time order, the most recent records are used as test set
+        n_test = int(len(y) * 0.25)
+        X_search, y_search, X_test, y_test = X[:-n_test], y[:-n_test], X[-n_test:], y[-n_test:]
 
-        return pred_y_fallback, full_timestamp
-
-    def _results(self, gapfilled_df, most_important_df, model_r2, still_missing_locs):
-        """Summarize gap-filling results"""
+        if n_candidates:
+            candidates = list(ParameterSampler(self.params, n_iter=n_candidates, random_state=random_state))
+        else:
+            candidates = list(ParameterGrid(self.params))
+        if not max_resources:
+            max_resources = len(y_search) if resource == 'n_samples' else 100
+        if search == 'random':
+            budgets = [max_resources]
+        else:
+            min_resources = 10 * (n_splits + 1) if resource == 'n_samples' else 10
+            budgets = _halving_budgets(n_candidates=len(candidates), factor=factor,
+                                       min_resources=min_resources, max_resources=max_resources)
+        print(f"Searching parameters ({search}) for {len(candidates)} candidates with "
+              f"{resource} budgets {budgets}, {n_splits} time-ordered splits ...")
+
+        # Scores of completed folds from earlier runs of the same search
+        checkpointfile = None
+        completed = {}
+        if checkpointdir:
+            key = fingerprint_model(X=X_search, y=y_search, feature_names=X_names, model=self.regr,
+                                    search=search, resource=resource, budgets=budgets, n_splits=n_splits,
+                                    candidates=candidates, random_state=random_state)
+            verify_dir(Path(checkpointdir))
+            checkpointfile = Path(checkpointdir) / f"search_{key}.jsonl"
+            completed = _load_checkpoints(checkpointfile=checkpointfile)
+            if completed:
+                print(f"Resuming search with {len(completed)} completed folds from {checkpointfile}.")
+
+        tic = time.perf_counter()
+        timed_out = False
+        results = []
+        for iteration, n_resources in enumerate(budgets):
+            if resource == 'n_samples':
+                X_budget, y_budget = X_search[-n_resources:], y_search[-n_resources:]
+                budgetparams = {}
+            else:
+                X_budget, y_budget = X_search, y_search
+                budgetparams = {'n_estimators': n_resources}
+            splits = list(TimeSeriesSplit(n_splits=n_splits).split(X_budget))
+
+            for params in candidates:
+                foldscores = []
+                for fold, (train, validation) in enumerate(splits):
+                    foldkey = json.dumps([iteration, n_resources, params, fold], sort_keys=True, default=str)
+                    if foldkey in completed:
+                        foldscores.append(completed[foldkey])
+                        continue
+                    if max_seconds is not None and time.perf_counter() - tic > max_seconds:
+                        timed_out = True
+                        break
+                    modelparams = {'random_state': random_state, 'n_jobs': -1, **params, **budgetparams}
+                    model = clone(self.regr).set_params(**modelparams)
+                    model.fit(X_budget[train], y_budget[train])
+                    score = -mean_squared_error(y_budget[validation], model.predict(X_budget[validation]))
+                    completed[foldkey] = score
+                    foldscores.append(score)
+                    if checkpointfile:
+                        with open(checkpointfile, 'a', encoding='utf-8') as f:
+                            f.write(json.dumps({'key': foldkey, 'score': score}) + '\n')
+                if timed_out:
+                    break
+                result = {'iter': iteration, 'n_resources': n_resources, 'params': params,
+                          'mean_test_score': np.mean(foldscores), 'std_test_score': np.std(foldscores)}
+                result.update({f'split{fold}_test_score': score for fold, score in enumerate(foldscores)})
+                results.append(result)
+            if timed_out:
+                print(f"(!) Search stopped after {time.perf_counter() - tic:.0f}s (max_seconds={max_seconds}) "
+                      f"in iteration {iteration}.")
+                break
+
+            # Best candidates are evaluated again with a larger budget
+            ranked = sorted([r for r in results if r['iter'] == iteration],
+                            key=lambda r: r['mean_test_score'], reverse=True)
+            candidates = [r['params'] for r in ranked[:math.ceil(len(ranked) / factor)]]
+
+        if not results:
+            raise Exception(f"(!) No candidate was completed within {max_seconds}s, "
+                            f"run the search again with *checkpointdir* to continue.")
+
+        self._cv_results = pd.DataFrame(results)
+        self._cv_results['rank_test_score'] = (
+            self._cv_results.groupby('iter')['mean_test_score'].rank(ascending=False, method='min').astype(int))
+
+        # Best candidate from the largest budget where all candidates were completed, candidates
+        # of an iteration stopped by *max_seconds* are not compared with the other candidates
+        bestiter = max(iteration - 1, 0) if timed_out else iteration
+        lastiter = self._cv_results.loc[self._cv_results['iter'] == bestiter]
+        best = lastiter.loc[lastiter['mean_test_score'].idxmax()]
+        self._best_params = dict(best['params'])
+        if resource == 'n_estimators':
+            self._best_params['n_estimators'] = int(best['n_resources'])
+        self._best_score = best['mean_test_score']
+        self._cv_n_splits = n_splits
+        self._search_completed = not timed_out
+
+        # Train best model on all search records, test on most recent records
+        model = clone(self.regr).set_params(**{'random_state': random_state, 'n_jobs': -1, **self._best_params})
+        model.fit(X_search, y_search)
+        self._scores = prediction_scores_regr(predictions=model.predict(X_test),
+                                              targets=y_test,
+                                              infotxt=f"trained on search set, "
+                                                      f"tested on most recent records",
+                                              showplot=showplot)
+
+
+def _halving_budgets(n_candidates: int, factor: int, min_resources: int, max_resources: int) -> list:
+    """Budget of each successive halving round, the last round has *max_resources*"""
+    n_rounds = 1
+    while factor ** (n_rounds - 1) < n_candidates:
+        n_rounds += 1
+    first = max(min_resources, max_resources // factor ** (n_rounds - 1))
+    budgets = [min(first * factor ** i, max_resources) for i in range(n_rounds)]
+    budgets[-1] = max_resources
+    return budgets
+
+
+def _load_checkpoints(checkpointfile: Path) -> dict:
+    """Scores of completed folds, an incomplete last line of an interrupted search is ignored"""
+    completed = {}
+    if not checkpointfile.is_file():
+        return completed
+    lines = checkpointfile.read_text(encoding='utf-8').splitlines(keepends=True)
+    for line in lines:
+        try:
+            checkpoint = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        completed[checkpoint['key']] = checkpoint['score']
+    if lines and not lines[-1].endswith('\n'):
+        # New checkpoints start on a new line
+        with open(checkpointfile, 'a', encoding='utf-8') as f:
+            f.write('\n')
+    return completed
+
+
+class RandomForestTS(MlRegressorGapFillingBase):
+    """
+    Gap-fill timeseries with predictions from random forest model
 
-        _vals_max = len(gapfilled_df.index)
-        _vals_before = len(gapfilled_df[self.target_col].dropna())
-        _vals_after = len(gapfilled_df[self.target_gapfilled_col].dropna())
-        _vals_fallback_filled = still_missing_locs.sum()
-        _perc_fallback_filled = (_vals_fallback_filled / _vals_max) * 100
+    See `MlRegressorGapFillingBase` for the arguments, *kwargs* are the parameters of
+    the random forest, e.g. n_estimators=200, random_state=42.
+    """
 
-        print(f"Gap-filling results for {self.target_col}\n"
-              f"max possible: {_vals_max} values\n"
-              f"before gap-filling: {_vals_before} values\n"
-              f"after gap-filling: {_vals_after} values\n"
-              f"gap-filled with fallback: {_vals_fallback_filled} values / {_perc_fallback_filled:.1f}%\n"
-              f"used features:\n{most_important_df}\n"
-              f"predictions vs targets, R2 = {model_r2:.3f}")
+    gfsuffix = 'gfRF'
 
-    def _define_cols(self):
-        self.pred_col = ".PREDICTIONS"
-        self.pred_fullmodel_col = ".PREDICTIONS_FULLMODEL"
-        self.pred_fallback_col = ".PREDICTIONS_FALLBACK"
-        self.pred_gaps_col = ".GAP_PREDICTIONS"
-        self.target_gapfilled_col = f"{self.target_col}_gfRF"
-        self.target_gapfilled_flag_col = f"FLAG_{self.target_gapfilled_col}_ISFILLED"  # "[0=measured]"
-        self.target_gapfilled_cumu_col = ".GAPFILLED_CUMULATIVE"
+    def _new_model(self) -> 'RandomForestRegressor':
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(**self.kwargs)
 
 
 class QuickFillRFTS:
@@ -907,7 +412,13 @@ class QuickFillRFTS:
     final gap-filling.
     """
 
-    def __init__(self, df: DataFrame, target_col: str or tuple):
+    def __init__(self, df: DataFrame, target_col: str or tuple, registry: ModelRegistry = None):
+        """
+        Args:
+            df: dataframe of target and features
+            target_col: name of target in *df*
+            registry: Registry of trained models, see `RandomForestTS`
+        """
         self.df = df.copy()
         self.target_col = target_col
         self.rfts = None
@@ -925,7 +436,8 @@ class QuickFillRFTS:
             min_samples_split=2,
             min_samples_leaf=1,
             perm_n_repeats=9,
-            n_jobs=-1
+            n_jobs=-1,
+            registry=registry
         )
 
     def fill(self):
@@ -958,6 +470,8 @@ class LongTermRandomForestTS:
                  include_timestamp_as_features: bool = False,
                  add_continuous_record_number: bool = False,
                  sanitize_timestamp: bool = False,
+                 features_float32: bool = False,
+                 n_workers: int = 1,
                  **kwargs
                  ):
         """
@@ -971,13 +485,28 @@ class LongTermRandomForestTS:
                 - for 2016, the model is built from 2015, 2016 and 2017 data
                 - for 2017, the model is built from 2015, 2016 and 2017 data
 
+        Features (lagged variants, timestamp info, record number) are added once to the
+        full time series, the model for each year then uses the records of its data pool.
+        Lagged variants at the start and end of a data pool therefore contain the values
+        of the neighboring records outside the pool, and the record number is continuous
+        over the full time series.
+
         Args:
-            See docstring for pkgs.gapfilling.randomforest_ts.RandomForestTS
+            n_workers: Number of worker processes used to build and apply the models
+                of different years in parallel. With *1*, years are processed one after
+                the other in the current process. With more workers, target and features
+                are written once to memory-mapped files and each worker only receives the
+                row range of its data pool. Workers send back only the results of their year
+                (see *results_yearly_*), not the models. Consider setting n_jobs=1 for the
+                random forest to avoid more processes than CPU cores.
+            For all other arguments see docstring for pkgs.gapfilling.randomforest_ts.RandomForestTS
 
         Attributes:
             gapfilling_df_: dataframe, gapfilling results from all years in one dataframe
             gapfilled_: series, gap-filled target series from all years in one time series
-            results_yearly_: dict, detailed results for each year
+            results_yearly_: dict, detailed results for each year, the `RandomForestTS` model of
+                each year, or with *n_workers* > 1 a dict with the gap-filling results, gap-filled
+                target, scores and feature importances of the year
             scores_: dict, scoring results for each year
             feature_importances_: dict, feature importances for each year
         """
@@ -991,8 +520,11 @@ class LongTermRandomForestTS:
         self.include_timestamp_as_features = include_timestamp_as_features
         self.add_continuous_record_number = add_continuous_record_number
         self.sanitize_timestamp = sanitize_timestamp
+        self.features_float32 = features_float32
+        self.n_workers = n_workers
         self.kwargs = kwargs
 
+        self.model_df = None  # Target and features for all years
         self.yearpools_dict = None
         self._results_yearly = {}
         self._gapfilling_df = pd.DataFrame()
@@ -1036,61 +568,131 @@ class LongTermRandomForestTS:
         return self._feature_importances
 
     def run(self):
+        self.model_df = self._prepare_features()
         self.yearpools_dict = self._create_yearpools()
-        self._initialize_models()
-        self._trainmodels()
-        self._fillgaps()
+        if self.n_workers > 1:
+            self._run_parallel()
+        else:
+            self._initialize_models()
+            self._trainmodels()
+            self._fillgaps()
         self._collect()
 
+    def _prepare_features(self) -> DataFrame:
+        """Add features to the full time series"""
+        model_df = prepare_model_df(df=self.input_df,
+                                    target_col=self.target_col,
+                                    features_lag=self.features_lag,
+                                    include_timestamp_as_features=self.include_timestamp_as_features,
+                                    add_continuous_record_number=self.add_continuous_record_number,
+                                    sanitize_timestamp=self.sanitize_timestamp,
+                                    features_float32=self.features_float32,
+                                    verbose=self.verbose)
+        # Data pools are selected as row ranges
+        return model_df if model_df.index.is_monotonic_increasing else model_df.sort_index()
+
     def _create_yearpools(self):
-        """For each year create a dataset comprising the respective year
+        """For each year find the rows of the data pool comprising the respective year
         and the neighboring years"""
-        yearpools_dict = neighboring_years(df=self.input_df)
+        print("\nCollecting data from neighboring years ...")
+        yearpools_dict = neighboring_poolyears(years=list(self.model_df.index.year.unique()))
+        for yearpool in yearpools_dict.values():
+            yearpool['rows'] = yearpool_rows(index=self.model_df.index, poolyears=yearpool['poolyears'])
         return yearpools_dict
 
+    def _model_kwargs(self) -> dict:
+        """Arguments for the model of each year, features were already added to model_df
+
+        The data pool of each year is used without copying it.
+        """
+        return dict(verbose=self.verbose,
+                    copy=False,
+                    perm_n_repeats=self.perm_n_repeats,
+                    test_size=self.test_size,
+                    features_float32=self.features_float32,
+                    **self.kwargs)
+
     def _initialize_models(self):
         """Initialize model for each year"""
-        for year, _df in self.yearpools_dict.items():
+        for year, yearpool in self.yearpools_dict.items():
             print(f"Initializing model for {year} ...")
-            df = _df['df'].copy()
+            start, stop = yearpool['rows']
             # Random forest
             rfts = RandomForestTS(
-                input_df=df,
+                input_df=self.model_df.iloc[start:stop],
                 target_col=self.target_col,
-                verbose=self.verbose,
-                features_lag=self.features_lag,
-                include_timestamp_as_features=self.include_timestamp_as_features,
-                add_continuous_record_number=self.add_continuous_record_number,
-                sanitize_timestamp=self.sanitize_timestamp,
-                **self.kwargs
+                **self._model_kwargs()
             )
             self._results_yearly[year] = rfts
 
     def _trainmodels(self):
         """Train model for each year"""
-        for year, _df in self.yearpools_dict.items():
+        for year in self.yearpools_dict.keys():
             print(f"Training model for {year} ...")
             rfts = self.results_yearly_[year]
-            rfts.trainmodel(showplot_predictions=False, showplot_importance=False, verbose=0)
+            rfts.trainmodel(showplot_scores=False, showplot_importance=False)
 
     def _fillgaps(self):
         """Gap-fill each year with the respective model"""
-        for year, _df in self.yearpools_dict.items():
+        for year in self.yearpools_dict.keys():
             print(f"Gap-filling {year} ...")
             rfts = self.results_yearly_[year]
-            rfts.fillgaps(showplot_scores=True, showplot_importance=True, verbose=0)
+            rfts.fillgaps(showplot_scores=True, showplot_importance=True)
+
+    def _run_parallel(self):
+        """Initialize, train and apply the model for each year in worker processes
+
+        Results are collected in the order in which the years finish.
+        """
+        with tempfile.TemporaryDirectory() as folder:
+            spec = memmap_frame(df=self.model_df, target_col=self.target_col, folder=folder)
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                futures = []
+                for year, yearpool in self.yearpools_dict.items():
+                    start, stop = yearpool['rows']
+                    futures.append(executor.submit(_gapfill_yearpool, year=year, spec=spec, start=start, stop=stop,
+                                                   index=self.model_df.index[start:stop],
+                                                   target_col=self.target_col, model_kwargs=self._model_kwargs()))
+                for future in as_completed(futures):
+                    year, results = future.result()
+                    print(f"Finished model for {year}.")
+                    self._results_yearly[year] = results
 
     def _collect(self):
         """Collect results"""
-        for year, _df in self.yearpools_dict.items():
+        for year in self.yearpools_dict.keys():
             print(f"Collecting results for {year} ...")
-            rfts = self.results_yearly_[year]
-            keepyear = rfts.gapfilling_df_.index.year == int(year)
-            self._gapfilling_df = pd.concat([self._gapfilling_df, rfts.gapfilling_df_[keepyear]], axis=0)
-            self._scores[year] = rfts.scores_
-            self._feature_importances[year] = rfts.feature_importances_
-            gapfilled = rfts.get_gapfilled_target()
-            self._gapfilled = pd.concat([self._gapfilled, gapfilled[keepyear]])
+            results = self.results_yearly_[year]
+            if isinstance(results, RandomForestTS):
+                results = _year_results(year=year, rfts=results)
+            self._gapfilling_df = pd.concat([self._gapfilling_df, results['gapfilling_df']], axis=0)
+            self._scores[year] = results['scores']
+            self._feature_importances[year] = results['feature_importances']
+            self._gapfilled = pd.concat([self._gapfilled, results['gapfilled']])
+
+
+def _gapfill_yearpool(year: str, spec: dict, start: int, stop: int, index: DatetimeIndex,
+                      target_col: str or tuple, model_kwargs: dict) -> tuple[str, dict]:
+    """Initialize, train and apply the model for one year, with the records *start* to *stop* from *spec*
+
+    Defined at module level so that it can be sent to worker processes. Only the results
+    of the year are sent back, not the model and its data pool.
+    """
+    rfts = RandomForestTS(input_df=load_memmap_frame(spec=spec, start=start, stop=stop, index=index),
+                          target_col=target_col,
+                          **model_kwargs)
+    rfts.trainmodel(showplot_scores=False, showplot_importance=False)
+    rfts.fillgaps(showplot_scores=False, showplot_importance=False)
+    return year, _year_results(year=year, rfts=rfts)
+
+
+def _year_results(year: str, rfts: RandomForestTS) -> dict:
+    """Gap-filling results, gap-filled target, scores and feature importances of *year*"""
+    keepyear = rfts.gapfilling_df_.index.year == int(year)
+    return {'gapfilling_df': rfts.gapfilling_df_[keepyear],
+            'gapfilled': rfts.get_gapfilled_target()[keepyear],
+            'scores': rfts.scores_,
+            'feature_importances': rfts.feature_importances_}
 
 
 def example_quickfill():
@@ -1182,6 +784,8 @@ def example_longterm_rfts():
 
 
 def example_rfts():
+    import matplotlib.pyplot as plt
+
     # Setup, user settings
     # TARGET_COL = 'LE_orig'
     TARGET_COL = 'NEE_CUT_REF_orig'
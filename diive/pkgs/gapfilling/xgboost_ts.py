@@ -0,0 +1,217 @@
+"""
+===================================
+XGBOOST GAP-FILLING FOR TIME SERIES
+xgboost_ts
+===================================
+
+This module is part of the diive library:
+https://gitlab.ethz.ch/diive/diive
+
+Gap-filling with gradient boosted trees from XGBoost, with the same workflow
+as `RandomForestTS`. Trees are built from histograms of the features (tree
+method 'hist') on all CPU cores. The number of boosting rounds is found with
+early stopping on the most recent records of the training data. Missing values
+in features are handled by the model.
+
+Kudos:
+- https://xgboost.readthedocs.io/en/stable/parameter.html#parameters-for-tree-booster
+- https://xgboost.readthedocs.io/en/stable/python/sklearn_estimator.html#early-stopping
+
+"""
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from diive.pkgs.gapfilling.mlbase import MlRegressorGapFillingBase
+
+if TYPE_CHECKING:
+    from xgboost import XGBRegressor
+
+
+class XGBoostTS(MlRegressorGapFillingBase):
+    """
+    Gap-fill timeseries with predictions from XGBoost model
+
+    See `MlRegressorGapFillingBase` for the arguments, *kwargs* are the parameters of
+    XGBRegressor, e.g. n_estimators=500, learning_rate=0.1, max_depth=6, random_state=42.
+    *random_state* is required, it is also used to split training and test data.
+    Training uses all CPU cores, unless *n_jobs* is given.
+
+    Example:
+        xts = XGBoostTS(input_df=df, target_col='NEE', n_estimators=500, learning_rate=0.1, random_state=42)
+        xts.trainmodel()
+        xts.fillgaps()
+        gapfilled = xts.get_gapfilled_target()
+    """
+
+    gfsuffix = 'gfXG'
+    missing_features = True
+
+    def __init__(self,
+                 input_df: DataFrame,
+                 target_col: str or tuple,
+                 tree_method: str = 'hist',
+                 early_stopping_rounds: int or None = 20,
+                 validation_fraction: float = 0.1,
+                 **kwargs):
+        """
+        Args:
+            input_df: Contains timeseries of 1 target column and 1+ feature columns.
+            target_col: Column name of variable in *input_df* that will be gap-filled.
+            tree_method: XGBoost tree construction algorithm, 'hist' bins features into
+                histograms, which is much faster than 'exact' for large datasets.
+            early_stopping_rounds: Training stops when the score on the validation block did
+                not improve for this number of boosting rounds, the model of the best round
+                is then used for predictions. No early stopping if *None*, all *n_estimators*
+                rounds are trained.
+            validation_fraction: Fraction of the training records used as validation block
+                for early stopping. The validation block are the most recent records, the
+                model is trained on the records before.
+            **kwargs: Other arguments of `MlRegressorGapFillingBase` and parameters of XGBRegressor.
+        """
+        self.validation_fraction = validation_fraction
+        super().__init__(input_df=input_df, target_col=target_col,
+                         tree_method=tree_method, early_stopping_rounds=early_stopping_rounds, **kwargs)
+
+    def _new_model(self) -> 'XGBRegressor':
+        from xgboost import XGBRegressor
+        return XGBRegressor(**self.kwargs)
+
+    def _fit_model(self, model, X: np.ndarray, y: np.ndarray, timestamp: np.ndarray):
+        """Train *model* with early stopping on the most recent training records"""
+        if not model.get_params()['early_stopping_rounds']:
+            model.fit(X, y, verbose=False)
+            return
+        order = np.argsort(timestamp, kind='stable')
+        n_validation = max(1, int(len(order) * self.validation_fraction))
+        train_rows, validation_rows = order[:-n_validation], order[-n_validation:]
+        model.fit(X[train_rows], y[train_rows],
+                  eval_set=[(X[validation_rows], y[validation_rows])], verbose=False)
+
+    def _fit_options(self) -> dict:
+        return {'validation_fraction': self.validation_fraction}
+
+
+def benchmark_gapfilling_engines(df: DataFrame = None,
+                                 target_col: str = 'NEE_CUT_REF_orig',
+                                 rf_params: dict = None,
+                                 xgb_params: dict = None,
+                                 **kwargs) -> DataFrame:
+    """Compare `XGBoostTS` with `RandomForestTS`: training time, prediction time, memory and R2
+
+    Both models are built with the same features and the same split into training
+    and test records. Random forest can only use records where all features are
+    available, XGBoost also uses and fills records with missing features (N_TRAIN,
+    N_PREDICTED). Prediction time is the time needed to predict all records the
+    model can fill. Peak memory is measured with tracemalloc during training, it
+    covers numpy arrays and Python objects but not memory allocated inside the
+    model libraries; MODEL_SIZE_MB is the size of the trained model.
+
+    Args:
+        df: Target and features, the example 30MIN dataset (only high-quality NEE,
+            with features air temperature, VPD and radiation) if *None*
+        target_col: Name of the target in *df*
+        rf_params: Parameters of the random forest, defaults as in the examples if *None*
+        xgb_params: Parameters of the XGBoost model, defaults as in the examples if *None*
+        **kwargs: Arguments for both gap-filling classes, e.g. *features_lag*
+
+    Returns:
+        dataframe with one row per engine
+    """
+    import pickle
+    import tracemalloc
+    from sklearn.metrics import r2_score
+    from sklearn.model_selection import train_test_split
+    from diive.pkgs.gapfilling.randomforest_ts import RandomForestTS
+
+    if df is None:
+        from diive.configs.exampledata import load_exampledata_parquet
+        df = load_exampledata_parquet()
+        df.loc[df["QCF_NEE"] > 0, target_col] = np.nan
+        df = df[[target_col, 'Tair_f', 'VPD_f', 'Rg_f']].copy()
+    if not kwargs:
+        kwargs = dict(features_lag=[-1, -1], include_timestamp_as_features=True, add_continuous_record_number=True)
+    rf_params = rf_params or dict(n_estimators=200, min_samples_split=10, min_samples_leaf=5, n_jobs=-1,
+                                  random_state=42)
+    xgb_params = xgb_params or dict(n_estimators=500, learning_rate=0.1, max_depth=6, random_state=42)
+
+    results = {}
+    for engine, params in [(RandomForestTS, rf_params), (XGBoostTS, xgb_params)]:
+        gf = engine(input_df=df, target_col=target_col, **kwargs, **params)
+        fm = gf.featurematrix_
+        X_train, X_test, y_train, y_test, timestamp_train, _ = train_test_split(
+            fm.X, fm.y, fm.timestamp, test_size=gf.test_size, random_state=params['random_state'])
+        model = gf._new_model()
+
+        tracemalloc.start()
+        tic = time.perf_counter()
+        gf._fit_model(model=model, X=X_train, y=y_train, timestamp=timestamp_train)
+        train_seconds = time.perf_counter() - tic
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tic = time.perf_counter()
+        model.predict(fm.X_features_available)
+        predict_seconds = time.perf_counter() - tic
+
+        results[engine.__name__] = {
+            'TRAIN_SECONDS': train_seconds,
+            'PREDICT_SECONDS': predict_seconds,
+            'PEAK_MEMORY_MB': peak / 1024 / 1024,
+            'MODEL_SIZE_MB': len(pickle.dumps(model)) / 1024 / 1024,
+            'R2': r2_score(y_test, model.predict(X_test)),
+            'N_TRAIN': len(y_train),
+            'N_PREDICTED': len(fm.index_features_available)
+        }
+    results = pd.DataFrame(results).T
+    print(f"Gap-filling engines, target {target_col}, {len(df)} records, {len(fm.feature_names)} features:")
+    print(results)
+    return results
+
+
+def example():
+    TARGET_COL = 'NEE_CUT_REF_orig'
+    subsetcols = [TARGET_COL, 'Tair_f', 'VPD_f', 'Rg_f']
+
+    # Example data
+    from diive.configs.exampledata import load_exampledata_parquet
+    df = load_exampledata_parquet()
+
+    # Subset with target and features
+    # Only High-quality (QCF=0) measured NEE used for model training in this example
+    lowquality = df["QCF_NEE"] > 0
+    df.loc[lowquality, TARGET_COL] = np.nan
+    df = df[subsetcols].copy()
+
+    xts = XGBoostTS(
+        input_df=df,
+        target_col=TARGET_COL,
+        verbose=1,
+        features_lag=[-1, -1],
+        include_timestamp_as_features=True,
+        add_continuous_record_number=True,
+        sanitize_timestamp=True,
+        perm_n_repeats=9,
+        n_estimators=500,
+        learning_rate=0.1,
+        max_depth=6,
+        early_stopping_rounds=20,
+        random_state=42
+    )
+    xts.reduce_features()
+    xts.report_feature_reduction()
+
+    xts.trainmodel(showplot_scores=False, showplot_importance=False)
+    xts.report_traintest()
+
+    xts.fillgaps(showplot_scores=False, showplot_importance=False)
+    xts.report_gapfilling()
+
+    benchmark_gapfilling_engines()
+
+
+if __name__ == '__main__':
+    example()
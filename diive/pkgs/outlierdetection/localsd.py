@@ -6,14 +6,10 @@ This module is part of the diive library:
 https://github.com/holukas/diive
 
 """
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 from pandas import DatetimeIndex, Series
 
-import diive.core.plotting.styles.LightTheme as theme
 from diive.core.base.flagbase import FlagBase
-from diive.core.plotting.plotfuncs import default_format
 from diive.core.utils.prints import ConsoleOutputDecorator
 
 
@@ -103,6 +99,9 @@ class LocalSD(FlagBase):
     @staticmethod
     def _plot_init():
         """Initialize plot that collects iteration data."""
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+
         fig = plt.figure(facecolor='white', figsize=(16, 12))
         gs = gridspec.GridSpec(2, 1)  # rows, cols
         # gs.update(wspace=0.3, hspace=0.1, left=0.03, right=0.97, top=0.95, bottom=0.05)
@@ -125,6 +124,9 @@ class LocalSD(FlagBase):
 
     def _plot_finalize(self, n_iterations):
         """Finalize and show plot."""
+        import diive.core.plotting.styles.LightTheme as theme
+        from diive.core.plotting.plotfuncs import default_format
+
         rejected = self.overall_flag == 2
         n_outliers = rejected.sum()
 
@@ -26,17 +26,12 @@ References:
 
 """
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from numpy import where
 from pandas import Series, DatetimeIndex, DataFrame
-from sklearn.neighbors import LocalOutlierFactor
 
-import diive.core.plotting.styles.LightTheme as theme
 from diive.core.base.flagbase import FlagBase
-from diive.core.plotting.plotfuncs import default_format, default_legend
 from diive.core.utils.prints import ConsoleOutputDecorator
 from diive.pkgs.createvar.daynightflag import DaytimeNighttimeFlag
 
@@ -47,6 +42,7 @@ def lof(series: Series,
         suffix: str = None,
         n_jobs: int = 1) -> DataFrame:
     """Unsupervised Outlier Detection using the Local Outlier Factor (LOF)."""
+    from sklearn.neighbors import LocalOutlierFactor
 
     # Prepare data
     if not suffix:
@@ -188,6 +184,11 @@ class LocalOutlierFactorAllData(FlagBase):
         return ok, rejected, n_outliers
 
     def _plot(self, df: DataFrame):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        import diive.core.plotting.styles.LightTheme as theme
+        from diive.core.plotting.plotfuncs import default_format, default_legend
+
         fig = plt.figure(facecolor='white', figsize=(12, 16))
         gs = gridspec.GridSpec(3, 1)  # rows, cols
         gs.update(wspace=0.3, hspace=0.1, left=0.05, right=0.95, top=0.95, bottom=0.05)
@@ -354,6 +355,11 @@ class LocalOutlierFactorDaytimeNighttime(FlagBase):
         return ok, rejected, n_outliers
 
     def _plot(self, df: DataFrame):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        import diive.core.plotting.styles.LightTheme as theme
+        from diive.core.plotting.plotfuncs import default_format, default_legend
+
         fig = plt.figure(facecolor='white', figsize=(12, 16))
         gs = gridspec.GridSpec(6, 1)  # rows, cols
         gs.update(wspace=0.3, hspace=0.1, left=0.05, right=0.95, top=0.95, bottom=0.05)
@@ -11,7 +11,6 @@ import pandas as pd
 from pandas import Series, DataFrame
 
 from diive.core.funcs.funcs import validate_id_string
-from diive.core.plotting.timeseries import TimeSeries
 from diive.core.times.times import TimestampSanitizer
 from diive.pkgs.outlierdetection.absolutelimits import AbsoluteLimits, AbsoluteLimitsDaytimeNighttime
 from diive.pkgs.outlierdetection.incremental import zScoreIncrements
@@ -118,11 +117,15 @@ class StepwiseOutlierDetection:
 
     def showplot_orig(self, interactive: bool = False):
         """Show original high-resolution data used as input"""
+        from diive.core.plotting.timeseries import TimeSeries
+
         p = TimeSeries(series=self._series_hires_orig)
         p.plot() if not interactive else p.plot_interactive()
 
     def showplot_cleaned(self, interactive: bool = False):
         """Show *current* cleaned high-resolution data"""
+        from diive.core.plotting.timeseries import TimeSeries
+
         p = TimeSeries(series=self._series_hires_cleaned)
         p.plot() if not interactive else p.plot_interactive()
 
@@ -1 +1,3 @@
-import diive.pkgs.qaqc.meteoscreening
+from diive.core.utils.lazy import lazy_module
+
+__getattr__, __dir__ = lazy_module(__name__, ['meteoscreening'])
@@ -10,18 +10,12 @@ This module is part of the 'diive' library.
 """
 from typing import Literal
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import pandas as pd
 from pandas import DataFrame
 from pandas.tseries.frequencies import to_offset
 
 import diive.core.dfun.frames as frames
-import diive.core.plotting.styles.LightTheme as theme
-from diive.core.plotting.heatmap_datetime import HeatmapDateTime
-from diive.core.plotting.plotfuncs import default_format, default_legend, nice_date_ticks
-from diive.core.plotting.timeseries import TimeSeries
-from diive.core.times.resampling import resample_series_to_30MIN
+from diive.core.times.resampling import resample_to_freq
 from diive.core.times.times import TimestampSanitizer
 from diive.core.times.times import detect_freq_groups
 from diive.pkgs.analyses.correlation import daily_correlation
@@ -235,6 +229,11 @@ class StepwiseMeteoScreeningDb:
 
     def showplot_resampled(self):
         """Show resampled data after high-resolution screening and corrections"""
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        import diive.core.plotting.styles.LightTheme as theme
+        from diive.core.plotting.heatmap_datetime import HeatmapDateTime
+        from diive.core.plotting.plotfuncs import default_format, default_legend, nice_date_ticks
 
         for field in self.fields:
             series_orig = self.series_hires_orig[field]
@@ -287,12 +286,16 @@ class StepwiseMeteoScreeningDb:
 
     def showplot_orig(self, interactive: bool = False):
         """Show original high-resolution data used as input"""
+        from diive.core.plotting.timeseries import TimeSeries
+
         for field in self.fields:
             p = TimeSeries(series=self.series_hires_orig[field])
             p.plot() if not interactive else p.plot_interactive()
 
     def showplot_cleaned(self, interactive: bool = False):
         """Show *current* cleaned high-resolution data"""
+        from diive.core.plotting.timeseries import TimeSeries
+
         for field in self.fields:
             p = TimeSeries(series=self.series_hires_cleaned[field])
             p.plot() if not interactive else p.plot_interactive()
@@ -480,30 +483,42 @@ class StepwiseMeteoScreeningDb:
         return daily_correlations
 
     def resample(self,
-                 to_freqstr: Literal['30T'] = '30T',
+                 to_freqstr: str = '30T',
                  agg: Literal['mean', 'sum'] = 'mean',
                  mincounts_perc: float = .25):
 
+        # Variables with the same time resolution are resampled together in one call
+        fields_by_freq = {}
         for field in self.fields:
-
-            # Resample to 30MIN
-            series_resampled = resample_series_to_30MIN(series=self._series_hires_cleaned[field],
-                                                        to_freqstr=to_freqstr,
-                                                        agg=agg,
-                                                        mincounts_perc=mincounts_perc)
-
-            # Update tags with resampling info
-            self._tags[field]['freq'] = '30T'
-            self._tags[field]['data_version'] = 'meteoscreening'
-
-            # Create df that includes the resampled series and its tags
-            self._resampled_detailed[field] = pd.DataFrame()
-            self._resampled_detailed[field][field] = series_resampled  # Store screened variable with original name
-            self._resampled_detailed[field] = self._resampled_detailed[field].asfreq(series_resampled.index.freqstr)
-
-            # Insert tags as columns
-            for key, value in self._tags[field].items():
-                self._resampled_detailed[field][key] = value
+            fields_by_freq.setdefault(self._series_hires_cleaned[field].index.freqstr, []).append(field)
+
+        for freq, fields in fields_by_freq.items():
+            hires_df = pd.concat([self._series_hires_cleaned[field] for field in fields], axis=1)
+            hires_df = hires_df.asfreq(freq)
+            resampled_df = resample_to_freq(data=hires_df,
+                                            to_freq=to_freqstr,
+                                            agg=agg,
+                                            mincounts_perc=mincounts_perc,
+                                            output_timestamp_shows='end')
+
+            for field in fields:
+                # Remove aggregates without enough values at start and end
+                series_resampled = resampled_df[field]
+                series_resampled = series_resampled.loc[series_resampled.first_valid_index():
+                                                        series_resampled.last_valid_index()]
+
+                # Update tags with resampling info
+                self._tags[field]['freq'] = to_freqstr
+                self._tags[field]['data_version'] = 'meteoscreening'
+
+                # Create df that includes the resampled series and its tags
+                self._resampled_detailed[field] = pd.DataFrame()
+                self._resampled_detailed[field][field] = series_resampled  # Store screened variable with original name
+                self._resampled_detailed[field] = self._resampled_detailed[field].asfreq(series_resampled.index.freqstr)
+
+                # Insert tags as columns
+                for key, value in self._tags[field].items():
+                    self._resampled_detailed[field][key] = value
 
     def finalize_outlier_detection(self,
                                    daytime_accept_qcf_below: int = 2,
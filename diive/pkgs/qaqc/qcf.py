@@ -8,15 +8,12 @@ Combine multiple flags in one single QCF flag.
 
 """
 
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from pandas import DataFrame, Series
 
 from diive.core.base.identify import identify_flagcols
 from diive.core.funcs.funcs import validate_id_string
-from diive.core.plotting.heatmap_datetime import HeatmapDateTime
 from diive.pkgs.createvar.daynightflag import daytime_nighttime_flag_from_swinpot
 
 
@@ -292,6 +289,9 @@ class FlagQCF:
         return df
 
     def showplot_qcf_heatmaps(self, maxabsval: float = None, figsize: tuple = (18, 8)):
+        import matplotlib.gridspec as gridspec
+        import matplotlib.pyplot as plt
+        from diive.core.plotting.heatmap_datetime import HeatmapDateTime
 
         fig = plt.figure(facecolor='white', figsize=figsize)
         gs = gridspec.GridSpec(1, 4)  # rows, cols
@@ -322,5 +322,7 @@ class FlagQCF:
         fig.show()
 
     def showplot_qcf_timeseries(self, figsize=(16, 20)):
+        import matplotlib.pyplot as plt
+
         self.flags.plot(subplots=True, figsize=figsize)
         plt.show()
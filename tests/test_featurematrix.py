@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import diive.core.dfun.frames as fr
+from diive.core.ml.featurematrix import FeatureMatrix
+
+
+class TestFeatureMatrix(unittest.TestCase):
+
+    def test_featurematrix(self):
+        index = pd.date_range('2023-01-01 00:15', periods=100, freq='30min')
+        df = pd.DataFrame({'TA': np.arange(100, dtype=float),
+                           'SW_IN': np.arange(100, dtype='float32') * 2,
+                           'HOUR': index.hour,
+                           'NEE': np.arange(100, dtype=float) * -1}, index=index)
+        df.iloc[3, 0] = np.nan  # Feature missing
+        df.iloc[5, 3] = np.nan  # Target missing
+
+        fm = FeatureMatrix.from_frame(df=df, target_col='NEE')
+
+        # Same arrays as from converting the dataframe
+        y, X, X_names, timestamp = fr.convert_to_arrays(df=df, target_col='NEE', complete_rows=True)
+        np.testing.assert_array_equal(fm.X, X)
+        np.testing.assert_array_equal(fm.y, y)
+        np.testing.assert_array_equal(fm.timestamp, timestamp)
+        self.assertEqual(fm.feature_names, X_names)
+        self.assertEqual(fm.X.dtype, X.dtype)
+
+        # Prediction rows only need features
+        self.assertEqual(len(fm.X_features_available), 99)
+        self.assertFalse(index[3] in fm.index_features_available)
+        self.assertTrue(index[5] in fm.index_features_available)
+
+        # Arrays are re-used and read-only
+        self.assertIs(fm.X, fm.X)
+        with self.assertRaises(ValueError):
+            fm.X[0, 0] = 1
+
+        # Subset of features, record with missing TA is now complete
+        fm_reduced = fm.select(features=['SW_IN', 'HOUR'])
+        self.assertEqual(fm_reduced.feature_names, ['SW_IN', 'HOUR'])
+        self.assertEqual(len(fm_reduced.X), 99)
+        np.testing.assert_array_equal(fm_reduced.X[:, 1], df['HOUR'].drop(index[5]).to_numpy())
+
+        # Models that handle missing features use all records with target
+        fm_missing = FeatureMatrix.from_frame(df=df, target_col='NEE', missing_features=True)
+        self.assertEqual(len(fm_missing.X), 99)
+        self.assertTrue(np.isnan(fm_missing.X[3, 0]))
+        self.assertEqual(len(fm_missing.X_features_available), 100)
+        self.assertTrue(fm_missing.select(features=['TA']).missing_features)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from diive.core.dfun.frames import aggregate_broadcast, aggregated_as_hires, insert_aggregated_in_hires, \
+    lagged_variants
+
+
+class TestFrames(unittest.TestCase):
+
+    def test_aggregate_broadcast(self):
+        index = pd.date_range('2023-01-30 00:15', periods=48 * 4, freq='30min', name='TIMESTAMP_MIDDLE')
+        df = pd.DataFrame({'TA': np.arange(len(index), dtype=float)}, index=index)
+
+        # Daily max
+        daily_max = aggregate_broadcast(data=df['TA'], to_freq='D', to_agg='max')
+        self.assertEqual(daily_max.loc['2023-01-30'].unique().tolist(), [47])
+        self.assertEqual(daily_max.loc['2023-02-02'].unique().tolist(), [191])
+        self.assertTrue(daily_max.index.equals(index))
+
+        # Daily mean from 07:00 to 06:59, first records belong to the day before
+        df, newcol = insert_aggregated_in_hires(df=df, col='TA', to_freq='D', to_agg='mean', agg_offset='7H')
+        self.assertEqual(newcol, '.TA_D7H_mean')
+        self.assertEqual(df.loc['2023-01-30 06:45', newcol], 6.5)
+        self.assertEqual(df.loc['2023-01-30 07:15', newcol], 14 + 23.5)
+
+        # Monthly mean broadcast to a longer timestamp, outside periods are missing
+        hires_timestamp = pd.date_range('2023-01-30 00:15', '2023-03-01 00:15', freq='30min', name='TIMESTAMP_MIDDLE')
+        monthly = aggregated_as_hires(aggregate_series=df['TA'], hires_timestamp=hires_timestamp, to_freq='M')
+        self.assertEqual(monthly.name, '.TA_M_mean')
+        self.assertEqual(monthly.loc['2023-01-31 23:45'], 47.5)
+        self.assertEqual(monthly.loc['2023-02-28 12:15'], 143.5)
+        self.assertTrue(np.isnan(monthly.loc['2023-03-01 00:15']))
+
+        # Same periods as in resample, also for frequencies labelled by period start
+        index = pd.date_range('2022-11-03 00:15', '2024-02-10', freq='30min')
+        ta = pd.Series(np.random.default_rng(42).random(len(index)), index=index)
+        for to_freq in ['D', 'M', 'A', 'W', 'Q', '6H', 'MS', 'AS']:
+            expected = ta.groupby(pd.Grouper(freq=to_freq)).transform('mean')
+            broadcast = aggregate_broadcast(data=ta, to_freq=to_freq, to_agg='mean')
+            np.testing.assert_allclose(broadcast.to_numpy(), expected.to_numpy(), err_msg=to_freq)
+
+    def test_lagged_variants(self):
+        index = pd.date_range('2023-01-01 00:15', periods=200, freq='30min')
+        df = pd.DataFrame({f'VAR{i}': np.arange(200, dtype=float) + i * 1000 for i in range(40)}, index=index)
+        df['TARGET'] = 1.0
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', pd.errors.PerformanceWarning)
+            lagged = lagged_variants(df=df, lag=[-2, 1], exclude_cols=['TARGET'], dtype='float32', verbose=False)
+
+        self.assertEqual(lagged.columns[41:44].tolist(), ['.VAR0-2', '.VAR0-1', '.VAR0+1'])
+        self.assertEqual(len(lagged.columns), 41 + 40 * 3)
+        self.assertEqual(lagged['.VAR1-2'].dtype, np.float32)
+        pd.testing.assert_series_equal(lagged['.VAR3-2'], df['VAR3'].shift(2).astype('float32'), check_names=False)
+        pd.testing.assert_series_equal(lagged['.VAR3+1'], df['VAR3'].shift(-1).astype('float32'), check_names=False)
+
+        # All variables are lagged when nothing is excluded
+        lagged = lagged_variants(df=df[['VAR0', 'VAR1']], lag=[-1, -1], verbose=False)
+        self.assertEqual(lagged.columns.tolist(), ['VAR0', 'VAR1', '.VAR0-1', '.VAR1-1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,35 @@
 import importlib.metadata
+import tempfile
 import unittest
 from datetime import datetime
+from pathlib import Path
+from unittest import mock
 
 import numpy as np
+import pandas as pd
+import xgboost
 
 import diive.configs.exampledata as ed
 from diive.core.dfun.stats import sstats  # Time series stats
-from diive.pkgs.gapfilling.randomforest_ts import RandomForestTS
+from diive.core.ml.common import stratified_record_subsample
+from diive.core.ml.registry import ModelRegistry, fingerprint_model
+from diive.pkgs.gapfilling.histgradientboosting_ts import HistGradientBoostingTS
+from diive.pkgs.gapfilling.mds import FluxMDS
+from diive.pkgs.gapfilling.randomforest_ts import LongTermRandomForestTS, OptimizeParamsRFTS, RandomForestTS
+from diive.pkgs.gapfilling.xgboost_ts import XGBoostTS, benchmark_gapfilling_engines
+
+
+def _synthetic_nee(periods: int = None, index: pd.DatetimeIndex = None, gaps: float = 0.3) -> pd.DataFrame:
+    """Air temperature, radiation and NEE depending on both, a fraction *gaps* of NEE is missing"""
+    if index is None:
+        index = pd.date_range('2022-01-01 00:15', periods=periods, freq='30min')
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({'TA': rng.normal(size=len(index)).cumsum() / 10,
+                       'SW_IN': rng.random(len(index)) * 500}, index=index)
+    df['NEE'] = 0.3 * df['TA'] - 0.01 * df['SW_IN'] + rng.normal(size=len(index))
+    if gaps:
+        df.loc[rng.random(len(index)) < gaps, 'NEE'] = np.nan
+    return df
 
 
 class TestGapFilling(unittest.TestCase):
@@ -14,6 +37,41 @@ class TestGapFilling(unittest.TestCase):
     def test_optimize_rf_params(self):
         pass
 
+    def test_optimize_rf_params_halving(self):
+        """Successive halving keeps the best third of candidates and resumes from checkpoints"""
+        df = _synthetic_nee(periods=1200, gaps=0)
+        rf_params = {'n_estimators': [5], 'min_samples_split': [2, 10, 20], 'min_samples_leaf': [1, 5, 10]}
+
+        with tempfile.TemporaryDirectory() as checkpointdir:
+            opts = []
+            for _ in range(2):
+                opt = OptimizeParamsRFTS(df=df, target_col='NEE', **rf_params)
+                opt.optimize(search='halving', n_splits=3, factor=3, checkpointdir=checkpointdir, showplot=False)
+                opts.append(opt)
+            self.assertEqual(opts[0].cv_results.groupby('iter').size().tolist(), [9, 3, 1])
+            self.assertEqual(opts[0].cv_results['n_resources'].iloc[-1], 900)
+            self.assertTrue(opts[0].search_completed)
+            self.assertEqual(opts[0].best_params, opts[1].best_params)
+            pd.testing.assert_frame_equal(opts[0].cv_results, opts[1].cv_results)
+
+        # Stopped during the second iteration, 1 of 3 candidates completed from checkpoints
+        del rf_params['n_estimators']
+        with tempfile.TemporaryDirectory() as checkpointdir:
+            opt = OptimizeParamsRFTS(df=df, target_col='NEE', **rf_params)
+            opt.optimize(search='halving', n_splits=3, resource='n_estimators', max_resources=45,
+                         checkpointdir=checkpointdir, showplot=False)
+            checkpointfile = next(Path(checkpointdir).glob('search_*.jsonl'))
+            lines = checkpointfile.read_text().splitlines()
+            checkpointfile.write_text('\n'.join(lines[:9 * 3 + 3]) + '\n')
+            opt = OptimizeParamsRFTS(df=df, target_col='NEE', **rf_params)
+            opt.optimize(search='halving', n_splits=3, resource='n_estimators', max_resources=45,
+                         checkpointdir=checkpointdir, max_seconds=0, showplot=False)
+        self.assertFalse(opt.search_completed)
+        self.assertEqual(opt.cv_results.groupby('iter').size().tolist(), [9, 1])
+        firstiter = opt.cv_results.loc[opt.cv_results['iter'] == 0]
+        best = firstiter.loc[firstiter['mean_test_score'].idxmax()]
+        self.assertEqual(opt.best_params, {**best['params'], 'n_estimators': best['n_resources']})
+
     def test_quickfill(self):
         pass
 
@@ -73,6 +131,146 @@ class TestGapFilling(unittest.TestCase):
         self.assertEqual(gfdf['NEE_CUT_REF_orig_gfRF'].sum(), -63541.1261782166)
         self.assertEqual(fi['PERM_IMPORTANCE']['Rg_f'], 0.9831618002267694)
 
+    def test_gapfilling_longterm_randomforest_workers(self):
+        """Yearly models give the same results in worker processes"""
+        df = _synthetic_nee(index=pd.date_range('2019-01-01 01:30', '2021-12-31 22:30', freq='3H'))
+
+        results = {}
+        for n_workers in [1, 2]:
+            ltrf = LongTermRandomForestTS(input_df=df, target_col='NEE', features_lag=[-1, 1],
+                                          include_timestamp_as_features=True, n_workers=n_workers,
+                                          n_estimators=3, random_state=42, perm_n_repeats=1, n_jobs=1)
+            ltrf.run()
+            results[n_workers] = ltrf
+
+        self.assertEqual(results[2].yearpools_dict['2019']['rows'], (0, len(df)))
+        self.assertEqual(list(results[2].scores_.keys()), ['2019', '2020', '2021'])
+        pd.testing.assert_frame_equal(results[1].gapfilling_df_, results[2].gapfilling_df_)
+        self.assertEqual(results[2].gapfilled_.isnull().sum(), 0)
+
+    def test_gapfilling_randomforest_registry(self):
+        """Trained models are loaded from the registry"""
+        df = _synthetic_nee(periods=2000)
+        kwargs = dict(target_col='NEE', include_timestamp_as_features=True, n_estimators=5, random_state=42)
+
+        with tempfile.TemporaryDirectory() as registrydir:
+            registry = ModelRegistry(registrydir=registrydir)
+            rfts = []
+            for _ in range(2):
+                _rfts = RandomForestTS(input_df=df, registry=registry, **kwargs)
+                _rfts.trainmodel(showplot_scores=False, showplot_importance=False)
+                rfts.append(_rfts)
+            self.assertEqual(len(registry.entries()), 1)
+            self.assertEqual(rfts[0].scores_test_, rfts[1].scores_test_)
+            pd.testing.assert_frame_equal(rfts[0].feature_importances_traintest_,
+                                          rfts[1].feature_importances_traintest_)
+
+            # New records without target are filled with the registered model
+            newindex = pd.date_range('2022-02-11 16:15', periods=48, freq='30min')
+            newdf = pd.DataFrame({'TA': 1.0, 'SW_IN': 100.0, 'NEE': np.nan}, index=newindex)
+            _rfts = RandomForestTS(input_df=pd.concat([df, newdf]), registry=registry, **kwargs)
+            _rfts.load_model()
+            _rfts.fillgaps(showplot_scores=False, showplot_importance=False)
+            self.assertEqual(_rfts.get_gapfilled_target()[newindex].isnull().sum(), 0)
+            self.assertTrue((_rfts.get_flag()[newindex] == 1).all())
+
+    def test_gapfilling_histgradientboosting(self):
+        """Records with missing features are filled by the full model, no fallback needed"""
+        df = _synthetic_nee(periods=2000)
+        df.iloc[500:600, df.columns.get_loc('SW_IN')] = np.nan
+        hgbts = HistGradientBoostingTS(input_df=df, target_col='NEE', include_timestamp_as_features=True,
+                                       max_iter=50, random_state=42)
+        hgbts.trainmodel(showplot_scores=False, showplot_importance=False)
+        hgbts.fillgaps(showplot_scores=False, showplot_importance=False)
+        gapfilled = hgbts.get_gapfilled_target()
+        self.assertEqual(gapfilled.name, 'NEE_gfHGB')
+        self.assertEqual(gapfilled.isnull().sum(), 0)
+        self.assertEqual(hgbts.get_flag().max(), 1)
+        self.assertEqual(hgbts.gapfilling_df_[hgbts.pred_fullmodel_col].isnull().sum(), 0)
+
+    def test_gapfilling_xgboost(self):
+        """Early stopping on the most recent training records, gaps filled by the full model"""
+        df = _synthetic_nee(periods=2000)
+        df.iloc[500:600, df.columns.get_loc('SW_IN')] = np.nan
+        xts = XGBoostTS(input_df=df, target_col='NEE', include_timestamp_as_features=True,
+                        n_estimators=300, learning_rate=0.3, early_stopping_rounds=5, random_state=42)
+        xts.trainmodel(showplot_scores=False, showplot_importance=False)
+        xts.fillgaps(showplot_scores=False, showplot_importance=False)
+        self.assertLess(xts.model_.best_iteration, 299)
+        self.assertEqual(xts.model_.get_params()['tree_method'], 'hist')
+        gapfilled = xts.get_gapfilled_target()
+        self.assertEqual(gapfilled.name, 'NEE_gfXG')
+        self.assertEqual(gapfilled.isnull().sum(), 0)
+        self.assertEqual(xts.get_flag().max(), 1)
+
+        results = benchmark_gapfilling_engines(df=df, target_col='NEE',
+                                               rf_params=dict(n_estimators=5, random_state=42),
+                                               xgb_params=dict(n_estimators=20, random_state=42))
+        self.assertEqual(results.index.tolist(), ['RandomForestTS', 'XGBoostTS'])
+        self.assertEqual(results.loc['XGBoostTS', 'N_PREDICTED'], len(df))
+
+        # Registry fingerprint changes with the xgboost version
+        fm = xts.featurematrix_
+        key = fingerprint_model(X=fm.X, y=fm.y, feature_names=fm.feature_names, model=xts._new_model())
+        with mock.patch.object(xgboost, '__version__', '0.0.0'):
+            self.assertNotEqual(fingerprint_model(X=fm.X, y=fm.y, feature_names=fm.feature_names,
+                                                  model=xts._new_model()), key)
+
+    def test_gapfilling_mds(self):
+        """MDS fills all gaps, look-up table values are the mean of fluxes under similar conditions"""
+        index = pd.date_range('2022-01-01 00:15', periods=3000, freq='30min')
+        rng = np.random.default_rng(42)
+        hour = index.hour + index.minute / 60
+        df = pd.DataFrame({'TA': 10 + 3 * np.sin((hour - 9) / 24 * 2 * np.pi) + rng.normal(size=len(index)),
+                           'SW_IN': np.clip(800 * np.sin((hour - 6) / 12 * np.pi), 0, None) * rng.random(len(index)),
+                           'VPD': rng.random(len(index)) * 10}, index=index)
+        df['NEE'] = 2 + 0.2 * df['TA'] - 0.02 * df['SW_IN'] + rng.normal(size=len(index))
+        df.loc[rng.random(len(index)) < 0.4, 'NEE'] = np.nan
+        df.iloc[1000:1100, df.columns.get_loc('TA')] = np.nan  # Only radiation available
+        mds = FluxMDS(df=df, flux='NEE', ta='TA', swin='SW_IN', vpd='VPD', verbose=0)
+        mds.run()
+        results = mds.gapfilling_df_
+        gapfilled = mds.get_gapfilled_target()
+        self.assertEqual(gapfilled.name, 'NEE_gfMDS')
+        self.assertEqual(gapfilled.isnull().sum(), 0)
+        pd.testing.assert_series_equal(gapfilled[df['NEE'].notnull()], df['NEE'].dropna(), check_names=False)
+        self.assertTrue((mds.get_flag()[df['NEE'].isnull()] > 0).all())
+        self.assertIn(2, results['.METHOD'].unique())
+
+        # Look-up table with window +/- 7 days, checked record by record
+        for ts in results.index[(results['.METHOD'] == 1) & (results['.WINDOW_DAYS'] == 7)][:5]:
+            gap = df.loc[ts]
+            window = df.loc[ts - pd.Timedelta(days=7):ts + pd.Timedelta(days=7)].dropna(subset=['NEE'])
+            swin_tol = np.clip(gap['SW_IN'], 20, 50)
+            similar = ((window['SW_IN'] - gap['SW_IN']).abs() < swin_tol) \
+                      & ((window['TA'] - gap['TA']).abs() < 2.5) \
+                      & ((window['VPD'] - gap['VPD']).abs() < 5)
+            self.assertAlmostEqual(gapfilled[ts], window.loc[similar, 'NEE'].mean())
+            self.assertEqual(results.loc[ts, '.N_VALS'], similar.sum())
+
+    def test_feature_reduction_subsample(self):
+        """Permutation importance from a subsample of test records"""
+        index = pd.date_range('2022-01-01 00:15', periods=4000, freq='30min')
+        rng = np.random.default_rng(42)
+        df = pd.DataFrame({'TA': rng.normal(size=len(index)), 'SW_IN': rng.random(len(index)) * 500,
+                           'NOISE': rng.random(len(index))}, index=index)
+        df['NEE'] = 2 * df['TA'] - 0.01 * df['SW_IN'] + rng.normal(size=len(index)) / 10
+
+        # Same fraction of records from each month
+        positions = stratified_record_subsample(timestamp=index.to_numpy(), fraction=0.1, freq='M', random_state=1)
+        counts = pd.Series(1, index=index[positions]).resample('M').sum()
+        expected = np.ceil(pd.Series(1, index=index).resample('M').sum() * 0.1)
+        pd.testing.assert_series_equal(counts, expected.astype(counts.dtype))
+
+        rfts = RandomForestTS(input_df=df, target_col='NEE', n_estimators=5, random_state=42, perm_n_repeats=3)
+        rfts.reduce_features(perm_subsample=0.2, perm_n_repeats=2, perm_n_jobs=1)
+        self.assertEqual(rfts.feature_importances_reduction_.attrs['n_records'], 201)
+        self.assertTrue({'TA', 'SW_IN'} <= set(rfts.accepted_features_))
+
+        stability = rfts.feature_reduction_stability(subsamples=[0.2, 1], n_repeats=[2], n_trials=2, n_jobs=1)
+        self.assertEqual(len(stability), 2)
+        self.assertEqual(stability.loc[stability['SUBSAMPLE'] == 1, 'N_RECORDS'].iloc[0], 1000)
+
 
 if __name__ == '__main__':
     unittest.main()
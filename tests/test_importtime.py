@@ -0,0 +1,34 @@
+import subprocess
+import sys
+import unittest
+
+from diive.core.utils.importtime import imported_heavy_dependencies
+
+MODULES = ['diive',
+           'diive.core.io.filereader',
+           'diive.core.times.times',
+           'diive.pkgs.qaqc.meteoscreening',
+           'diive.pkgs.outlierdetection.stepwiseoutlierdetection',
+           'diive.pkgs.gapfilling.randomforest_ts',
+           'diive.pkgs.flux.co2_penalty']
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_no_heavy_dependencies(self):
+        """Plotting and machine learning dependencies are not imported with the module"""
+        for module in MODULES:
+            with self.subTest(module=module):
+                self.assertEqual(imported_heavy_dependencies(module=module), [])
+
+    def test_import_diive_is_lazy(self):
+        """Machine learning and plotting libraries are not in sys.modules after `import diive`"""
+        code = "import sys, diive; print(','.join(sorted(sys.modules)))"
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        imported = set(result.stdout.strip().split(','))
+        for module in ['sklearn', 'matplotlib', 'xgboost']:
+            self.assertNotIn(module, imported)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,21 @@
+import tempfile
 import unittest
+import zipfile
+from pathlib import Path
 
 from pandas import DataFrame
+from pandas.testing import assert_frame_equal, assert_series_equal
 
 import diive.configs.exampledata as ed
+from diive.configs.filetypes import get_filetypes
+from diive.core.dfun.frames import get_len_data, get_len_header
+from diive.core.io.filereader import ConfigFileReader, MultiDataFileReader, ReadFileType, \
+    _compiled_filetypeconfig, clear_filetype_registry, get_filetypeconfig
+from diive.core.io.files import load_parquet, save_parquet
+from diive.core.io.ingest import IncrementalIngestion
+from diive.core.io.parsecache import ParseCache
+from diive.core.io.sniff import _header_layout, clear_header_cache, sniff_header
+from diive.core.io.stream import stream_record_blocks
 
 
 class TestLoadFiletypes(unittest.TestCase):
@@ -17,6 +30,201 @@ class TestLoadFiletypes(unittest.TestCase):
         self.assertEqual(len(metadata_df.columns), 4)
         self.assertEqual(len(metadata_df), 101)
 
+    def test_parse_engine_c_same_as_python(self):
+        """Fast C engine yields the same data as the python engine"""
+        filepath = Path(ed.DIR_PATH) / 'exampledata_CH-DAV_FP2022.5_2022.07_ID20230206154316_30MIN.diive.csv'
+        rft_c = ReadFileType(filetype='DIIVE_CSV_30MIN', filepath=filepath, parse_engine='auto')
+        rft_py = ReadFileType(filetype='DIIVE_CSV_30MIN', filepath=filepath, parse_engine='python')
+        self.assertEqual(rft_c.parse_engine_used, 'c')
+        self.assertEqual(rft_py.parse_engine_used, 'python')
+        assert_frame_equal(rft_c.data_df, rft_py.data_df)
+
+    def test_usecols_dtypes(self):
+        """Read selected columns with given dtypes"""
+        filepath = Path(ed.DIR_PATH) / 'exampledata_CH-DAV_FP2022.5_2022.07_ID20230206154316_30MIN.diive.csv'
+        full = ReadFileType(filetype='DIIVE_CSV_30MIN', filepath=filepath)
+        rft = ReadFileType(filetype='DIIVE_CSV_30MIN', filepath=filepath,
+                           usecols=['NEE_CUT_REF_f', 'Tair_f'], dtypes={'Tair_f': 'float32'})
+        self.assertEqual(list(rft.data_df.columns), ['NEE_CUT_REF_f', 'Tair_f'])
+        self.assertEqual(list(rft.metadata_df.index), ['NEE_CUT_REF_f', 'Tair_f'])
+        self.assertEqual(rft.data_df['Tair_f'].dtype, 'float32')
+        self.assertEqual(rft.data_df['NEE_CUT_REF_f'].dtype, 'float64')
+        self.assertEqual(rft.data_df.index.freqstr, full.data_df.index.freqstr)
+        assert_frame_equal(rft.data_df[['NEE_CUT_REF_f']], full.data_df[['NEE_CUT_REF_f']])
+        with self.assertRaises(KeyError):
+            ReadFileType(filetype='DIIVE_CSV_30MIN', filepath=filepath, usecols=['NOT_IN_FILE'])
+
+    def test_sniff_header(self):
+        """Single-pass header sniffing yields the same header as reading with pandas"""
+        filepath = Path(ed.DIR_PATH) / 'exampledata_CH-DAV_FP2022.5_2022.07_ID20230206154316_30MIN.diive.csv'
+        clear_header_cache()
+        num_headercols, headercols = get_len_header(filepath=filepath, skiprows=[], headerrows=[0, 1])
+        num_datacols = get_len_data(filepath=filepath, skiprows=[], headerrows=[0, 1])
+        sniffed = sniff_header(filepath=filepath, skiprows=[], headerrows=[0, 1])
+        self.assertEqual(sniffed.headercols, headercols)
+        self.assertEqual(sniffed.num_headercols, num_headercols)
+        self.assertEqual(sniffed.num_datacols, num_datacols)
+        # Layout of second file with the same header comes from the cache
+        sniff_header(filepath=filepath, skiprows=[], headerrows=[0, 1])
+        self.assertEqual(_header_layout.cache_info().hits, 1)
+
+    def test_filetype_registry(self):
+        """Filetype settings are read once and returned as independent copies"""
+        clear_filetype_registry()
+        expected = ConfigFileReader(configfilepath=get_filetypes()['TOA5_DAT_1MIN'], validation='filetype').read()
+        config = get_filetypeconfig(filetype='TOA5_DAT_1MIN')
+        self.assertEqual(config, expected)
+        config['DATA']['NA_VALUES'].append(-7777)
+        self.assertEqual(get_filetypeconfig(filetype='TOA5_DAT_1MIN'), expected)
+        self.assertEqual(_compiled_filetypeconfig.cache_info().misses, 1)
+        with self.assertRaises(KeyError):
+            get_filetypeconfig(filetype='NOT_A_FILETYPE')
+
+    def test_zip_member_from_memory(self):
+        """Zipped file is read from memory, also from archives with more than one member"""
+        filepath = Path(ed.DIR_PATH) / 'CH-Dav_BM_20230328_L02_F03.zip'
+        rft = ReadFileType(filepath=filepath, filetype='ICOS_H2R_CSVZIP_10S')
+        self.assertEqual(rft.data_df.shape, (8640, 26))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            multimember = Path(tmpdir) / 'multimember.zip'
+            with zipfile.ZipFile(filepath) as src, zipfile.ZipFile(multimember, 'w') as dst:
+                dst.writestr('readme.txt', 'not data')
+                dst.writestr('data.csv', src.read(src.namelist()[0]))
+            rft_multi = ReadFileType(filepath=multimember, filetype='ICOS_H2R_CSVZIP_10S')
+            self.assertEqual(list(Path(tmpdir).iterdir()), [multimember])  # No temporary files
+        assert_frame_equal(rft.data_df, rft_multi.data_df)
+
+    def test_multidatafilereader_parallel(self):
+        """Read overlapping files in parallel and merge them column by column"""
+        filepath = Path(ed.DIR_PATH) / 'exampledata_CH-DAV_FP2022.5_2022.07_ID20230206154316_30MIN.diive.csv'
+        lines = filepath.read_text().splitlines()
+        header, data = lines[:2], lines[2:]
+
+        def set_et(rows, value):
+            # Replace values of ET_f (third column) in *rows*
+            for row in rows:
+                fields = data_parts[row].split(',')
+                fields[2] = value
+                data_parts[row] = ','.join(fields)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepaths = []
+            for ix, (start, end) in enumerate([(0, 600), (500, 1100), (1000, len(data))]):
+                data_parts = data[start:end]
+                if ix == 0:
+                    set_et(rows=range(550, 600), value='')  # Missing in first file, records 550-599
+                elif ix == 1:
+                    set_et(rows=range(0, 100), value='999')  # Different in second file, records 500-599
+                fp = Path(tmpdir) / f'part{ix}.diive.csv'
+                fp.write_text('\n'.join(header + data_parts) + '\n')
+                filepaths.append(fp)
+            serial = MultiDataFileReader(filepaths=filepaths, filetype='DIIVE_CSV_30MIN', n_workers=1)
+            parallel = MultiDataFileReader(filepaths=filepaths, filetype='DIIVE_CSV_30MIN', n_workers=2, keep='last')
+        self.assertEqual(len(serial.data_df), 1488)
+        self.assertEqual(len(serial.metadata_df), 101)
+        self.assertEqual(len(parallel.parse_engines_used), 3)
+
+        # First file wins, its missing values are filled from the second file
+        et = serial.data_df['ET_f']
+        original = ReadFileType(filepath=filepath, filetype='DIIVE_CSV_30MIN').data_df['ET_f']
+        assert_series_equal(et.iloc[500:550], original.iloc[500:550])
+        self.assertTrue((et.iloc[550:600] == 999).all())
+
+        # Last file wins, records outside the overlaps are the same
+        self.assertTrue((parallel.data_df['ET_f'].iloc[500:600] == 999).all())
+        assert_frame_equal(serial.data_df.drop(index=serial.data_df.index[500:600]),
+                           parallel.data_df.drop(index=parallel.data_df.index[500:600]))
+
+    def test_parsecache(self):
+        """Second read of the same file comes from the cache"""
+        filepath = Path(ed.DIR_PATH) / 'exampledata_CH-DAV_FP2022.5_2022.07_ID20230206154316_30MIN.diive.csv'
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ParseCache(cachedir=tmpdir)
+            parsed = ReadFileType(filetype='DIIVE_CSV_30MIN', filepath=filepath, cache=cache)
+            cached = ReadFileType(filetype='DIIVE_CSV_30MIN', filepath=filepath, cache=cache)
+            self.assertEqual(cached.parse_engine_used, 'cache')
+            assert_frame_equal(parsed.data_df, cached.data_df)
+            self.assertEqual(parsed.data_df.index.freq, cached.data_df.index.freq)
+            self.assertEqual(len(cache.entries()), 1)
+            cache.invalidate(filepath=filepath)
+            self.assertEqual(len(cache.entries()), 0)
+
+    def test_incremental_ingestion(self):
+        """Only new files are parsed and added to the store"""
+        filepath = Path(ed.DIR_PATH) / 'exampledata_CH-DAV_FP2022.5_2022.07_ID20230206154316_30MIN.diive.csv'
+        lines = filepath.read_text().splitlines()
+        header, data = lines[:2], lines[2:]
+        with tempfile.TemporaryDirectory() as rawdir, tempfile.TemporaryDirectory() as storedir:
+            filepaths = []
+            for ix, (start, end) in enumerate([(0, 600), (600, 1000), (1000, len(data))]):
+                fp = Path(rawdir) / f'part{ix}.diive.csv'
+                fp.write_text('\n'.join(header + data[start:end]) + '\n')
+                filepaths.append(fp)
+            ingestion = IncrementalIngestion(storedir=storedir, filetype='DIIVE_CSV_30MIN')
+            self.assertEqual(len(ingestion.update(filepaths=filepaths[:2])), 2)
+            self.assertEqual(len(ingestion.update(filepaths=filepaths[:2])), 0)
+            ingestion = IncrementalIngestion(storedir=storedir, filetype='DIIVE_CSV_30MIN')
+            self.assertEqual(len(ingestion.update(filepaths=filepaths)), 1)
+            self.assertEqual(len(ingestion.manifest), 3)
+
+            # Files without data are in the manifest with 0 records and are not parsed again
+            emptyfile = Path(rawdir) / 'empty.diive.csv'
+            emptyfile.write_text('')
+            self.assertEqual(ingestion.update(filepaths=filepaths + [emptyfile]), [])
+            ingestion = IncrementalIngestion(storedir=storedir, filetype='DIIVE_CSV_30MIN')
+            self.assertEqual(ingestion.pending_files(filepaths=filepaths + [emptyfile]), [])
+            self.assertEqual(ingestion.manifest['N_RECORDS'].tolist(), [600, 400, 488, 0])
+            data_df = ingestion.load()
+        self.assertEqual(len(data_df), 1488)
+        self.assertEqual(len(data_df.columns), 101)
+
+    def test_stream_record_blocks(self):
+        """Blocks of fixed length are built across file boundaries"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepaths = []
+            for ix, n_records in enumerate([2500, 1300, 4200]):
+                lines = ['"TOA5","rECord"', '"U","W"', '"m/s","m/s"', '"Smp","Smp"']
+                lines += [f"{ix}.{r % 10},{r}" for r in range(n_records)]
+                fp = Path(tmpdir) / f'file{ix}.dat'
+                fp.write_text('\n'.join(lines) + '\n')
+                filepaths.append(fp)
+            blocks = list(stream_record_blocks(filepaths=filepaths, filetype='RECORD_DAT_20HZ',
+                                               block_size=1000, chunksize=700))
+        self.assertEqual([len(b) for b in blocks], [1000] * 8)
+        self.assertEqual(blocks[2]['U'].iloc[499], 0.9)
+        self.assertEqual(blocks[2]['U'].iloc[500], 1.0)
+        self.assertEqual(blocks[-1].index[-1], 7999)
+
+    def test_parquet_partitioned_timerange(self):
+        """Load time range and columns from partitioned parquet dataset"""
+        data_df, _ = ed.load_exampledata_DIIVE_CSV_30MIN()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = save_parquet(filename='data', data=data_df, outpath=tmpdir,
+                                    partitioned=True, row_group_size=48)
+            full_df = load_parquet(filepath=filepath)
+            subset_df = load_parquet(filepath=filepath, start='2022-07-10', end='2022-07-12 23:59',
+                                     columns=['NEE_CUT_REF_f', 'Tair_f'])
+        assert_frame_equal(full_df, data_df)
+        self.assertEqual(subset_df.columns.to_list(), ['NEE_CUT_REF_f', 'Tair_f'])
+        self.assertEqual(len(subset_df), 144)
+        self.assertEqual(str(subset_df.index[0]), '2022-07-10 00:15:00')
+
+    def test_parquet_without_pandas_metadata(self):
+        """Load parquet files without pandas metadata or without timestamp index"""
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        df = pd.DataFrame({'TIMESTAMP_END': pd.date_range('2022-07-01 00:30', periods=96, freq='30min'),
+                           'TA': range(96)})
+        with tempfile.TemporaryDirectory() as tmpdir:
+            nometa = Path(tmpdir) / 'nometa.parquet'
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None), nometa)
+            rangeindex = Path(tmpdir) / 'rangeindex.parquet'
+            df.to_parquet(rangeindex)
+            for filepath in [nometa, rangeindex]:
+                loaded_df = load_parquet(filepath=filepath, start='2022-07-01 12:00', sanitize_timestamp=False)
+                assert_frame_equal(loaded_df, pd.read_parquet(filepath))
+
     def test_load_exampledata_eddypro_fluxnet_CSV_30MIN(self):
         """Load EddyPro _fluxnet_ file"""
         data_df, metadata_df = ed.load_exampledata_eddypro_fluxnet_CSV_30MIN()
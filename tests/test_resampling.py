@@ -0,0 +1,42 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from diive.core.times.resampling import resample_to_freq
+
+
+class TestResampling(unittest.TestCase):
+
+    def test_resample_to_freq(self):
+        index = pd.date_range('2022-01-01 00:10', periods=6 * 24 * 3, freq='10min', name='TIMESTAMP_END')
+        df = pd.DataFrame({'TA': np.arange(len(index), dtype=float), 'SW_IN': 1.0}, index=index)
+        df.iloc[0:2, 0] = np.nan  # Only one TA value in first half-hour
+        df.iloc[3:6, 1] = np.nan  # No SW_IN value in second half-hour
+
+        # Half-hourly means, one of three values is enough for 10MIN data
+        resampled, counts = resample_to_freq(data=df, to_freq='30T', agg='mean', mincounts_perc=.9,
+                                             return_counts=True)
+        self.assertEqual(resampled.index.name, 'TIMESTAMP_END')
+        self.assertEqual(resampled.index.freqstr, '30T')
+        self.assertEqual(resampled.index[0], pd.Timestamp('2022-01-01 00:30'))
+        self.assertEqual(resampled['TA'].iloc[0], 2)
+        self.assertTrue(np.isnan(resampled['SW_IN'].iloc[1]))
+        self.assertEqual(counts['TA'].iloc[:2].tolist(), [1, 3])
+
+        # Daily sums, timestamp shows middle of day, first day has not enough TA values
+        resampled = resample_to_freq(data=df, to_freq='D', agg='sum', mincounts_perc=1,
+                                     output_timestamp_shows='middle')
+        self.assertEqual(resampled.index[0], pd.Timestamp('2022-01-01 12:00'))
+        self.assertTrue(np.isnan(resampled['TA'].iloc[0]))
+        self.assertEqual(resampled['TA'].iloc[1], df['TA'].iloc[144:288].sum())
+
+        # Monthly means, calendar months
+        resampled = resample_to_freq(data=df, to_freq='M', agg='mean', mincounts_perc=0,
+                                     output_timestamp_shows='start')
+        self.assertEqual(resampled.index.tolist(), [pd.Timestamp('2022-01-01')])
+        self.assertEqual(resampled.index.name, 'TIMESTAMP_START')
+
+
+if __name__ == '__main__':
+    unittest.main()
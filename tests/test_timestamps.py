@@ -1,7 +1,11 @@
 import unittest
 
+import numpy as np
+import pandas as pd
+
 import diive.configs.exampledata as ed
-from diive.core.times.times import DetectFrequency
+from diive.core.times.times import DetectFrequency, TimestampSanitizer, detect_freq_groups, _detect_freq_groups_pandas
+from diive.core.times.times import calendar_features, include_timestamp_as_cols
 
 
 class TestTimestamps(unittest.TestCase):
@@ -12,6 +16,73 @@ class TestTimestamps(unittest.TestCase):
         freq = f.get()
         self.assertEqual(freq, '30T')  # add assertion here
 
+    def test_detect_freq_groups(self):
+        # 10MIN, transition with 7S, 1MIN, 10MIN again
+        index = pd.date_range('2020-10-01 00:00', periods=6, freq='10min')
+        index = index.append(pd.DatetimeIndex(['2020-10-01 00:50:07']))
+        index = index.append(pd.date_range('2020-10-01 01:00', periods=5, freq='1min'))
+        index = index.append(pd.date_range('2020-10-01 01:10', periods=4, freq='10min'))
+        groups = detect_freq_groups(index=index)
+        # Records at the boundaries between groups are ambiguous, only the first
+        # and last record of all records with the same resolution are added
+        expected = [600] * 5 + [np.nan, np.nan] + [60] * 5 + [np.nan] + [600] * 3
+        np.testing.assert_array_equal(groups.to_numpy(), expected)
+        self.assertEqual(groups.name, 'FREQ_AUTO_SEC')
+
+        # Same result as previous implementation, also with gaps and irregular records
+        rng = np.random.default_rng(42)
+        index = pd.date_range('2020-01-01', periods=2000, freq='1min')
+        index = index.append(pd.date_range('2020-01-02 12:00', periods=3000, freq='10s'))
+        index = index.append(pd.date_range('2020-01-03', periods=1000, freq='30min'))
+        index = index[rng.random(len(index)) > 0.05]
+        pd.testing.assert_series_equal(detect_freq_groups(index=index), _detect_freq_groups_pandas(index=index))
+
+    def test_timestamp_sanitizer_fused(self):
+        rng = np.random.default_rng(42)
+        index = pd.date_range('2022-07-01 00:30', periods=2000, freq='30min', name='TIMESTAMP_END')
+        data = pd.DataFrame({'TA': rng.random(2000), 'FLAG': rng.integers(0, 3, 2000)}, index=index)
+        data = data.iloc[rng.random(2000) > 0.05]  # Missing records
+        data = pd.concat([data, data.iloc[[10, 20, 30]] + 1])  # Duplicates, last is kept
+        data = data.iloc[rng.permutation(len(data))]  # Unsorted
+        data.index.freq = None
+        original = data.copy()
+        for output_middle_timestamp in [True, False]:
+            with self.subTest(output_middle_timestamp=output_middle_timestamp):
+                stepwise = TimestampSanitizer(data=data, output_middle_timestamp=output_middle_timestamp,
+                                              fused=False).get()
+                fused = TimestampSanitizer(data=data, output_middle_timestamp=output_middle_timestamp,
+                                           fused=True).get()
+                pd.testing.assert_frame_equal(fused, stepwise)
+                self.assertEqual(fused.index.freq, stepwise.index.freq)
+                self.assertEqual(len(fused), 2000)
+        pd.testing.assert_frame_equal(data, original)  # Input data are not changed
+
+        # Already sanitized data are copied, not changed in place
+        sanitized = TimestampSanitizer(data=stepwise, output_middle_timestamp=False).get()
+        pd.testing.assert_frame_equal(sanitized, stepwise)
+        sanitized.iloc[:, 0] = -9999
+        self.assertFalse((stepwise['TA'] == -9999).any())
+
+    def test_include_timestamp_as_cols(self):
+        index = pd.DatetimeIndex(['2023-08-15 12:15', '2023-12-31 23:45', '2024-01-01 00:15', '2023-07-13 06:45'],
+                                 name='TIMESTAMP_MIDDLE')
+        df = pd.DataFrame({'TA': [1.0, 2.0, 3.0, 4.0]}, index=index)
+        df = include_timestamp_as_cols(df=df)
+        self.assertEqual(df['.YEARMONTH'].tolist(), [20238, 202312, 20241, 20237])
+        self.assertEqual(df['.YEARDOY'].tolist(), [2023227, 2023365, 20241, 2023194])
+        self.assertEqual(df['.YEARWEEK'].tolist(), [202333, 202352, 20241, 202328])
+        self.assertEqual(df['.SEASON'].tolist(), [2, 4, 4, 2])
+        self.assertEqual(df['.WEEK'].tolist(), [33, 52, 1, 28])
+        self.assertEqual(df['.HOUR'].tolist(), [12, 23, 0, 6])
+
+        # Features are cached per index
+        self.assertIs(calendar_features(index=df.index), calendar_features(index=df.index.copy()))
+        df_cached = include_timestamp_as_cols(df=df[['TA']], season=False)
+        self.assertNotIn('.SEASON', df_cached.columns)
+        pd.testing.assert_frame_equal(df_cached, df.drop(columns='.SEASON'))
+        df_cached.loc[:, '.YEAR'] = 0  # Cached features are not changed
+        self.assertEqual(calendar_features(index=df.index)['.YEAR'].tolist(), [2023, 2023, 2024, 2023])
+
 
 if __name__ == '__main__':
     unittest.main()